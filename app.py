@@ -1,13 +1,30 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
-import requests
-from bs4 import BeautifulSoup
+import os
 import time
-from openpyxl.styles import PatternFill
-import io
 import datetime
 
+from auto_notes.cache import obtener_cache
+from auto_notes.canastas import MAX_SUBYACENTES, colchon_minimo, es_canasta, normalizar_ticker, subyacentes
+from auto_notes.cartera import CarteraNotas, SincronizadorCartera
+from auto_notes.circuitos import CERRADO, estados as estados_circuitos
+from auto_notes.coalescencia import COALESCEDOR
+from auto_notes.excel import exportar_excel_cacheado
+from auto_notes.mercado import (
+    BROKERS, DISCREPANCIAS_MIN_52, columna_broker, completar_brokers, configurar_yfinance, obtener_datos_nota,
+    obtener_datos_notas,
+)
+from auto_notes.metricas import REGISTRO, servir_metricas, texto_prometheus
+from auto_notes.notas import leer_notas
+from auto_notes.refresco import INTERVALO_FUERA, INTERVALO_MERCADO, Refrescador, mercado_abierto
+from auto_notes.score import (
+    PESOS_DEFAULT, TERMINO_SIMULACION, TERMINOS, MotorScore, calcular_score, calcular_scores, terminos_extra,
+)
+from auto_notes.sensibilidad import GRILLA, MAX_VECTORES_GRILLA, PERTURBACION, analizar_sensibilidad, tamanio_grilla
+from auto_notes.simulacion import CAMINOS, COLUMNAS_SIMULACION, SimuladorNotas
+from auto_notes.semaforo import bandas, estilo_css
+from auto_notes.tabla import TAMANIOS_PAGINA, paginar
+
 # Configure Streamlit page to wide mode
 st.set_page_config(
     page_title="Structured Investment Pro",
@@ -16,230 +33,47 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# --- Common headers for web scraping ---
-BROWSER_HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
-    "Accept-Language": "en-US,en;q=0.9,es;q=0.8",
-    "Accept-Encoding": "gzip, deflate, br",
-    "Cache-Control": "no-cache",
-    "Pragma": "no-cache",
-    "Sec-Ch-Ua": '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
-    "Sec-Ch-Ua-Mobile": "?0",
-    "Sec-Ch-Ua-Platform": '"Windows"',
-    "Sec-Fetch-Dest": "document",
-    "Sec-Fetch-Mode": "navigate",
-    "Sec-Fetch-Site": "none",
-    "Sec-Fetch-User": "?1",
-    "Upgrade-Insecure-Requests": "1",
-    "Referer": "https://www.google.com/",
-    "Connection": "keep-alive",
-}
-
-
-# --- Función auxiliar para obtener el mínimo de 52 semanas desde Yahoo Finance ---
-def obtener_min_52_semanas(ticker):
-    """
-    Scrapes Yahoo Finance to get the 52-week low value from the 52 Week Range field.
-    Returns the lower value from a range like "177.00 - 488.54" -> 177.00
-    """
-    url = f"https://finance.yahoo.com/quote/{ticker}"
-    
-    try:
-        response = requests.get(url, headers=BROWSER_HEADERS, timeout=10)
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        # Look for the 52 Week Range element
-        # Find the fin-streamer with data-field="fiftyTwoWeekRange"
-        range_element = soup.find("fin-streamer", {"data-field": "fiftyTwoWeekRange"})
-        
-        if range_element:
-            range_text = range_element.get_text(strip=True)
-            # Parse the range like "177.00 - 488.54"
-            if " - " in range_text:
-                parts = range_text.split(" - ")
-                if len(parts) == 2:
-                    try:
-                        min_52_week = float(parts[0].strip())
-                        return round(min_52_week, 2)
-                    except ValueError:
-                        pass
-        
-        # Fallback: look for any element with title "52 Week Range"
-        range_label = soup.find("span", {"title": "52 Week Range"})
-        if range_label:
-            # Find the value span that follows
-            parent = range_label.find_parent()
-            if parent:
-                value_span = parent.find("span", class_="value")
-                if value_span:
-                    fin_streamer = value_span.find("fin-streamer")
-                    if fin_streamer:
-                        range_text = fin_streamer.get_text(strip=True)
-                        if " - " in range_text:
-                            parts = range_text.split(" - ")
-                            if len(parts) == 2:
-                                try:
-                                    min_52_week = float(parts[0].strip())
-                                    return round(min_52_week, 2)
-                                except ValueError:
-                                    pass
-        
-        return None
-        
-    except Exception as e:
-        print(f"Error scraping 52-week low para {ticker}: {e}")
-        return None
-
-
-# --- Función para buscar datos en Yahoo Finance ---
-def obtener_datos_yahoo(ticker):
-    try:
-        data = yf.Ticker(ticker)
-        hist = data.history(period="1y")
-        if hist.empty:
-            return None, None, None, None
-
-        precio_actual = round(hist['Close'].iloc[-1], 2)
-        hace_1_anio = round(hist['Close'].iloc[0], 2)
-        # Get 52-week low from Yahoo Finance scraping
-        min_1y = obtener_min_52_semanas(ticker)
-        min_1y = round(min_1y, 2) if min_1y is not None else None
-        target_yhoo = data.info.get('targetMeanPrice', None)
-        target_yhoo = round(target_yhoo, 2) if target_yhoo is not None else None
-
-        return precio_actual, target_yhoo, hace_1_anio, min_1y
-    except Exception as e:
-        print(f"Error en Yahoo para {ticker}: {e}")
-        return None, None, None, None
-
-
-# --- Scraping Target Price Morgan Stanley ---
-def obtener_target_morgan(ticker):
-    url = f"https://www.tipranks.com/stocks/{ticker.lower()}/forecast"
-    try:
-        response = requests.get(url, headers=BROWSER_HEADERS, timeout=10)
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        # Find the table body with analyst data (React Table structure)
-        table_body = soup.find("div", class_="rt-tbody")
-        if table_body:
-            # Find all table rows (rt-tr-group contains each analyst row)
-            row_groups = table_body.find_all("div", class_="rt-tr-group")
-            
-            for row_group in row_groups:
-                # Find the actual row within the group
-                row = row_group.find("div", class_="rt-tr")
-                if row:
-                    # Find all table cells
-                    cells = row.find_all("div", class_="rt-td")
-                    
-                    if len(cells) >= 3:  # Make sure we have enough columns
-                        # Expert Firm is the second column (index 1)
-                        expert_firm_cell = cells[1]
-                        expert_firm = expert_firm_cell.get_text(strip=True)
-                        
-                        # Check if this row is for Morgan Stanley
-                        if "Morgan Stanley" in expert_firm:
-                            # Price Target is the third column (index 2)
-                            price_target_cell = cells[2]
-                            
-                            # Look for the price target value within the cell
-                            # Handle both single values and ranges (e.g., $80 → $85)
-                            price_spans = price_target_cell.find_all("span", class_="Mdcvgxd7")
-                            
-                            if price_spans:
-                                try:
-                                    if len(price_spans) == 1:
-                                        # Single price target
-                                        price_target_text = price_spans[0].get_text(strip=True)
-                                        price_target = float(price_target_text.replace("$", "").replace(",", ""))
-                                        return round(price_target, 2)
-                                    else:
-                                        # Range: take the higher value (second span) for conservative estimate
-                                        high_target_text = price_spans[1].get_text(strip=True)
-                                        price_target = float(high_target_text.replace("$", "").replace(",", ""))
-                                        return round(price_target, 2)
-                                except ValueError:
-                                    pass
-                            else:
-                                # Fallback: get all text from the cell and parse ranges
-                                price_target_text = price_target_cell.get_text(strip=True)
-                                if price_target_text and price_target_text != "—":
-                                    try:
-                                        # Check if it's a range with arrow or dash
-                                        if "→" in price_target_text:
-                                            # Split by arrow and take the higher value
-                                            parts = price_target_text.split("→")
-                                            if len(parts) == 2:
-                                                high_value = parts[1].strip().replace("$", "").replace(",", "")
-                                                price_target = float(high_value)
-                                                return round(price_target, 2)
-                                        elif "–" in price_target_text or "-" in price_target_text:
-                                            # Handle dash ranges like $80-$85
-                                            separator = "–" if "–" in price_target_text else "-"
-                                            parts = price_target_text.split(separator)
-                                            if len(parts) == 2:
-                                                high_value = parts[1].strip().replace("$", "").replace(",", "")
-                                                price_target = float(high_value)
-                                                return round(price_target, 2)
-                                        else:
-                                            # Single value
-                                            price_target = float(price_target_text.replace("$", "").replace(",", ""))
-                                            return round(price_target, 2)
-                                    except ValueError:
-                                        pass
-        return None
-    except Exception as e:
-        print(f"Error scraping Morgan Stanley para {ticker}: {e}")
-        return None
-
-
-# -- Cálculo de Score (según lógica del PRD) --
-def calcular_score(nota, pesos):
-    # Extraer valores, convertir None a 0
-    tasa = nota.get("Tasa") or 0
-    colchon = nota.get("Colchón") or 0
-    memory = 1 if nota.get("Memory") else 0
-    precio_actual = nota.get("Precio actual") or 0
-    target_yahoo = nota.get("Target Yahoo") or 0
-    target_morgan = nota.get("Target MS") or 0
-    hace_1_anio = nota.get("Hace 1 año") or 0
-    min_1_anio = nota.get("Mín 1 año") or 0
-
-    # Pesos
-    p_tasa = pesos["Tasa"]
-    p_colchon = pesos["Colchón"]
-    p_memory = pesos["Memory"]
-    p_yahoo = pesos["Target Yahoo"]
-    p_ms = pesos["Target MS"]
-    p_1y = pesos["1 Año"]
-    p_min1y = pesos["Mín 1 Año"]
-
-    # Trigger
-    try:
-        trigger = precio_actual * (100 - colchon) / 100 if precio_actual and colchon is not None else 0
-    except Exception:
-        trigger = 0
-
-    # Evitar divisiones por cero
-    def safe_div(n, d):
-        try:
-            return n / d if d else 0
-        except:
-            return 0
-
-    # Términos polinómicos
-    t1 = tasa * p_tasa / 20
-    t2 = colchon * p_colchon / 100
-    t3 = memory * p_memory
-    t4 = ((safe_div(target_yahoo, precio_actual) - 1) * p_yahoo if precio_actual else 0)
-    t5 = ((safe_div(target_morgan, precio_actual) - 1) * p_ms if precio_actual else 0)
-    t6 = (safe_div(hace_1_anio, trigger) * p_1y if trigger else 0)
-    t7 = (safe_div(min_1_anio, trigger) * p_min1y if trigger else 0)
-
-    score = t1 + t2 + t3 + t4 + t5 + t6 + t7
-    return round(score, 2)
+
+# -- Recursos de proceso: se crean una vez y se comparten entre sesiones y reruns --
+@st.cache_resource
+def motor_score():
+    return MotorScore()
+
+
+@st.cache_resource
+def cache_mercado():
+    return obtener_cache()
+
+
+@st.cache_resource
+def simulador():
+    return SimuladorNotas()
+
+
+@st.cache_resource
+def cartera():
+    return CarteraNotas()
+
+
+# Endpoint /metrics (formato Prometheus) opcional, uno por proceso
+@st.cache_resource
+def servidor_metricas(puerto):
+    return servir_metricas(puerto)
+
+
+PUERTO_METRICAS = os.environ.get("AUTO_NOTES_METRICAS_PUERTO")
+if PUERTO_METRICAS:
+    servidor_metricas(int(PUERTO_METRICAS))
+
+
+# yfinance con errores visibles (las fallas de red no son tickers sin datos), una vez por proceso
+@st.cache_resource
+def yfinance_configurado():
+    configurar_yfinance()
+
+
+yfinance_configurado()
+
 
 # Título de la app
 st.title("Structured Investment Pro 📈")
@@ -248,26 +82,29 @@ st.title("Structured Investment Pro 📈")
 if "notas" not in st.session_state:
     st.session_state["notas"] = []
 if "pesos" not in st.session_state:
-    st.session_state["pesos"] = {
-        "Tasa": 0.15,
-        "Colchón": 0.34,
-        "Memory": 0.24,
-        "Target Yahoo": 0.09,
-        "Target MS": 0.09,
-        "1 Año": 0.09,
-        "Mín 1 Año": 0.09,
-    }
+    st.session_state["pesos"] = dict(PESOS_DEFAULT)
 if "reset" not in st.session_state:
     st.session_state["reset"] = False
 if "edit_mode" not in st.session_state:
     st.session_state["edit_mode"] = False
+if "refrescador" not in st.session_state:
+    st.session_state["refrescador"] = Refrescador()
+    st.session_state["refresco_version"] = 0
+if "sincronizador" not in st.session_state:
+    st.session_state["sincronizador"] = SincronizadorCartera(cartera())
+
+# -- Cartera persistente: la primera vez restaura todas las notas guardadas (sin requests), --
+# -- después solo trae lo que escribieron otras sesiones --
+st.session_state["sincronizador"].cargar(st.session_state["notas"])
 
 # -- Formulario de Inputs --
 with st.form("input_form", clear_on_submit=True):
     st.subheader("Agregar nueva nota")
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        ticker = st.text_input("Ticker", max_chars=8)
+        ticker = st.text_input(
+            "Ticker", max_chars=40, help="Para una nota worst-of, los subyacentes separados por /: AAPL/NVDA/MSFT"
+        )
     with col2:  # format in 0.00
         tasa = st.number_input("Tasa (%)", min_value=0.0, max_value=100.0, step=1.0, format="%.2f")
     with col3:
@@ -278,7 +115,10 @@ with st.form("input_form", clear_on_submit=True):
 
     # Al agregar, guardamos en session_state y buscamos datos automáticamente
     if submitted:
-        if ticker and len(st.session_state["notas"]) < 20:
+        ticker = normalizar_ticker(ticker)
+        if len(subyacentes(ticker)) > MAX_SUBYACENTES:
+            st.warning(f"Una canasta worst-of admite hasta {MAX_SUBYACENTES} subyacentes.")
+        elif ticker:
             # Mostrar spinner mientras se buscan los datos
             with st.spinner(f"Agregando {ticker.upper()}..."):
                 # Crear nota básica
@@ -289,19 +129,14 @@ with st.form("input_form", clear_on_submit=True):
                     "Memory": memory,
                 }
                 
-                # Buscar datos de internet automáticamente
+                # Buscar datos de internet automáticamente (todas las fuentes en paralelo)
                 try:
-                    # --- Yahoo Finance ---
-                    precio_actual, target_yhoo, hace_1_anio, min_1y = obtener_datos_yahoo(ticker.upper())
-                    # --- Morgan Stanley ---
-                    target_morgan = obtener_target_morgan(ticker.upper())
-                    
                     # Agregar datos obtenidos a la nota
-                    nueva_nota["Precio actual"] = precio_actual
-                    nueva_nota["Target Yahoo"] = target_yhoo
-                    nueva_nota["Hace 1 año"] = hace_1_anio
-                    nueva_nota["Mín 1 año"] = min_1y
-                    nueva_nota["Target MS"] = target_morgan
+                    nueva_nota.update(obtener_datos_nota(
+                        ticker.upper(),
+                        verificar=st.session_state.get("verificar_min_52", False),
+                        brokers=st.session_state.get("brokers", []),
+                    ))
                     
                     # Calcular score automáticamente
                     score = calcular_score(nueva_nota, st.session_state["pesos"])
@@ -324,14 +159,77 @@ with st.form("input_form", clear_on_submit=True):
                     st.session_state["notas"].append(nueva_nota)
                     st.warning(f"⚠️ {ticker.upper()} agregado con score {score}, pero hubo problemas obteniendo algunos datos de internet.")
                     
-        elif not ticker:
+        else:
             st.warning("Ingrese un ticker válido.")
-        elif len(st.session_state["notas"]) >= 20:
-            st.warning("Máximo 20 notas.")
+
+# -- Carga masiva de notas --
+with st.expander("📋 Carga masiva"):
+    with st.form("bulk_form", clear_on_submit=True):
+        st.write("Una nota por línea: Ticker, Tasa, Colchón, Memory (header opcional). También puede subir un CSV.")
+        texto_lote = st.text_area("Notas", placeholder="AAPL, 12.5, 30, si\nNVDA, 10, 35, no")
+        archivo_lote = st.file_uploader("Archivo CSV", type=["csv", "txt"])
+        submitted_lote = st.form_submit_button("Agregar notas")
+
+    if submitted_lote:
+        texto = archivo_lote.getvalue().decode("utf-8-sig") if archivo_lote else texto_lote
+        try:
+            notas_lote = leer_notas(texto)
+        except Exception as e:
+            notas_lote = []
+            st.warning(f"No se pudo leer la lista de notas: {e}")
+
+        if notas_lote:
+            with st.spinner(f"Agregando {len(notas_lote)} notas..."):
+                # Un solo download de historiales para todo el lote
+                datos_lote = obtener_datos_notas(
+                    [nota["Ticker"] for nota in notas_lote],
+                    verificar=st.session_state.get("verificar_min_52", False),
+                    brokers=st.session_state.get("brokers", []),
+                )
+                for nota in notas_lote:
+                    nota.update(datos_lote[nota["Ticker"]])
+                scores_lote = calcular_scores(notas_lote, st.session_state["pesos"])
+                for nota, score in zip(notas_lote, scores_lote):
+                    nota["Score"] = float(score)
+                st.session_state["notas"].extend(notas_lote)
+            sin_datos = [nota["Ticker"] for nota in notas_lote if nota["Precio actual"] is None]
+            st.success(f"✅ {len(notas_lote)} notas agregadas!")
+            if sin_datos:
+                st.warning(f"⚠️ Sin datos de Yahoo para: {', '.join(sin_datos)}")
+        elif not texto.strip():
+            st.warning("Ingrese al menos una nota.")
 
 # -- Edición de Pesos Ponderados --
 with st.expander("⚙️ Configurar pesos del motor"):
-    st.write("Modifique los pesos de cada variable (suma no obligatoria = 1):")
+    # Targets de otros brokers: salen de la misma página de TipRanks que Target MS (sin requests extra)
+    brokers = st.multiselect(
+        "Targets de otros brokers (cada uno suma un término al score con su peso)",
+        [alias for alias in BROKERS if alias != "MS"],
+        format_func=lambda alias: f"{BROKERS[alias]} ({alias})",
+        key="brokers",
+    )
+    columnas_brokers = [columna_broker(alias) for alias in brokers]
+    # Simulación Monte Carlo de barrera y cupones: agrega el término Retorno MC
+    simulacion_activa = st.checkbox(
+        "Simulación Monte Carlo de barrera y cupones (término Retorno MC)",
+        key="simulacion_activa",
+        help=f"{CAMINOS} caminos por nota con la volatilidad del historial de 1 año; plazo de 1 año con "
+             "cupones trimestrales y barrera en el trigger (precio × (100 − Colchón) / 100).",
+    )
+    columnas_simulacion = COLUMNAS_SIMULACION if simulacion_activa else []
+    extras = columnas_brokers + ([TERMINO_SIMULACION] if simulacion_activa else [])
+    # Un broker quitado (o la simulación apagada) deja de pesar y de mostrarse en la tabla
+    for termino in [t for t in st.session_state["pesos"] if t not in TERMINOS and t not in extras]:
+        del st.session_state["pesos"][termino]
+        for nota in st.session_state["notas"]:
+            nota.pop(termino, None)
+    if not simulacion_activa:
+        for nota in st.session_state["notas"]:
+            for columna in COLUMNAS_SIMULACION:
+                nota.pop(columna, None)
+    for columna in extras:
+        st.session_state["pesos"].setdefault(columna, 0.0)
+    st.write("Modifique los pesos de cada variable (suma no obligatoria = 1). Los scores se recalculan al instante:")
     for key in st.session_state["pesos"]:
         valor = st.number_input(
             f"Peso para {key}",
@@ -341,56 +239,188 @@ with st.expander("⚙️ Configurar pesos del motor"):
         )
         st.session_state["pesos"][key] = valor
 
+# -- Actualización automática de datos de mercado (en segundo plano) --
+# El hilo del refrescador hace todo el I/O; acá solo se aplica el último resultado ya terminado.
+refrescador = st.session_state["refrescador"]
+with st.expander("🔄 Actualización automática"):
+    refresco_activo = st.checkbox(
+        "Actualizar precios y scores automáticamente",
+        key="refresco_activo",
+        help="Vuelve a buscar los datos de mercado de todas las notas cargadas sin bloquear la app. "
+             "Los valores corregidos a mano se reemplazan en la siguiente actualización.",
+    )
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        minutos_mercado = st.number_input(
+            "Cada (minutos) con el mercado abierto", min_value=1, max_value=240,
+            value=INTERVALO_MERCADO // 60, step=1, key="refresco_min_mercado",
+        )
+    with col2:
+        minutos_fuera = st.number_input(
+            "Cada (minutos) con el mercado cerrado", min_value=5, max_value=24 * 60,
+            value=INTERVALO_FUERA // 60, step=5, key="refresco_min_fuera",
+        )
+    with col3:
+        if st.button("Actualizar ahora", disabled=not refresco_activo, key="refrescar_ahora"):
+            refrescador.refrescar_ahora()
+    refrescador.intervalo_mercado = minutos_mercado * 60
+    refrescador.intervalo_fuera = minutos_fuera * 60
+
+# Columnas de brokers recién elegidos, desde los analistas ya cacheados
+completar_brokers(st.session_state["notas"], brokers)
+
+refrescador.seguir(
+    [nota["Ticker"] for nota in st.session_state["notas"]],
+    verificar=st.session_state.get("verificar_min_52", False),
+    brokers=brokers,
+)
+if refresco_activo and st.session_state["notas"]:
+    refrescador.iniciar()
+else:
+    refrescador.detener()
+st.session_state["refresco_version"] = refrescador.aplicar(
+    st.session_state["notas"], st.session_state["refresco_version"]
+)
+
+# Simulación con los precios ya aplicados; solo se simulan las notas nuevas o con datos cambiados
+if simulacion_activa and st.session_state["notas"]:
+    for nota, resultado in zip(st.session_state["notas"], simulador().simular(st.session_state["notas"])):
+        nota.update(resultado)
+
+# Canastas worst-of: colchón mínimo con el Colchón y el peor subyacente actuales
+hay_canastas = any(es_canasta(nota["Ticker"]) for nota in st.session_state["notas"])
+columnas_canasta = ["Correlación", "Colchón mín"] if hay_canastas else []
+if hay_canastas:
+    for nota, colchon_min in zip(st.session_state["notas"], colchon_minimo(st.session_state["notas"])):
+        if es_canasta(nota["Ticker"]):
+            nota["Colchón mín"] = colchon_min
+
+
+# Revisa cada tanto si terminó un refresco nuevo y en ese caso rerenderiza la app
+@st.fragment(run_every=30 if refresco_activo else None)
+def estado_refresco():
+    if refrescador.version > st.session_state["refresco_version"]:
+        st.rerun()
+    if refrescador.ultimo_refresco or refresco_activo:
+        estado = "mercado abierto" if mercado_abierto() else "mercado cerrado"
+        ultimo = refrescador.ultimo_refresco.strftime("%H:%M:%S") if refrescador.ultimo_refresco else "—"
+        st.caption(
+            f"Última actualización: {ultimo} ({estado})"
+            + (" · actualizando..." if refrescador.en_curso else "")
+        )
+
+
+estado_refresco()
+
+# -- Rescore incremental: los scores siempre reflejan los pesos actuales --
+# Solo se recombinan las bases cacheadas de cada nota; los vectores de pesos ya usados están memoizados.
+if st.session_state["notas"]:
+    scores = motor_score().scores(st.session_state["notas"], st.session_state["pesos"])
+    for nota, score in zip(st.session_state["notas"], scores.tolist()):
+        nota["Score"] = score
+
+# Guardar en la cartera solo las notas nuevas, editadas o borradas (el Score no se guarda)
+st.session_state["sincronizador"].guardar(st.session_state["notas"])
+
+# -- Sensibilidad del ranking a los pesos --
+# Miles de vectores de pesos en un producto de matrices sobre las bases ya cacheadas del motor.
+with st.expander("🎯 Sensibilidad a los pesos"):
+    if not st.session_state["notas"]:
+        st.write("Cargue notas para analizar la sensibilidad.")
+    elif st.checkbox("Analizar qué tan robusto es el ranking a los pesos", key="sensibilidad_activa"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            modo = st.radio(
+                "Vectores de pesos", [PERTURBACION, GRILLA], horizontal=True, key="sensibilidad_modo",
+                format_func=lambda m: "Perturbación aleatoria" if m == PERTURBACION else "Grilla (±, 3 niveles)",
+            )
+        with col2:
+            amplitud = st.slider("Variación de cada peso (%)", 5, 50, 25, step=5, key="sensibilidad_amplitud") / 100
+        # Con más de siete términos la grilla sería enorme: se muestrea igual que en la perturbación
+        grilla_completa = modo == GRILLA and tamanio_grilla(st.session_state["pesos"]) <= MAX_VECTORES_GRILLA
+        with col3:
+            muestras = st.select_slider(
+                "Muestras", [500, 1000, 2000, 5000], value=2000, key="sensibilidad_muestras",
+                disabled=grilla_completa,
+            )
+        _, bases = motor_score().matriz_bases(st.session_state["notas"], terminos_extra(st.session_state["pesos"]))
+        analisis = analizar_sensibilidad(
+            st.session_state["notas"], st.session_state["pesos"], modo=modo, n=muestras, amplitud=amplitud, bases=bases
+        )
+        st.caption(
+            f"{analisis['vectores']} vectores de pesos · estabilidad del ranking (Spearman medio): "
+            f"{analisis['estabilidad']:.3f}"
+            + (" · muestreo aleatorio: la grilla de todos los términos sería demasiado grande"
+               if modo != analisis["modo"] else "")
+        )
+        st.write("Por nota: rango con los pesos actuales, rango entre vectores y probabilidad de quedar en verde:")
+        st.dataframe(
+            analisis["notas"], use_container_width=True, hide_index=True,
+            column_config={"P(verde)": st.column_config.ProgressColumn("P(verde)", min_value=0.0, max_value=1.0)},
+        )
+        st.write(f"Importancia de cada peso (variándolo solo en ±{amplitud:.0%}):")
+        st.dataframe(analisis["pesos"], use_container_width=True, hide_index=True)
+
+# -- Verificación del mínimo de 52 semanas --
+with st.expander("🔎 Verificación de datos"):
+    st.checkbox(
+        "Verificar Mín 1 año contra el scraping de Yahoo",
+        key="verificar_min_52",
+        help="El mínimo se calcula del historial. Activar para scrapear también Yahoo y reportar diferencias (más lento).",
+    )
+    if DISCREPANCIAS_MIN_52:
+        st.dataframe(pd.DataFrame(list(DISCREPANCIAS_MIN_52)), use_container_width=True)
+    else:
+        st.write("Sin discrepancias registradas.")
+
 # -- Visualización de la tabla de notas --
 st.subheader("Notas cargadas")
 if st.session_state["notas"]:
     df = pd.DataFrame(st.session_state["notas"])
     
+    # Filtro, orden y paginación del lado del servidor: solo se renderiza la página visible
+    col1, col2, col3, col4, col5 = st.columns([2, 2, 1, 1, 1])
+    with col1:
+        filtro = st.text_input("Filtrar por ticker", key="filtro_tabla")
+    with col2:
+        columnas_orden = [col for col in df.columns if col != "Memory"]
+        orden = st.selectbox(
+            "Ordenar por", columnas_orden,
+            index=columnas_orden.index("Score") if "Score" in columnas_orden else 0,
+            key="orden_tabla",
+        )
+    with col3:
+        ascendente = st.checkbox("Ascendente", key="orden_ascendente")
+    with col4:
+        tamanio = st.selectbox("Por página", TAMANIOS_PAGINA, key="tamanio_pagina")
+    _, total_filtrado, total_paginas = paginar(df, filtro, tamanio=tamanio)
+    if st.session_state.get("pagina_tabla", 1) > total_paginas:
+        st.session_state["pagina_tabla"] = total_paginas
+    df_pagina, total_filtrado, total_paginas = paginar(
+        df, filtro, orden, ascendente, st.session_state.get("pagina_tabla", 1), tamanio
+    )
+    with col5:
+        pagina = st.number_input("Página", min_value=1, max_value=total_paginas, step=1, key="pagina_tabla")
+    # Posiciones (en la lista de notas) de las notas visibles, para el modal de edición
+    st.session_state["indices_visibles"] = df_pagina.index.tolist()
+    
     # Check if we have internet-sourced data to edit
     has_internet_data = any(
         any(key in nota for key in ["Precio actual", "Target Yahoo", "Hace 1 año", "Mín 1 año", "Target MS"])
         for nota in st.session_state["notas"]
     )
     
-    # Funciones para el semáforo
-    def calcular_percentil_score(val, scores):
-        """
-        Calcula el percentil relativo de un valor dentro del rango de scores.
-        Retorna un valor entre 0 y 1.
-        """
-        if len(scores) == 0:
-            return 1
-        
-        max_score = max(scores)
-        min_score = min(scores)
-        
-        if max_score - min_score > 0:
-            return (val - min_score) / (max_score - min_score)
-        else:
-            return 1  # Todos los scores son iguales, asignar el mejor color
-
-    def color_semaforo(val):
-        # Colores tipo semáforo usando percentiles relativos (igual que Excel)
-        if "Score" in df.columns:
-            try:
-                scores = df["Score"].dropna().values
-                if len(scores) > 0:
-                    percentil = calcular_percentil_score(val, scores)
-                    
-                    if percentil >= 0.66:
-                        return "background-color: #99FF99; color: black;"  # Verde (mismo que Excel)
-                    elif percentil >= 0.33:
-                        return "background-color: #FFFF99; color: black;"  # Amarillo (mismo que Excel)
-                    else:
-                        return "background-color: #FF9999; color: black;"  # Rojo (mismo que Excel)
-            except:
-                return ""
-        return ""
+    # Semáforo: bandas calculadas una sola vez sobre todas las notas (no por celda)
+    if "Score" in df.columns:
+        bandas_score = pd.Series(bandas(df["Score"]), index=df.index)
+
+    def color_semaforo(columna):
+        return [estilo_css(banda) for banda in bandas_score.loc[columna.index]]
     
     # Mostrar tabla única con semáforo si hay scores
     if "Score" in df.columns:
         # Formatear columnas numéricas a 2 decimales
-        numeric_columns = ["Tasa", "Colchón", "Precio actual", "Target Yahoo", "Hace 1 año", "Mín 1 año", "Target MS", "Score"]
+        numeric_columns = ["Tasa", "Colchón", "Precio actual", "Target Yahoo", "Hace 1 año", "Mín 1 año", "Target MS", "Score"] + columnas_brokers + columnas_simulacion + columnas_canasta
         format_dict = {}
         for col in numeric_columns:
             if col in df.columns:
@@ -398,19 +428,19 @@ if st.session_state["notas"]:
                 format_dict[col] = lambda x: f"{x:.2f}" if pd.notna(x) else ""
         
         st.dataframe(
-            df.style.map(color_semaforo, subset=["Score"]).format(format_dict),
+            df_pagina.style.apply(color_semaforo, subset=["Score"]).format(format_dict),
             use_container_width=True
         )
     else:
         # Formatear columnas numéricas a 2 decimales (sin semáforo)
-        numeric_columns = ["Tasa", "Colchón", "Precio actual", "Target Yahoo", "Hace 1 año", "Mín 1 año", "Target MS", "Score"]
+        numeric_columns = ["Tasa", "Colchón", "Precio actual", "Target Yahoo", "Hace 1 año", "Mín 1 año", "Target MS", "Score"] + columnas_brokers + columnas_simulacion + columnas_canasta
         format_dict = {}
         for col in numeric_columns:
             if col in df.columns:
                 # Use lambda to handle None values properly
                 format_dict[col] = lambda x: f"{x:.2f}" if pd.notna(x) else ""
         
-        st.dataframe(df.style.format(format_dict), use_container_width=True)
+        st.dataframe(df_pagina.style.format(format_dict), use_container_width=True)
     
     # Botones debajo de la tabla
     col1, col2, col3 = st.columns([2, 1, 1])
@@ -424,40 +454,9 @@ if st.session_state["notas"]:
     
     # Botón para exportar a Excel (solo si hay scores)
     if "Score" in df.columns and not df["Score"].isnull().all():
-        def exportar_excel_semaforo(df):
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine="openpyxl") as writer:
-                df.to_excel(writer, index=False, sheet_name="Notas")
-                workbook = writer.book
-                worksheet = writer.sheets["Notas"]
-                # Determinar la columna "Score"
-                score_col = None
-                for idx, col in enumerate(df.columns, 1):
-                    if col == "Score":
-                        score_col = idx
-                        break
-                # Solo si hay Score y más de 1 nota
-                if score_col is not None and len(df) > 0:
-                    scores = df["Score"].dropna().values
-                    for row in range(2, len(df) + 2):  # Desde fila 2 (1 es header)
-                        cell = worksheet.cell(row=row, column=score_col)
-                        val = cell.value
-                        if val is not None:
-                            # Usar la misma lógica de percentiles que la UI
-                            percentil = calcular_percentil_score(val, scores)
-                            
-                            if percentil >= 0.66:
-                                fill = PatternFill(start_color="99FF99", end_color="99FF99", fill_type="solid")  # Verde
-                            elif percentil >= 0.33:
-                                fill = PatternFill(start_color="FFFF99", end_color="FFFF99", fill_type="solid")  # Amarillo
-                            else:
-                                fill = PatternFill(start_color="FF9999", end_color="FF9999", fill_type="solid")  # Rojo
-                            cell.fill = fill
-            output.seek(0)
-            return output
-        
         with col2:
-            excel_data = exportar_excel_semaforo(df)
+            # Bytes cacheados por contenido: un rerun sin cambios no vuelve a exportar
+            excel_data = exportar_excel_cacheado(df, st.session_state["pesos"])
             today = datetime.datetime.now().strftime("%Y-%m-%d")
             st.download_button(
                 label="📥 Descargar Excel",
@@ -466,11 +465,53 @@ if st.session_state["notas"]:
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             )
     
-    st.info(f"Total notas cargadas: {len(st.session_state['notas'])}/20")
+    if total_filtrado:
+        inicio = (min(pagina, total_paginas) - 1) * tamanio
+        st.caption(
+            f"Mostrando {inicio + 1}–{inicio + len(df_pagina)} de {total_filtrado} notas"
+            + (" (filtradas)" if filtro else "")
+        )
+    st.info(f"Total notas cargadas: {len(st.session_state['notas'])}")
     
 else:
     st.info("No hay notas cargadas aún.")
 
+stats_cache = cache_mercado().estadisticas()
+stats_vuelos = COALESCEDOR.estadisticas()
+stats_cartera = cartera().estadisticas()
+st.caption(
+    f"Cache de mercado: {stats_cache['hits']} hits · {stats_cache['misses']} misses · "
+    f"{stats_cache['vencidos']} vencidos servidos · {stats_cache['negativos']} sin datos recordados · "
+    f"{stats_cache['entradas']} entradas · {stats_vuelos['ahorradas']} búsquedas compartidas entre sesiones"
+)
+fuentes_caidas = {host: estado for host, estado in estados_circuitos().items() if estado != CERRADO}
+if fuentes_caidas:
+    st.caption(
+        "⚡ Fuentes salteadas por fallas repetidas: "
+        + ", ".join(f"{host} ({estado})" for host, estado in fuentes_caidas.items())
+    )
+if stats_cartera["notas"]:
+    st.caption(
+        f"Cartera guardada: {stats_cartera['notas']} notas · datos de mercado más antiguos del "
+        + datetime.datetime.fromtimestamp(stats_cartera["buscado_mas_antiguo"]).strftime("%d/%m %H:%M")
+    )
+
+# -- Diagnóstico: tiempos por etapa y contadores de cache/HTTP del proceso --
+with st.expander("📊 Diagnóstico"):
+    etapas = REGISTRO.etapas()
+    if etapas:
+        st.write("Tiempos por etapa (fetchers, parsers y búsquedas):")
+        st.dataframe(pd.DataFrame(etapas), use_container_width=True, hide_index=True)
+        st.write("Contadores (cache, requests, reintentos y errores por host):")
+        st.dataframe(pd.DataFrame(REGISTRO.contadores()), use_container_width=True, hide_index=True)
+    else:
+        st.write("Todavía no hay mediciones.")
+    st.download_button(
+        "📥 Métricas (Prometheus)", texto_prometheus(), file_name="auto_notes.prom", mime="text/plain"
+    )
+    if PUERTO_METRICAS:
+        st.caption(f"Endpoint: http://127.0.0.1:{PUERTO_METRICAS}/metrics")
+
 # -- Modal de edición (fuera del bloque condicional) --
 # Show modal if edit mode is active
 if st.session_state.get("edit_mode", False):
@@ -501,12 +542,18 @@ if st.session_state.get("edit_mode", False):
                     st.session_state["confirm_delete_index"] = None
                     st.rerun()
         
+        # Solo se editan las notas de la página visible de la tabla
+        indices_visibles = [
+            i for i in st.session_state.get("indices_visibles", []) if i < len(st.session_state["notas"])
+        ]
+        
         # Botones de eliminación individuales
-        if len(st.session_state["notas"]) > 0:
+        if indices_visibles:
             st.subheader("Eliminar notas")
-            cols = st.columns(len(st.session_state["notas"]))
-            for i, nota in enumerate(st.session_state["notas"]):
-                with cols[i]:
+            cols = st.columns(min(len(indices_visibles), 6))
+            for pos, i in enumerate(indices_visibles):
+                nota = st.session_state["notas"][i]
+                with cols[pos % len(cols)]:
                     if st.button(f"🗑️ {nota['Ticker']}", key=f"delete_modal_{i}", help=f"Eliminar {nota['Ticker']}"):
                         st.session_state["confirm_delete_index"] = i
                         st.rerun()
@@ -519,7 +566,8 @@ if st.session_state.get("edit_mode", False):
         with st.form("edit_form"):
             edited_notas = []
             
-            for i, nota in enumerate(st.session_state["notas"]):
+            for pos, i in enumerate(indices_visibles):
+                nota = st.session_state["notas"][i]
                 st.write(f"**{nota['Ticker']}**")
                 
                 # Primera fila: Campos originales editables
@@ -612,20 +660,21 @@ if st.session_state.get("edit_mode", False):
                 nota_editada["Hace 1 año"] = hace_1_anio if hace_1_anio > 0 else None
                 nota_editada["Mín 1 año"] = min_1_anio if min_1_anio > 0 else None
                 nota_editada["Target MS"] = target_morgan if target_morgan > 0 else None
-                edited_notas.append(nota_editada)
-                if i < len(st.session_state["notas"]) - 1:
+                edited_notas.append((i, nota_editada))
+                if pos < len(indices_visibles) - 1:
                     st.divider()
             
             # Form buttons
             col1, col2, col3 = st.columns([1, 1, 2])
             with col1:
                 if st.form_submit_button("Guardar", type="primary"):
-                    # Recalcular scores para todas las notas editadas
-                    for nota in edited_notas:
-                        score = calcular_score(nota, st.session_state["pesos"])
-                        nota["Score"] = score
+                    # Recalcular scores para todas las notas editadas (en un solo paso)
+                    scores = calcular_scores([nota for _, nota in edited_notas], st.session_state["pesos"])
+                    for (i, nota), score in zip(edited_notas, scores):
+                        nota["Score"] = float(score)
+                        # En el lugar: la nota sigue vinculada a su fila de la cartera
+                        st.session_state["notas"][i].update(nota)
                     
-                    st.session_state["notas"] = edited_notas
                     st.session_state["edit_mode"] = False
                     st.success("Cambios guardados y scores recalculados exitosamente!")
                     st.rerun()
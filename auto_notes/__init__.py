@@ -0,0 +1,3 @@
+"""
+Núcleo de Structured Investment Pro: datos de mercado y scoring de notas.
+"""
@@ -0,0 +1,227 @@
+"""
+Cache persistente (SQLite) de datos de mercado con TTL por tipo de dato.
+
+Se comparte entre sesiones y procesos a través del archivo en el directorio
+de datos. Si la fuente falla (rate limit, timeout) y hay un valor vencido en
+el cache, se devuelve ese valor en lugar de None.
+
+Cache negativo: cuando la fuente responde sin datos para un ticker (ticker
+inválido, página sin la tabla), el par (tipo, ticker) se recuerda TTL_NEGATIVO
+segundos y no se vuelve a pedir en ese lapso.
+"""
+import functools
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from auto_notes import metricas
+from auto_notes.circuitos import CircuitoAbierto
+from auto_notes.coalescencia import COALESCEDOR
+
+log = logging.getLogger(__name__)
+
+DIRECTORIO_DATOS = Path(os.environ.get("AUTO_NOTES_DATA_DIR", Path(__file__).resolve().parent.parent / "data"))
+
+# TTL en segundos por tipo de dato
+TTLS = {
+    "historial": 15 * 60,        # precios: minutos
+    "target_yahoo": 24 * 3600,   # targets de analistas: un día
+    "analistas": 24 * 3600,      # filas de analistas de TipRanks (todos los brokers)
+    "min_52": 6 * 3600,          # mínimo de 52 semanas: horas
+}
+
+# TTL (segundos) de los pares (tipo, ticker) sin datos: corto, por si fue un problema pasajero
+TTL_NEGATIVO = 10 * 60
+
+MAX_ENTRADAS = 5000
+
+
+class CacheMercado:
+    def __init__(self, ruta=None, ttls=None, max_entradas=MAX_ENTRADAS, ttl_negativo=TTL_NEGATIVO):
+        ruta = Path(ruta) if ruta else DIRECTORIO_DATOS / "cache_mercado.sqlite"
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        self.ruta = ruta
+        self.ttls = dict(TTLS, **(ttls or {}))
+        self.max_entradas = max_entradas
+        self.ttl_negativo = ttl_negativo
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(ruta), check_same_thread=False, timeout=10)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " tipo TEXT NOT NULL, clave TEXT NOT NULL, valor BLOB NOT NULL,"
+                " guardado REAL NOT NULL, acceso REAL NOT NULL,"
+                " PRIMARY KEY (tipo, clave))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS cache_acceso ON cache (acceso)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS negativos ("
+                " tipo TEXT NOT NULL, clave TEXT NOT NULL, guardado REAL NOT NULL,"
+                " PRIMARY KEY (tipo, clave))"
+            )
+        self.hits = 0
+        self.misses = 0
+        self.vencidos = 0   # valores vencidos servidos porque la fuente falló
+        self.negativos = 0  # búsquedas evitadas por el cache negativo
+
+    def leer(self, tipo, clave, permitir_vencido=False):
+        """
+        Retorna el valor cacheado o None si no existe (o venció, salvo
+        permitir_vencido=True).
+        """
+        ahora = time.time()
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT valor, guardado FROM cache WHERE tipo = ? AND clave = ?", (tipo, clave)
+            ).fetchone()
+            if fila is None:
+                return None
+            valor, guardado = fila
+            if not permitir_vencido and ahora - guardado > self.ttls.get(tipo, 0):
+                return None
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE cache SET acceso = ? WHERE tipo = ? AND clave = ?", (ahora, tipo, clave)
+                )
+        return pickle.loads(valor)
+
+    def guardado(self, tipo, clave):
+        """
+        Momento (time.time) en que se guardó el valor de (tipo, clave), o None; no lo lee.
+        """
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT guardado FROM cache WHERE tipo = ? AND clave = ?", (tipo, clave)
+            ).fetchone()
+        return fila[0] if fila else None
+
+    def guardar(self, tipo, clave, valor):
+        ahora = time.time()
+        blob = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (tipo, clave, valor, guardado, acceso) VALUES (?, ?, ?, ?, ?)",
+                (tipo, clave, blob, ahora, ahora),
+            )
+            self._conn.execute("DELETE FROM negativos WHERE tipo = ? AND clave = ?", (tipo, clave))
+            # Desalojo LRU cuando se supera el tamaño máximo
+            total = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            if total > self.max_entradas:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY acceso LIMIT ?)",
+                    (total - self.max_entradas,),
+                )
+
+    def es_negativo(self, tipo, clave):
+        """
+        True si la fuente respondió sin datos para (tipo, clave) hace menos de ttl_negativo.
+        """
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT guardado FROM negativos WHERE tipo = ? AND clave = ?", (tipo, clave)
+            ).fetchone()
+        return fila is not None and time.time() - fila[0] <= self.ttl_negativo
+
+    def guardar_negativo(self, tipo, clave):
+        ahora = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO negativos (tipo, clave, guardado) VALUES (?, ?, ?)", (tipo, clave, ahora)
+            )
+            self._conn.execute("DELETE FROM negativos WHERE guardado < ?", (ahora - self.ttl_negativo,))
+
+    def contar(self, contador, tipo=None):
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + 1)
+        metricas.contar("auto_notes_cache_total", tipo=tipo or "", resultado=contador)
+
+    def limpiar(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.execute("DELETE FROM negativos")
+
+    def estadisticas(self):
+        with self._lock:
+            entradas = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "vencidos": self.vencidos,
+                "negativos": self.negativos, "entradas": entradas}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache():
+    """
+    Cache compartido por el proceso (se crea en el primer uso).
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CacheMercado()
+        return _cache
+
+
+def cacheado(tipo):
+    """
+    Decorador para fetchers fn(ticker). fn retorna None si la fuente respondió
+    sin datos (se guarda en el cache negativo) y lanza una excepción si falló
+    (se registra y no se recuerda). En ambos casos, y con el circuito del host
+    abierto, se usa el último valor conocido aunque esté vencido.
+    Los misses concurrentes del mismo (tipo, ticker) comparten una sola llamada
+    a la fuente (auto_notes.coalescencia).
+    """
+    def decorador(fn):
+        def buscar(cache, ticker):
+            # Otro vuelo pudo haber guardado el valor entre el miss y este punto
+            valor = cache.leer(tipo, ticker)
+            if valor is None and not cache.es_negativo(tipo, ticker):
+                valor = fn(ticker)
+                if valor is None:
+                    cache.guardar_negativo(tipo, ticker)
+                else:
+                    cache.guardar(tipo, ticker, valor)
+            return valor
+
+        @functools.wraps(fn)
+        def envoltura(ticker):
+            cache = obtener_cache()
+            valor = cache.leer(tipo, ticker)
+            if valor is not None:
+                cache.contar("hits", tipo)
+                return valor
+            if cache.es_negativo(tipo, ticker):
+                cache.contar("negativos", tipo)
+            else:
+                cache.contar("misses", tipo)
+                try:
+                    valor = COALESCEDOR.hacer((tipo, ticker), lambda: buscar(cache, ticker))
+                except CircuitoAbierto:
+                    pass  # ya contado en auto_notes_circuito_salteadas_total
+                except Exception as e:
+                    log.warning("Error en %s para %s: %s", tipo, ticker, e)
+                    metricas.contar("auto_notes_fuente_errores_total", fuente=tipo)
+                if valor is not None:
+                    return valor
+            vencido = cache.leer(tipo, ticker, permitir_vencido=True)
+            if vencido is not None:
+                cache.contar("vencidos", tipo)
+            return vencido
+        return envoltura
+    return decorador
+
+
+def usar_cache(cache):
+    """
+    Reemplaza el cache del proceso (por ejemplo, uno en un directorio temporal
+    para benchmarks). Retorna el anterior.
+    """
+    global _cache
+    with _cache_lock:
+        anterior, _cache = _cache, cache
+        return anterior
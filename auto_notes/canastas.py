@@ -0,0 +1,116 @@
+"""
+Notas worst-of sobre canastas de subyacentes, escritas en la columna Ticker
+como "AAPL/NVDA/MSFT".
+
+Los datos se buscan por subyacente y no por nota: mercado.obtener_datos_notas
+junta los subyacentes distintos de todas las notas, los busca una sola vez y
+arma cada canasta desde ese almacén compartido. Los campos de mercado de una
+canasta son los del peor subyacente en cada columna, como nivel en % del
+precio actual de ese subyacente (el Precio actual de la canasta es 100), así
+que calcular_score se aplica sin cambios: cada término usa el peor caso.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+SEPARADOR = "/"
+MAX_SUBYACENTES = 4
+
+# Columnas propias de las canastas (las notas de un solo ticker no las tienen)
+COLUMNAS_CANASTA = ["Peor subyacente", "Correlación", "Colchón mín"]
+
+# Campos de precio que se expresan como nivel relativo al precio actual
+_CAMPOS_RELATIVOS = ["Target Yahoo", "Hace 1 año", "Mín 1 año"]
+
+
+def subyacentes(ticker):
+    """
+    Subyacentes de un ticker de nota, sin repetidos: "aapl / nvda" -> ["AAPL", "NVDA"].
+    Acepta "/", "+" y "&" como separadores.
+    """
+    partes = [parte.strip().upper() for parte in re.split(r"[/+&]", str(ticker or ""))]
+    return list(dict.fromkeys(parte for parte in partes if parte))
+
+
+def normalizar_ticker(ticker):
+    return SEPARADOR.join(subyacentes(ticker))
+
+
+def es_canasta(ticker):
+    return len(subyacentes(ticker)) > 1
+
+
+def correlaciones(historiales):
+    """
+    Matriz de correlación de los rendimientos diarios (log) de todos los
+    subyacentes con historial, calculada una sola vez para todas las canastas.
+    """
+    cierres = {
+        ticker: hist["Close"] for ticker, hist in historiales.items()
+        if hist is not None and "Close" in hist and not hist.empty
+    }
+    if not cierres:
+        return pd.DataFrame()
+    precios = pd.DataFrame(cierres)
+    return np.log(precios / precios.shift(1)).corr()
+
+
+def peores_niveles(patas, datos, campos):
+    """
+    Peor nivel de cada campo entre los subyacentes: 100 * mín(valor / precio
+    actual), vectorizado sobre la matriz subyacentes × campos. Si a algún
+    subyacente le falta el dato (o el precio) el campo queda en None.
+    Retorna (dict {campo: nivel}, matriz de niveles).
+    """
+    precios = np.array([datos[pata].get("Precio actual") or np.nan for pata in patas], dtype=float)
+    valores = np.array(
+        [[np.nan if datos[pata].get(campo) is None else datos[pata][campo] for campo in campos] for pata in patas],
+        dtype=float,
+    ).reshape(len(patas), len(campos))
+    niveles = 100 * valores / precios[:, None]
+    peores = niveles.min(axis=0)
+    return {campo: None if np.isnan(v) else round(float(v), 2) for campo, v in zip(campos, peores)}, niveles
+
+
+def combinar_canasta(patas, datos, matriz_correlacion, columnas_brokers=()):
+    """
+    Campos de mercado worst-of de una canasta a partir de los datos de cada
+    subyacente ({ticker: dict con CAMPOS_MERCADO}), más el peor subyacente (el
+    de menor mínimo de 52 semanas relativo) y la correlación media entre pares.
+    """
+    campos = _CAMPOS_RELATIVOS + ["Target MS"] + list(columnas_brokers)
+    combinado, niveles = peores_niveles(patas, datos, campos)
+    precios_completos = all(datos[pata].get("Precio actual") for pata in patas)
+    combinado["Precio actual"] = 100.0 if precios_completos else None
+    minimos = niveles[:, campos.index("Mín 1 año")]
+    combinado["Peor subyacente"] = None if np.isnan(minimos).all() else patas[int(np.nanargmin(minimos))]
+    combinado["Correlación"] = correlacion_media(patas, matriz_correlacion)
+    return combinado
+
+
+def correlacion_media(patas, matriz_correlacion):
+    """
+    Promedio de las correlaciones entre pares de subyacentes, o None si falta alguno.
+    """
+    if any(pata not in matriz_correlacion.index for pata in patas):
+        return None
+    sub = matriz_correlacion.loc[patas, patas].to_numpy(dtype=float)
+    pares = sub[np.triu_indices(len(patas), k=1)]
+    return None if np.isnan(pares).any() else round(float(pares.mean()), 4)
+
+
+def colchon_minimo(notas):
+    """
+    Colchón mín de cada canasta: puntos porcentuales entre el mínimo de 52
+    semanas del peor subyacente y la barrera (100 - Colchón) si la nota se
+    emitiera hoy. Negativo si algún subyacente estuvo debajo de la barrera en
+    el año. Vectorizado sobre todas las notas; None para las de un solo ticker.
+    """
+    minimos = np.array([np.nan if nota.get("Mín 1 año") is None else nota["Mín 1 año"] for nota in notas], dtype=float)
+    colchones = np.array([nota.get("Colchón") or 0 for nota in notas], dtype=float)
+    margen = minimos - (100 - colchones)
+    return [
+        round(float(valor), 2) if es_canasta(nota.get("Ticker")) and not np.isnan(valor) else None
+        for nota, valor in zip(notas, margen)
+    ]
@@ -0,0 +1,204 @@
+"""
+Cartera persistente de notas (SQLite), compartida por las sesiones de la app.
+
+Cada nota se guarda como una fila con sus datos (entrada, campos de mercado y
+columnas de canasta) en JSON, la hora de la última búsqueda de datos de
+mercado y una versión. Las columnas que dependen de la sesión (Score con sus
+pesos, targets de otros brokers, simulación) no se guardan: cada sesión las
+recalcula, así que un rescore no reescribe la cartera. Cada escritura sube la versión: una sesión carga la
+cartera completa al empezar y después solo las filas con versión mayor a la
+última que vio, y escribe solo las notas nuevas, editadas o borradas. Al
+reabrir la app las notas vuelven con sus datos de mercado, sin requests.
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from auto_notes.cache import DIRECTORIO_DATOS
+from auto_notes.mercado import BROKERS, CAMPOS_MERCADO, columna_broker
+from auto_notes.simulacion import COLUMNAS_SIMULACION
+
+# Columnas calculadas con la configuración de cada sesión (pesos, brokers elegidos, simulación)
+COLUMNAS_SESION = frozenset(
+    ["Score"] + COLUMNAS_SIMULACION + [columna_broker(alias) for alias in BROKERS if alias != "MS"]
+)
+
+
+def _serializar(nota):
+    # Sin ordenar las claves: el orden de las columnas de la tabla sale del orden de la nota.
+    # Los valores de NumPy (float64, bool_) se guardan como sus equivalentes de Python.
+    return json.dumps({clave: valor for clave, valor in nota.items() if clave not in COLUMNAS_SESION},
+                      ensure_ascii=False, default=lambda valor: valor.item() if hasattr(valor, "item") else str(valor))
+
+
+def _campos_mercado(texto):
+    datos = json.loads(texto) if texto else {}
+    return [datos.get(campo) for campo in CAMPOS_MERCADO]
+
+
+class CarteraNotas:
+    def __init__(self, ruta=None):
+        ruta = Path(ruta) if ruta else DIRECTORIO_DATOS / "cartera.sqlite"
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        # Transacciones explícitas (BEGIN IMMEDIATE): la versión se numera sin carreras entre procesos
+        self._conn = sqlite3.connect(str(ruta), check_same_thread=False, timeout=10, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS notas ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " datos TEXT,"                # JSON de la nota; NULL si se borró
+                " version INTEGER NOT NULL,"
+                " actualizado REAL NOT NULL,"
+                " buscado REAL)"              # última vez que cambiaron sus datos de mercado
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS notas_version ON notas (version)")
+
+    def cambios(self, desde=0):
+        """
+        Filas escritas después de la versión desde, en el orden de la cartera.
+        Retorna (versión actual, [(id, texto JSON o None si se borró, buscado)]).
+        Con desde=0 no incluye las borradas.
+        """
+        with self._lock:
+            version = self._conn.execute("SELECT COALESCE(MAX(version), 0) FROM notas").fetchone()[0]
+            filas = self._conn.execute(
+                "SELECT id, datos, buscado FROM notas WHERE version > ? AND (? > 0 OR datos IS NOT NULL) ORDER BY id",
+                (desde, desde),
+            ).fetchall()
+        return version, filas
+
+    def guardar(self, altas=(), cambios=(), bajas=()):
+        """
+        Escribe en una transacción las notas nuevas (textos JSON), las editadas
+        ((id, texto, buscado) con buscado None para conservar el anterior) y
+        las borradas (ids). Retorna (versión escrita, ids de las altas en orden).
+        """
+        ahora = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._conn.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM notas").fetchone()[0]
+                ids = [
+                    self._conn.execute(
+                        "INSERT INTO notas (datos, version, actualizado, buscado) VALUES (?, ?, ?, ?)",
+                        (texto, version, ahora, ahora),
+                    ).lastrowid
+                    for texto in altas
+                ]
+                self._conn.executemany(
+                    "UPDATE notas SET datos = ?, version = ?, actualizado = ?, buscado = COALESCE(?, buscado)"
+                    " WHERE id = ?",
+                    [(texto, version, ahora, buscado, fila) for fila, texto, buscado in cambios],
+                )
+                self._conn.executemany(
+                    "UPDATE notas SET datos = NULL, version = ?, actualizado = ? WHERE id = ?",
+                    [(version, ahora, fila) for fila in bajas],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return version, ids
+
+    def estadisticas(self):
+        with self._lock:
+            notas, buscado = self._conn.execute(
+                "SELECT COUNT(*), MIN(buscado) FROM notas WHERE datos IS NOT NULL"
+            ).fetchone()
+        return {"notas": notas, "buscado_mas_antiguo": buscado}
+
+
+# --- Sincronización de la lista de notas de una sesión ---
+class SincronizadorCartera:
+    """
+    Mantiene la lista de notas de una sesión (dicts que se editan en el lugar)
+    sincronizada con la cartera. cargar() trae lo escrito por otras sesiones
+    desde la última versión vista; guardar() escribe solo las notas cuyo JSON
+    (sin COLUMNAS_SESION) cambió desde la última escritura. Si dos sesiones editan la misma nota,
+    gana la última en guardar.
+    """
+
+    def __init__(self, cartera):
+        self.cartera = cartera
+        self.version = 0
+        self._filas = {}     # id(nota) -> (nota, id de fila); guarda la referencia para que id() no se reuse
+        self._escritos = {}  # id de fila -> JSON guardado (o cargado)
+
+    def _vincular(self, nota, fila, texto):
+        self._filas[id(nota)] = (nota, fila)
+        self._escritos[fila] = texto
+
+    def cargar(self, notas):
+        """
+        Aplica a la lista notas (en el lugar) las filas nuevas, editadas o
+        borradas desde la última versión vista. Retorna cuántas filas aplicó.
+        """
+        version, filas = self.cartera.cambios(self.version)
+        if not filas:
+            self.version = version
+            return 0
+        por_fila = {fila: nota for nota, fila in self._filas.values()}
+        borradas = set()
+        for fila, texto, _ in filas:
+            nota = por_fila.get(fila)
+            if texto is None:
+                if nota is not None:
+                    borradas.add(id(nota))
+                    del self._filas[id(nota)]
+                self._escritos.pop(fila, None)
+            elif nota is None:
+                nota = json.loads(texto)
+                notas.append(nota)
+                self._vincular(nota, fila, texto)
+            elif texto != self._escritos.get(fila):
+                # Las columnas de la sesión se conservan hasta que esta sesión las recalcule
+                datos = json.loads(texto)
+                for clave in [clave for clave in nota if clave not in datos and clave not in COLUMNAS_SESION]:
+                    del nota[clave]
+                nota.update(datos)
+                self._escritos[fila] = texto
+        if borradas:
+            notas[:] = [nota for nota in notas if id(nota) not in borradas]
+        self.version = version
+        return len(filas)
+
+    def guardar(self, notas):
+        """
+        Escribe las notas nuevas, las que cambiaron y las que ya no están en la
+        lista. Retorna la cantidad de filas escritas.
+        """
+        altas, cambios, vigentes = [], [], set()
+        ahora = time.time()
+        for nota in notas:
+            texto = _serializar(nota)
+            vinculo = self._filas.get(id(nota))
+            if vinculo is None:
+                altas.append((nota, texto))
+                continue
+            fila = vinculo[1]
+            vigentes.add(fila)
+            anterior = self._escritos.get(fila)
+            if texto != anterior:
+                buscado = ahora if _campos_mercado(texto) != _campos_mercado(anterior) else None
+                cambios.append((fila, texto, buscado))
+        bajas = [fila for fila in self._escritos if fila not in vigentes]
+        if not (altas or cambios or bajas):
+            return 0
+
+        version, ids = self.cartera.guardar([texto for _, texto in altas], cambios, bajas)
+        for (nota, texto), fila in zip(altas, ids):
+            self._vincular(nota, fila, texto)
+        for fila, texto, _ in cambios:
+            self._escritos[fila] = texto
+        for fila in bajas:
+            del self._escritos[fila]
+        self._filas = {clave: (nota, fila) for clave, (nota, fila) in self._filas.items() if fila in self._escritos}
+        # Las escrituras de otras sesiones entre la versión vista y esta se traen en el próximo cargar()
+        if version == self.version + 1:
+            self.version = version
+        return len(altas) + len(cambios) + len(bajas)
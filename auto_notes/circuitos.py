@@ -0,0 +1,148 @@
+"""
+Circuit breakers por host de las fuentes de datos de mercado.
+
+Si una fuente está caída o cambió su markup (por ejemplo, TipRanks sin la
+tabla rt-tbody), cada nota esperaba requests, reintentos y parseos completos
+para terminar en None. Después de UMBRAL_FALLOS fallos consecutivos del host
+(excepciones o páginas que no se pudieron parsear) el circuito se abre y las
+llamadas se saltean al instante con CircuitoAbierto. Un ticker que la fuente
+no conoce (404, o None del fetcher) no cuenta ni como éxito ni como fallo:
+queda solo en el cache negativo. Pasado ENFRIAMIENTO deja
+pasar una sola llamada de prueba (semiabierto): si sale bien el circuito se
+cierra; si falla, vuelve a abrirse por otro ENFRIAMIENTO.
+"""
+import functools
+import logging
+import threading
+import time
+
+from auto_notes import metricas
+
+log = logging.getLogger(__name__)
+
+CERRADO, ABIERTO, SEMIABIERTO = "cerrado", "abierto", "semiabierto"
+
+UMBRAL_FALLOS = 5
+ENFRIAMIENTO = 60  # segundos
+
+
+class CircuitoAbierto(Exception):
+    def __init__(self, host):
+        super().__init__(f"Circuito abierto para {host}")
+        self.host = host
+
+
+class PaginaIlegible(Exception):
+    """
+    La página llegó (200) pero no se pudo parsear: cuenta como fallo del host
+    y el fetcher retorna None (cache negativo).
+    """
+
+
+class Circuito:
+    def __init__(self, host, umbral=UMBRAL_FALLOS, enfriamiento=ENFRIAMIENTO):
+        self.host = host
+        self.umbral = umbral
+        self.enfriamiento = enfriamiento
+        self.estado = CERRADO
+        self.fallos = 0     # consecutivos
+        self._desde = 0.0   # apertura o inicio de la prueba en curso
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        """
+        Lanza CircuitoAbierto si la llamada debe saltearse. Con el circuito
+        abierto y el enfriamiento cumplido, deja pasar una prueba; si la prueba
+        no informa su resultado en otro enfriamiento, se permite una nueva.
+        """
+        with self._lock:
+            if self.estado == CERRADO:
+                return
+            ahora = time.monotonic()
+            if ahora - self._desde >= self.enfriamiento:
+                self.estado, self._desde = SEMIABIERTO, ahora
+                log.info("Circuito de %s semiabierto: llamada de prueba", self.host)
+                return
+        metricas.contar("auto_notes_circuito_salteadas_total", host=self.host)
+        raise CircuitoAbierto(self.host)
+
+    def exito(self):
+        with self._lock:
+            if self.estado != CERRADO:
+                log.info("Circuito de %s cerrado", self.host)
+            self.estado, self.fallos = CERRADO, 0
+
+    def sin_datos(self):
+        """
+        La llamada terminó sin datos para el ticker: no cambia el estado; si
+        era la prueba del semiabierto, la próxima llamada prueba de nuevo.
+        """
+        with self._lock:
+            if self.estado == SEMIABIERTO:
+                self._desde = 0.0
+
+    def fallo(self, motivo):
+        with self._lock:
+            self.fallos += 1
+            if self.estado == ABIERTO or (self.estado == CERRADO and self.fallos < self.umbral):
+                return
+            self.estado, self._desde = ABIERTO, time.monotonic()
+        log.warning("Circuito de %s abierto tras %d fallos (último: %s)", self.host, self.fallos, motivo)
+        metricas.contar("auto_notes_circuito_aperturas_total", host=self.host)
+
+
+_circuitos = {}
+_circuitos_lock = threading.Lock()
+
+
+def circuito(host):
+    with _circuitos_lock:
+        if host not in _circuitos:
+            _circuitos[host] = Circuito(host)
+        return _circuitos[host]
+
+
+def estados():
+    """
+    {host: estado} de los circuitos creados.
+    """
+    with _circuitos_lock:
+        return {host: c.estado for host, c in _circuitos.items()}
+
+
+def reiniciar():
+    """
+    Descarta los circuitos (todos vuelven a empezar cerrados).
+    """
+    with _circuitos_lock:
+        _circuitos.clear()
+
+
+def protegido(host):
+    """
+    Decorador para fetchers fn(ticker) de un host: con el circuito abierto
+    lanza CircuitoAbierto sin llamar a fn. Las excepciones de fn cuentan como
+    fallo del host; PaginaIlegible también, pero se retorna None. Un None de
+    fn (ticker sin datos) no cuenta para el circuito.
+    """
+    def decorador(fn):
+        @functools.wraps(fn)
+        def envoltura(ticker):
+            c = circuito(host)
+            c.permitir()
+            try:
+                valor = fn(ticker)
+            except PaginaIlegible as e:
+                log.info("%s: %s", host, e)
+                c.fallo("página ilegible")
+                return None
+            except Exception as e:
+                c.fallo(type(e).__name__)
+                raise
+            if valor is None:
+                c.sin_datos()
+            else:
+                c.exito()
+            return valor
+        return envoltura
+    return decorador
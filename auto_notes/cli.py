@@ -0,0 +1,116 @@
+"""
+CLI para scoring en lote (cron, workers), sin Streamlit:
+
+    python -m auto_notes notas.xlsx -o notas_scoring.xlsx --workers 32
+"""
+import argparse
+import datetime
+import logging
+import sys
+import time
+
+from auto_notes.excel import exportar_excel_semaforo
+from auto_notes.lote import WORKERS_DEFAULT, procesar_notas
+from auto_notes.mercado import BROKERS, columna_broker, configurar_yfinance
+from auto_notes.metricas import texto_prometheus
+from auto_notes.notas import leer_archivo_notas
+from auto_notes.score import PESOS_DEFAULT, TERMINO_SIMULACION
+
+
+# Columnas de brokers que se pueden pesar (Target MS ya es un término fijo del motor)
+COLUMNAS_BROKERS = {columna_broker(alias): alias for alias in BROKERS if alias != "MS"}
+
+# Columna que indica si vino cada fuente (los campos de Yahoo salen todos del historial)
+FUENTES = {"Precio actual": "historial de Yahoo", "Target Yahoo": "target de Yahoo", "Target MS": "TipRanks"}
+
+
+def faltantes_por_fuente(df, brokers=()):
+    """
+    {descripción de la fuente: tickers de las notas sin ese dato}, solo las fuentes con faltantes.
+    """
+    columnas = dict(FUENTES, **{columna_broker(alias): f"TipRanks, {BROKERS[alias]}" for alias in brokers})
+    faltantes = {}
+    for columna, fuente in columnas.items():
+        tickers = df.loc[df[columna].isna(), "Ticker"].tolist()
+        if tickers:
+            faltantes[f"{columna} ({fuente})"] = tickers
+    return faltantes
+
+
+def _peso(texto):
+    nombre, _, valor = texto.partition("=")
+    if (nombre not in PESOS_DEFAULT and nombre not in COLUMNAS_BROKERS and nombre != TERMINO_SIMULACION) or not valor:
+        raise argparse.ArgumentTypeError(
+            f"Use NOMBRE=VALOR con NOMBRE en: {', '.join(PESOS_DEFAULT)}, 'Target <broker>' o '{TERMINO_SIMULACION}'"
+        )
+    try:
+        return nombre, float(valor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Peso inválido: {texto}")
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m auto_notes",
+        description="Busca datos de mercado, calcula el score de cada nota y exporta el Excel con semáforo.",
+    )
+    parser.add_argument("entrada", help="CSV o Excel con columnas Ticker, Tasa, Colchón, Memory")
+    parser.add_argument("-o", "--salida", help="Excel de salida (default: notas_scoring_AAAA-MM-DD.xlsx)")
+    parser.add_argument("--workers", type=int, default=WORKERS_DEFAULT, help="búsquedas en paralelo")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="deadline total en segundos (default: escala con los tickers únicos, "
+                             "según el rate limit de TipRanks)")
+    parser.add_argument("--hoja", default=0, help="hoja del Excel de entrada (nombre o índice)")
+    parser.add_argument("--fila-header", type=int, default=0, help="fila (base 0) con los títulos en el Excel")
+    parser.add_argument("--peso", type=_peso, action="append", default=[], metavar="NOMBRE=VALOR",
+                        help="sobrescribe un peso del motor (repetible); 'Target <broker>' suma ese broker "
+                             f"y '{TERMINO_SIMULACION}' la simulación")
+    parser.add_argument("--broker", action="append", default=[], choices=list(COLUMNAS_BROKERS.values()),
+                        help="agrega la columna Target <broker> (repetible; pesa 0 salvo que se use --peso)")
+    parser.add_argument("--simulacion", action="store_true",
+                        help="simula barrera y cupones de cada nota (Monte Carlo) y agrega sus columnas")
+    parser.add_argument("--verificar-min-52", action="store_true",
+                        help="scrapear también el mínimo de 52 semanas de Yahoo y reportar diferencias")
+    parser.add_argument("--metricas", metavar="ARCHIVO",
+                        help="escribe las métricas de la corrida en formato Prometheus (textfile collector)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="loguea la duración de cada etapa")
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if args.verbose:
+        # Solo el detalle de auto_notes, no el de las dependencias (yfinance, urllib3, ...)
+        logging.getLogger("auto_notes").setLevel(logging.DEBUG)
+    hoja = int(args.hoja) if str(args.hoja).isdigit() else args.hoja
+    notas = leer_archivo_notas(args.entrada, hoja=hoja, fila_header=args.fila_header)
+    if not notas:
+        print(f"No se encontraron notas en {args.entrada}", file=sys.stderr)
+        return 1
+
+    pesos = dict(PESOS_DEFAULT, **dict(args.peso))
+    brokers = list(dict.fromkeys(args.broker + [COLUMNAS_BROKERS[n] for n in pesos if n in COLUMNAS_BROKERS]))
+    for alias in brokers:
+        pesos.setdefault(columna_broker(alias), 0.0)
+    simulacion = args.simulacion or TERMINO_SIMULACION in pesos
+    configurar_yfinance()
+    inicio = time.perf_counter()
+    df = procesar_notas(
+        notas, pesos, workers=args.workers, timeout=args.timeout, verificar=args.verificar_min_52, brokers=brokers,
+        simulacion=simulacion,
+    )
+    duracion = time.perf_counter() - inicio
+
+    salida = args.salida or "notas_scoring_{}.xlsx".format(datetime.datetime.now().strftime("%Y-%m-%d"))
+    with open(salida, "wb") as archivo:
+        archivo.write(exportar_excel_semaforo(df).getvalue())
+
+    print(f"{len(df)} notas procesadas en {duracion:.1f}s -> {salida}")
+    # Los faltantes pesan como 0 en el score: se listan por fuente para poder revisarlos
+    for fuente, tickers in faltantes_por_fuente(df, brokers).items():
+        print(f"Sin {fuente} en {len(tickers)} notas: {', '.join(tickers)}")
+    if args.metricas:
+        with open(args.metricas, "w", encoding="utf-8") as archivo:
+            archivo.write(texto_prometheus())
+    return 0
@@ -0,0 +1,191 @@
+"""
+Cliente HTTP compartido para el scraping (Yahoo Finance y TipRanks).
+
+Mantiene una sesión con pool de conexiones por host, limita la tasa de
+requests con un token bucket, acota la concurrencia por host y reintenta
+429/5xx/timeouts con backoff exponencial con jitter.
+
+Para benchmarks y pruebas sin red, las respuestas se pueden grabar en un
+almacén de fixtures (grabar_en / AUTO_NOTES_HTTP_GRABAR) y reproducir desde
+el servidor de auto_notes.stub (usar_stub / AUTO_NOTES_HTTP_STUB).
+"""
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from auto_notes import metricas
+from auto_notes.grabacion import AlmacenFixtures
+
+# --- Common headers for web scraping ---
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
+    "Accept-Language": "en-US,en;q=0.9,es;q=0.8",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Cache-Control": "no-cache",
+    "Pragma": "no-cache",
+    "Sec-Ch-Ua": '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
+    "Sec-Ch-Ua-Mobile": "?0",
+    "Sec-Ch-Ua-Platform": '"Windows"',
+    "Sec-Fetch-Dest": "document",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-Site": "none",
+    "Sec-Fetch-User": "?1",
+    "Upgrade-Insecure-Requests": "1",
+    "Referer": "https://www.google.com/",
+    "Connection": "keep-alive",
+}
+
+# Límites por host: requests por segundo, ráfaga máxima y requests simultáneos
+LIMITES_HOST = {
+    "finance.yahoo.com": {"tasa": 2.0, "rafaga": 4, "concurrencia": 4},
+    "www.tipranks.com": {"tasa": 1.0, "rafaga": 2, "concurrencia": 2},
+}
+LIMITE_DEFAULT = {"tasa": 2.0, "rafaga": 4, "concurrencia": 4}
+
+TIMEOUT = 10
+REINTENTOS = 3
+BACKOFF_BASE = 0.5   # segundos
+BACKOFF_MAX = 8.0
+ESTADOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    def __init__(self, tasa, capacidad):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self._tokens = float(capacidad)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def tomar(self):
+        """
+        Bloquea hasta que haya un token disponible.
+        """
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                espera = (1 - self._tokens) / self.tasa
+            time.sleep(espera)
+
+
+class ClienteHost:
+    def __init__(self, host, tasa, rafaga, concurrencia):
+        # requests se importa recién al crear la primera sesión
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.host = host
+        self.bucket = TokenBucket(tasa, rafaga)
+        self.semaforo = threading.BoundedSemaphore(concurrencia)
+        self.session = requests.Session()
+        self.session.headers.update(BROWSER_HEADERS)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrencia)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url, timeout=TIMEOUT, reintentos=REINTENTOS):
+        import requests
+
+        for intento in range(reintentos + 1):
+            ultimo = intento == reintentos
+            self.bucket.tomar()
+            try:
+                with self.semaforo:
+                    response = self.session.get(url, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                motivo = "timeout" if isinstance(e, requests.Timeout) else "conexion"
+                metricas.contar("auto_notes_http_requests_total", host=self.host, estado=motivo)
+                if ultimo:
+                    raise
+                metricas.contar("auto_notes_http_reintentos_total", host=self.host, motivo=motivo)
+                time.sleep(_backoff(intento))
+                continue
+
+            metricas.contar("auto_notes_http_requests_total", host=self.host, estado=response.status_code)
+            if response.status_code not in ESTADOS_REINTENTABLES:
+                return response
+            if ultimo:
+                response.raise_for_status()
+            metricas.contar("auto_notes_http_reintentos_total", host=self.host, motivo=response.status_code)
+            time.sleep(_backoff(intento, response.headers.get("Retry-After")))
+
+
+def _backoff(intento, retry_after=None):
+    """
+    Backoff exponencial con "full jitter"; respeta Retry-After si viene en segundos.
+    """
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** intento))
+
+
+_clientes = {}
+_clientes_lock = threading.Lock()
+
+
+def fijar_limites(limites_host, limite_default=None):
+    """
+    Reemplaza los límites por host (por ejemplo, sin límites para benchmarks).
+    Los clientes ya creados se descartan. Retorna (limites_host, limite_default) anteriores.
+    """
+    global LIMITES_HOST, LIMITE_DEFAULT
+    with _clientes_lock:
+        anteriores = LIMITES_HOST, LIMITE_DEFAULT
+        LIMITES_HOST = limites_host
+        LIMITE_DEFAULT = limite_default or LIMITE_DEFAULT
+        _clientes.clear()
+    return anteriores
+
+
+def cliente_para(host):
+    with _clientes_lock:
+        if host not in _clientes:
+            _clientes[host] = ClienteHost(host, **LIMITES_HOST.get(host, LIMITE_DEFAULT))
+        return _clientes[host]
+
+
+# --- Grabación / reproducción ---
+_almacen = AlmacenFixtures(os.environ["AUTO_NOTES_HTTP_GRABAR"]) if os.environ.get("AUTO_NOTES_HTTP_GRABAR") else None
+_stub = os.environ.get("AUTO_NOTES_HTTP_STUB") or None
+
+
+def grabar_en(directorio):
+    """
+    Guarda las respuestas exitosas en el almacén de fixtures del directorio (None desactiva).
+    """
+    global _almacen
+    _almacen = AlmacenFixtures(directorio) if directorio else None
+
+
+def usar_stub(base):
+    """
+    Redirige los requests al servidor stub en base (ej. http://127.0.0.1:8765); None desactiva.
+    Los límites de tasa y concurrencia siguen siendo los del host original.
+    """
+    global _stub
+    _stub = base.rstrip("/") if base else None
+
+
+def get(url, timeout=TIMEOUT):
+    """
+    GET con la sesión, rate limit y reintentos del host de la URL.
+    """
+    partes = urlsplit(url)
+    destino = url
+    if _stub:
+        destino = f"{_stub}/{partes.netloc}{partes.path}" + (f"?{partes.query}" if partes.query else "")
+    response = cliente_para(partes.netloc).get(destino, timeout=timeout)
+    if _almacen is not None and not _stub and response.ok:
+        _almacen.guardar(url, response.status_code, response.headers.get("Content-Type", "text/html"), response.content)
+    return response
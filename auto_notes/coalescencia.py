@@ -0,0 +1,113 @@
+"""
+Coalescencia de requests ("single flight") a nivel de proceso.
+
+Con varias sesiones de Streamlit en el mismo servidor, el mismo ticker se
+suele buscar en paralelo desde sesiones distintas. Las búsquedas concurrentes
+de la misma clave (tipo de dato, ticker) comparten una sola llamada en vuelo:
+la primera la hace y las demás esperan y reciben su resultado (o su excepción).
+Cada espera cuenta como una llamada ahorrada en auto_notes_coalescidas_total.
+"""
+import logging
+import threading
+
+from auto_notes import metricas
+
+log = logging.getLogger(__name__)
+
+
+class _Vuelo:
+    def __init__(self):
+        self.listo = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class Coalescedor:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._en_vuelo = {}
+        self.llamadas = 0
+        self.ahorradas = 0
+
+    def _registrar(self, claves):
+        """
+        Para cada clave, se une al vuelo en curso o abre uno nuevo.
+        Retorna ({clave: vuelo} propios, {clave: vuelo} ajenos).
+        """
+        propios, ajenos = {}, {}
+        with self._lock:
+            for clave in claves:
+                vuelo = self._en_vuelo.get(clave)
+                if vuelo is None:
+                    propios[clave] = self._en_vuelo[clave] = _Vuelo()
+                else:
+                    ajenos[clave] = vuelo
+            self.llamadas += len(propios)
+            self.ahorradas += len(ajenos)
+        for clave in ajenos:
+            metricas.contar("auto_notes_coalescidas_total", tipo=clave[0] if isinstance(clave, tuple) else "")
+        return propios, ajenos
+
+    def _aterrizar(self, propios, resultados, error=None):
+        with self._lock:
+            for clave, vuelo in propios.items():
+                del self._en_vuelo[clave]
+                vuelo.resultado, vuelo.error = resultados.get(clave), error
+                vuelo.listo.set()
+
+    @staticmethod
+    def _esperar(vuelo):
+        vuelo.listo.wait()
+        if vuelo.error is not None:
+            raise vuelo.error
+        return vuelo.resultado
+
+    def hacer(self, clave, fn):
+        """
+        Ejecuta fn() salvo que ya haya una llamada en vuelo para la clave; en
+        ese caso espera y retorna su resultado.
+        """
+        propios, ajenos = self._registrar([clave])
+        if ajenos:
+            return self._esperar(ajenos[clave])
+        try:
+            resultado = fn()
+        except BaseException as e:
+            self._aterrizar(propios, {}, e)
+            raise
+        self._aterrizar(propios, {clave: resultado})
+        return resultado
+
+    def hacer_lote(self, claves, fn_lote):
+        """
+        Versión por lote: fn_lote(claves propias) -> {clave: resultado} solo
+        recibe las claves que no están en vuelo; las demás se esperan después
+        de publicar las propias (así dos lotes cruzados no se bloquean entre sí).
+        Si el vuelo ajeno de una clave falla, esa clave queda en None: el error
+        de una búsqueda de otro hilo no hace fallar el lote entero.
+        Retorna {clave: resultado} para todas las claves.
+        """
+        propios, ajenos = self._registrar(list(dict.fromkeys(claves)))
+        resultados = {}
+        if propios:
+            try:
+                resultados = dict(fn_lote(list(propios)))
+            except BaseException as e:
+                self._aterrizar(propios, {}, e)
+                raise
+            self._aterrizar(propios, resultados)
+        for clave, vuelo in ajenos.items():
+            try:
+                resultados[clave] = self._esperar(vuelo)
+            except Exception as e:
+                log.warning("Falló la búsqueda en vuelo de %s: %s", clave, e)
+                resultados[clave] = None
+        return resultados
+
+    def estadisticas(self):
+        with self._lock:
+            return {"llamadas": self.llamadas, "ahorradas": self.ahorradas, "en_vuelo": len(self._en_vuelo)}
+
+
+# Coalescedor del proceso, compartido por todas las sesiones
+COALESCEDOR = Coalescedor()
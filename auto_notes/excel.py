@@ -0,0 +1,121 @@
+"""
+Export de las notas a Excel con el semáforo del Score.
+
+El libro se escribe en modo write-only (memoria constante, fila por fila) y
+el semáforo es una regla de formato condicional nativa de Excel sobre la
+columna Score, en lugar de un relleno por celda. Los bytes generados se
+cachean por huella del contenido, así que un rerun sin cambios no reexporta.
+openpyxl se importa recién al exportar.
+"""
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from auto_notes.semaforo import AMARILLO, COLORES, ROJO, UMBRAL_AMARILLO, UMBRAL_VERDE, VERDE
+
+HOJA = "Notas"
+MAX_CACHE = 8
+
+
+def reglas_semaforo(columna, ultima_fila):
+    """
+    Reglas de formato condicional equivalentes a semaforo.bandas(metodo="rango"):
+    percentil (valor - mín) / (máx - mín), verde si todos los scores son iguales.
+    Retorna (rango de celdas, [reglas en orden de prioridad]).
+    """
+    from openpyxl.formatting.rule import FormulaRule
+    from openpyxl.styles import PatternFill
+
+    celda = f"{columna}2"
+    rango = f"${columna}$2:${columna}${ultima_fila}"
+    percentil = f"({celda}-MIN({rango}))/(MAX({rango})-MIN({rango}))"
+
+    def desde(umbral):
+        # OR/AND de Excel evalúan todos sus argumentos: con MÁX = MÍN la división
+        # daría #DIV/0! y la regla se tomaría como falsa, así que se evita con IF
+        return f"IF(MAX({rango})=MIN({rango}),TRUE,{percentil}>={umbral})"
+
+    def regla(formula, banda):
+        color = COLORES[banda]
+        fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
+        return FormulaRule(formula=[formula], fill=fill, stopIfTrue=True)
+
+    reglas = [
+        regla(f"AND(ISNUMBER({celda}),{desde(UMBRAL_VERDE)})", VERDE),
+        regla(f"AND(ISNUMBER({celda}),{desde(UMBRAL_AMARILLO)})", AMARILLO),
+        regla(f"ISNUMBER({celda})", ROJO),
+    ]
+    return f"{columna}2:{columna}{ultima_fila}", reglas
+
+
+def _valor(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    if isinstance(valor, float) and np.isnan(valor):
+        return None
+    return valor
+
+
+def exportar_excel_semaforo(df):
+    """
+    Genera el Excel de las notas (hoja "Notas") y retorna un BytesIO.
+    """
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(HOJA)
+    worksheet.append([str(col) for col in df.columns])
+    for fila in df.itertuples(index=False, name=None):
+        worksheet.append([_valor(valor) for valor in fila])
+
+    if "Score" in df.columns and len(df) > 0:
+        columna = get_column_letter(df.columns.get_loc("Score") + 1)
+        rango, reglas = reglas_semaforo(columna, len(df) + 1)
+        for regla in reglas:
+            worksheet.conditional_formatting.add(rango, regla)
+
+    output = io.BytesIO()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def huella(df, pesos=None):
+    """
+    Hash del contenido de la tabla (columnas, valores) y de los pesos.
+    """
+    h = hashlib.sha256()
+    h.update(repr(list(df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    if pesos is not None:
+        h.update(repr(sorted(pesos.items()) if isinstance(pesos, dict) else list(pesos)).encode())
+    return h.hexdigest()
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def exportar_excel_cacheado(df, pesos=None):
+    """
+    Bytes del Excel de exportar_excel_semaforo, cacheados por huella(df, pesos).
+    """
+    clave = huella(df, pesos)
+    with _cache_lock:
+        if clave in _cache:
+            _cache.move_to_end(clave)
+            return _cache[clave]
+
+    datos = exportar_excel_semaforo(df).getvalue()
+    with _cache_lock:
+        _cache[clave] = datos
+        if len(_cache) > MAX_CACHE:
+            _cache.popitem(last=False)
+    return datos
@@ -0,0 +1,62 @@
+"""
+Grabación y reproducción de respuestas HTTP del scraping.
+
+Un almacén de fixtures es un directorio con los cuerpos de las respuestas y
+un indice.json que mapea cada URL a su archivo, estado y content type. Con
+cliente_http.grabar_en(directorio) las respuestas reales se guardan ahí; el
+servidor de auto_notes.stub las sirve después sin red.
+"""
+import json
+import re
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit
+
+INDICE = "indice.json"
+
+
+def normalizar_url(url):
+    """
+    Clave de una URL en el almacén: sin esquema ni barra final, host en minúsculas.
+    """
+    partes = urlsplit(url)
+    ruta = partes.path.rstrip("/") or "/"
+    return f"{partes.netloc.lower()}{ruta}" + (f"?{partes.query}" if partes.query else "")
+
+
+class AlmacenFixtures:
+    def __init__(self, directorio):
+        self.directorio = Path(directorio)
+        self._lock = threading.Lock()
+        ruta = self.directorio / INDICE
+        self._indice = json.loads(ruta.read_text(encoding="utf-8")) if ruta.exists() else {}
+
+    def urls(self):
+        return list(self._indice)
+
+    def entradas(self):
+        """
+        {clave de URL: {"archivo", "estado", "content_type"}}.
+        """
+        return dict(self._indice)
+
+    def buscar(self, url):
+        """
+        Retorna (estado, content_type, cuerpo en bytes) o None si la URL no está grabada.
+        """
+        entrada = self._indice.get(normalizar_url(url))
+        if entrada is None:
+            return None
+        cuerpo = (self.directorio / entrada["archivo"]).read_bytes()
+        return entrada["estado"], entrada["content_type"], cuerpo
+
+    def guardar(self, url, estado, content_type, cuerpo):
+        clave = normalizar_url(url)
+        archivo = re.sub(r"[^A-Za-z0-9]+", "_", clave).strip("_") + ".html"
+        with self._lock:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            (self.directorio / archivo).write_bytes(cuerpo)
+            self._indice[clave] = {"archivo": archivo, "estado": estado, "content_type": content_type}
+            (self.directorio / INDICE).write_text(
+                json.dumps(self._indice, indent=2, sort_keys=True) + "\n", encoding="utf-8"
+            )
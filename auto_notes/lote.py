@@ -0,0 +1,52 @@
+"""
+Scoring de notas en lote, sin Streamlit: busca los datos de mercado de todas
+las notas en paralelo, calcula los scores y arma la tabla final.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from auto_notes.canastas import COLUMNAS_CANASTA, colchon_minimo, es_canasta
+from auto_notes.mercado import CAMPOS_MERCADO, columna_broker, obtener_datos_notas
+from auto_notes.notas import COLUMNAS_ENTRADA
+from auto_notes.score import PESOS_DEFAULT, calcular_scores
+from auto_notes.simulacion import COLUMNAS_SIMULACION, SimuladorNotas
+
+WORKERS_DEFAULT = 16
+
+
+def procesar_notas(notas, pesos=None, workers=WORKERS_DEFAULT, timeout=None, verificar=None, brokers=(),
+                   simulacion=False):
+    """
+    Completa las notas (dicts con Ticker, Tasa, Colchón, Memory) con los datos
+    de mercado y el Score. Retorna un DataFrame con las mismas columnas que la app,
+    más una columna Target <alias> por broker, las columnas worst-of si hay
+    canastas y, con simulacion=True, las columnas de la simulación Monte Carlo
+    (historiales del cache de mercado). Sin timeout, el deadline escala con
+    los tickers únicos (mercado.timeout_lote).
+    """
+    pesos = pesos or PESOS_DEFAULT
+    notas = [dict(nota) for nota in notas]
+
+    # Pool propio para fijar la cantidad de workers; al terminar no se espera a
+    # las fuentes que quedaron colgadas más allá del deadline.
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="auto-notes-lote")
+    try:
+        datos = obtener_datos_notas([nota["Ticker"] for nota in notas], timeout, verificar, pool=pool, brokers=brokers)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    for nota in notas:
+        nota.update(datos[nota["Ticker"]])
+    columnas = COLUMNAS_ENTRADA + CAMPOS_MERCADO + [columna_broker(a) for a in brokers]
+    if any(es_canasta(nota["Ticker"]) for nota in notas):
+        for nota, colchon_min in zip(notas, colchon_minimo(notas)):
+            nota["Colchón mín"] = colchon_min
+        columnas += COLUMNAS_CANASTA
+    if simulacion:
+        for nota, resultado in zip(notas, SimuladorNotas().simular(notas)):
+            nota.update(resultado)
+        columnas += COLUMNAS_SIMULACION
+    df = pd.DataFrame(notas, columns=columnas)
+    df["Score"] = calcular_scores(df, pesos)
+    return df
@@ -0,0 +1,506 @@
+"""
+Obtención de datos de mercado (Yahoo Finance y TipRanks) para las notas.
+"""
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+
+from auto_notes import cliente_http
+from auto_notes.cache import cacheado, obtener_cache
+from auto_notes.canastas import combinar_canasta, correlaciones, es_canasta, peores_niveles, subyacentes
+from auto_notes.circuitos import CircuitoAbierto, PaginaIlegible, circuito, protegido
+from auto_notes.coalescencia import COALESCEDOR
+from auto_notes.metricas import contar, medido, medir
+from auto_notes.parsers import extraer_analistas, extraer_min_52, target_broker
+
+log = logging.getLogger(__name__)
+
+# Hosts de los circuit breakers (auto_notes.circuitos): las páginas scrapeadas
+# y la API que usa yfinance (historial, targets y download)
+HOST_YAHOO = "finance.yahoo.com"
+HOST_YAHOO_API = "query2.finance.yahoo.com"
+HOST_TIPRANKS = "www.tipranks.com"
+
+# Los fetchers decorados con @cacheado retornan None cuando la fuente respondió
+# sin datos (404, ticker desconocido) y dejan pasar las excepciones: cacheado
+# las registra y usa el último valor conocido, y protegido las cuenta como
+# fallos del host. Una página 200 que no se pudo parsear lanza PaginaIlegible:
+# fallo del host, pero con cache negativo.
+
+
+def configurar_yfinance():
+    """
+    Hace que yfinance lance sus errores en lugar de devolver resultados vacíos:
+    así una falla de red cuenta como fallo del circuito y no se confunde con
+    un ticker sin datos (que iría al cache negativo). Es una configuración
+    global de yfinance para todo el proceso, por eso no se aplica al importar
+    auto_notes: la llaman los puntos de entrada (la app y la CLI) al arrancar.
+    """
+    import yfinance as yf
+
+    yf.config.debug.hide_exceptions = False
+
+
+def _es_404(error):
+    return getattr(getattr(error, "response", None), "status_code", None) == 404
+
+
+def _pagina(url):
+    """
+    GET de una página scrapeada. None si la fuente no conoce el ticker (404);
+    los demás estados de error se lanzan como excepción.
+    """
+    response = cliente_http.get(url)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return response.text
+
+
+# --- Función auxiliar para obtener el mínimo de 52 semanas desde Yahoo Finance ---
+@cacheado("min_52")
+@protegido(HOST_YAHOO)
+@medido("min_52", con_ticker=True)
+def obtener_min_52_semanas(ticker):
+    """
+    Scrapes Yahoo Finance to get the 52-week low value from the 52 Week Range field.
+    Returns the lower value from a range like "177.00 - 488.54" -> 177.00
+    """
+    url = f"https://{HOST_YAHOO}/quote/{ticker}"
+    html = _pagina(url)
+    if html is None:
+        return None
+    min_52 = extraer_min_52(html)
+    if min_52 is None:
+        raise PaginaIlegible(f"{url} sin 52 Week Range")
+    return min_52
+
+
+# --- Función para buscar datos en Yahoo Finance ---
+@cacheado("historial")
+@protegido(HOST_YAHOO_API)
+@medido("historial", con_ticker=True)
+def obtener_historial(ticker):
+    """
+    Descarga un año de precios diarios. Retorna None si Yahoo no tiene datos.
+    Sin configurar_yfinance, yfinance devuelve un historial vacío también
+    ante una falla de red y se toma como ticker sin datos.
+    """
+    import yfinance as yf  # import diferido: es la dependencia más pesada del arranque
+    from yfinance.exceptions import YFTickerMissingError
+
+    # Sin ajuste por dividendos: el rango de 52 semanas de Yahoo usa precios crudos.
+    try:
+        hist = yf.Ticker(ticker).history(period="1y", auto_adjust=False)
+    except YFTickerMissingError as e:
+        log.info("Yahoo sin historial para %s: %s", ticker, e)
+        return None
+    return None if hist.empty else hist
+
+
+@medido("target_yahoo_rapido", con_ticker=True)
+def _target_financial_data(ticker):
+    """
+    Camino rápido: pide solo el módulo financialData de quoteSummary (un
+    request chico) en lugar de Ticker.info, que baja cinco módulos más el
+    quote completo. Retorna (respondió, target); respondió=False si Yahoo no
+    devolvió el módulo (o no conoce el ticker). Los demás errores (red,
+    rate limit, 5xx) se lanzan: el fallback no los arreglaría.
+    """
+    import yfinance as yf
+
+    try:
+        targets = yf.Ticker(ticker).analyst_price_targets
+    except (KeyError, TypeError, IndexError) as e:
+        log.info("Sin financialData para %s, se usa Ticker.info: %s", ticker, e)
+        return False, None
+    except Exception as e:
+        if not _es_404(e):
+            raise
+        return False, None
+    return bool(targets), targets.get("mean")
+
+
+@medido("target_yahoo_info", con_ticker=True)
+def _target_info(ticker):
+    import yfinance as yf
+
+    try:
+        return yf.Ticker(ticker).info.get('targetMeanPrice', None)
+    except Exception as e:
+        if _es_404(e):  # ticker desconocido: sin datos, no es falla de Yahoo
+            return None
+        raise
+
+
+@cacheado("target_yahoo")
+@protegido(HOST_YAHOO_API)
+@medido("target_yahoo", con_ticker=True)
+def obtener_target_yahoo(ticker):
+    """
+    Target promedio de analistas (targetMeanPrice). Usa Ticker.info solo si
+    el camino rápido no trae el módulo financialData; un ticker sin
+    cobertura de analistas no paga el fallback.
+    """
+    respondio, target_yhoo = _target_financial_data(ticker)
+    if not respondio:
+        contar("auto_notes_target_yahoo_fallback_total")
+        target_yhoo = _target_info(ticker)
+    return round(target_yhoo, 2) if target_yhoo is not None else None
+
+
+def metricas_historial(hist):
+    """
+    Calcula todas las métricas de precio a partir del historial de 1 año:
+    precio actual, hace 1 año, mínimo de 52 semanas (Low, como Yahoo) y la
+    volatilidad anual de los rendimientos logarítmicos diarios (la que usa
+    auto_notes.simulacion).
+    """
+    close = hist["Close"].dropna()
+    low = hist["Low"].dropna() if "Low" in hist else close
+    rendimientos = np.log(close / close.shift(1)).dropna()
+
+    return {
+        "Precio actual": round(float(close.iloc[-1]), 2),
+        "Hace 1 año": round(float(close.iloc[0]), 2),
+        "Mín 1 año": round(float(low.min()), 2),
+        "Volatilidad": round(float(rendimientos.std() * np.sqrt(252)), 4) if len(rendimientos) > 1 else None,
+    }
+
+
+# --- Verificación opcional del mínimo de 52 semanas contra el scraping ---
+VERIFICAR_MIN_52 = os.environ.get("AUTO_NOTES_VERIFICAR_MIN_52") == "1"
+TOLERANCIA_MIN_52 = 0.01  # 1% de diferencia relativa
+DISCREPANCIAS_MIN_52 = deque(maxlen=200)
+
+
+def verificar_min_52(ticker, min_historial, min_scrape):
+    """
+    Compara el mínimo calculado del historial con el scrapeado de Yahoo.
+    Registra y retorna la discrepancia si supera TOLERANCIA_MIN_52.
+    """
+    if min_historial is None or min_scrape is None or not min_scrape:
+        return None
+    diferencia = min_historial / min_scrape - 1
+    if abs(diferencia) <= TOLERANCIA_MIN_52:
+        return None
+    discrepancia = {
+        "Ticker": ticker,
+        "Mín historial": min_historial,
+        "Mín scraping": round(min_scrape, 2),
+        "Diferencia": round(diferencia, 4),
+    }
+    DISCREPANCIAS_MIN_52.append(discrepancia)
+    log.warning("Discrepancia en mínimo 52 semanas para %s: %s", ticker, discrepancia)
+    return discrepancia
+
+
+# --- Scraping de targets de analistas (TipRanks) ---
+# Alias del broker -> firma como figura en TipRanks. Cada broker elegido es una
+# columna "Target <alias>" de la nota; "Target MS" es la del score base.
+BROKERS = {
+    "MS": "Morgan Stanley",
+    "GS": "Goldman Sachs",
+    "JPM": "J.P. Morgan",
+    "BofA": "Bank of America",
+    "Citi": "Citi",
+    "Barclays": "Barclays",
+    "UBS": "UBS",
+    "WFC": "Wells Fargo",
+}
+
+
+def columna_broker(alias):
+    return f"Target {alias}"
+
+
+@cacheado("analistas")
+@protegido(HOST_TIPRANKS)
+@medido("analistas", con_ticker=True)
+def obtener_analistas(ticker):
+    """
+    Todas las filas de analistas (firma, target, rango, fecha) de la página de
+    forecast de TipRanks: una descarga y un parseo por ticker para todos los
+    brokers. None si TipRanks no conoce el ticker (404); si la página llega
+    sin la tabla (cambió el markup) lanza PaginaIlegible.
+    """
+    url = f"https://{HOST_TIPRANKS}/stocks/{ticker.lower()}/forecast"
+    html = _pagina(url)
+    if html is None:
+        return None
+    analistas = extraer_analistas(html)
+    if not analistas:
+        raise PaginaIlegible(f"{url} sin tabla de analistas")
+    return analistas
+
+
+def targets_brokers(analistas, brokers):
+    """
+    {"Target <alias>": target} de cada broker a partir de las filas de analistas.
+    """
+    return {columna_broker(alias): target_broker(analistas, BROKERS[alias]) for alias in brokers}
+
+
+def completar_brokers(notas, brokers):
+    """
+    Agrega a cada nota las columnas de los brokers que le falten, con las filas
+    de analistas ya cacheadas (vencidas incluidas): no hace requests. En las
+    canastas se combinan los targets de cada subyacente con su historial cacheado.
+    """
+    cache = obtener_cache()
+    leidos = {}
+
+    def leer(tipo, ticker):
+        if (tipo, ticker) not in leidos:
+            leidos[(tipo, ticker)] = cache.leer(tipo, ticker, permitir_vencido=True)
+        return leidos[(tipo, ticker)]
+
+    for nota in notas:
+        faltantes = [alias for alias in brokers if columna_broker(alias) not in nota]
+        if not faltantes:
+            continue
+        ticker = nota.get("Ticker")
+        if not es_canasta(ticker):
+            nota.update(targets_brokers(leer("analistas", ticker), faltantes))
+            continue
+        datos = {}
+        for pata in subyacentes(ticker):
+            hist = leer("historial", pata)
+            datos[pata] = targets_brokers(leer("analistas", pata), faltantes)
+            datos[pata]["Precio actual"] = metricas_historial(hist)["Precio actual"] if hist is not None else None
+        peores, _ = peores_niveles(list(datos), datos, [columna_broker(alias) for alias in faltantes])
+        nota.update(peores)
+
+
+# --- Búsqueda concurrente de todas las fuentes de una nota ---
+# Deadline total (segundos) para completar una nota: la latencia queda acotada
+# por la fuente más lenta y no por la suma de todas.
+TIMEOUT_NOTA = 15
+
+# Pool compartido por proceso. No se usa un "with" por nota porque su salida
+# esperaría a las fuentes colgadas, justamente lo que el deadline quiere evitar.
+_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="auto-notes-fetch")
+
+CAMPOS_MERCADO = ["Precio actual", "Target Yahoo", "Hace 1 año", "Mín 1 año", "Target MS"]
+
+
+def _esperar(futuros, timeout, ticker):
+    """
+    Espera los futuros hasta el deadline; los que no terminaron o fallaron
+    quedan en None.
+    """
+    _, pendientes = wait(futuros.values(), timeout=timeout)
+    resultados = {}
+    for nombre, futuro in futuros.items():
+        if futuro in pendientes:
+            futuro.cancel()
+            log.warning("Timeout (%ss) en %s para %s", timeout, nombre, ticker)
+            contar("auto_notes_timeouts_total", fuente=nombre[-1] if isinstance(nombre, tuple) else nombre)
+            resultados[nombre] = None
+        else:
+            try:
+                resultados[nombre] = futuro.result()
+            except Exception as e:
+                log.warning("Error en %s para %s: %s", nombre, ticker, e)
+                contar("auto_notes_fuente_errores_total", fuente=nombre[-1] if isinstance(nombre, tuple) else nombre)
+                resultados[nombre] = None
+    return resultados
+
+
+def _combinar_fuentes(ticker, hist, target_yahoo, analistas, min_52_scrape=None, brokers=()):
+    datos = dict.fromkeys(CAMPOS_MERCADO)
+    datos.update(targets_brokers(analistas, ["MS"] + [alias for alias in brokers if alias != "MS"]))
+    # Sin historial no se usan los datos de Yahoo
+    if hist is not None:
+        metricas = metricas_historial(hist)
+        datos["Precio actual"] = metricas["Precio actual"]
+        datos["Hace 1 año"] = metricas["Hace 1 año"]
+        datos["Mín 1 año"] = metricas["Mín 1 año"]
+        datos["Target Yahoo"] = target_yahoo
+        verificar_min_52(ticker, metricas["Mín 1 año"], min_52_scrape)
+    return datos
+
+
+def _fuentes(verificar):
+    fuentes = {
+        "target_yahoo": obtener_target_yahoo,
+        "analistas": obtener_analistas,
+    }
+    if verificar:
+        fuentes["min_52"] = obtener_min_52_semanas
+    return fuentes
+
+
+def obtener_datos_nota(ticker, timeout=TIMEOUT_NOTA, verificar=None, brokers=()):
+    """
+    Busca en paralelo historial, target Yahoo y los analistas de TipRanks.
+    Precio actual, hace 1 año y mínimo de 52 semanas salen del historial; con
+    verificar=True también se scrapea el mínimo de Yahoo para reportar
+    discrepancias. Retorna un dict con los campos de CAMPOS_MERCADO más
+    "Target <alias>" por cada broker pedido; las fuentes que fallan o no
+    terminan antes del deadline quedan en None.
+    """
+    verificar = VERIFICAR_MIN_52 if verificar is None else verificar
+    if es_canasta(ticker):
+        # Worst-of: los subyacentes salen del camino masivo (un download para todos)
+        return obtener_datos_notas([ticker], timeout, verificar, brokers=brokers)[ticker]
+    fuentes = dict(historial=obtener_historial, **_fuentes(verificar))
+    with medir("nota", ticker=ticker):
+        futuros = {nombre: _POOL.submit(fn, ticker) for nombre, fn in fuentes.items()}
+        r = _esperar(futuros, timeout, ticker)
+    return _combinar_fuentes(
+        ticker, r["historial"], r["target_yahoo"], r["analistas"], r.get("min_52"), brokers
+    )
+
+
+# --- Carga masiva: un único download de historiales para todos los tickers ---
+TIMEOUT_LOTE = 60
+
+
+def timeout_lote(n_tickers, verificar=False):
+    """
+    Deadline para buscar n_tickers subyacentes: TIMEOUT_LOTE más lo que tarda el
+    rate limit del host scrapeado más lento (TipRanks, 1 request/s) en dejar
+    pasar un request por subyacente. Con un deadline fijo, los lotes grandes
+    perdían los targets de los últimos tickers.
+    """
+    hosts = [HOST_TIPRANKS] + ([HOST_YAHOO] if verificar else [])
+    tasa = min(cliente_http.LIMITES_HOST.get(host, cliente_http.LIMITE_DEFAULT)["tasa"] for host in hosts)
+    return TIMEOUT_LOTE + n_tickers / tasa
+
+
+def descargar_historiales(tickers):
+    """
+    Descarga el historial de 1 año de varios tickers en una sola llamada a
+    yf.download. Los tickers que ya se están buscando en otro hilo (otra
+    sesión, o obtener_historial) no se piden de nuevo: se espera esa búsqueda,
+    y si falla se usa el valor vencido del cache, como con un download sin datos.
+    Retorna {ticker: DataFrame o None}.
+    """
+    historiales = dict.fromkeys(tickers)
+    cache = obtener_cache()
+    faltantes = []
+    for ticker in tickers:
+        historiales[ticker] = cache.leer("historial", ticker)
+        if historiales[ticker] is not None:
+            cache.contar("hits", "historial")
+        elif cache.es_negativo("historial", ticker):
+            cache.contar("negativos", "historial")
+            historiales[ticker] = cache.leer("historial", ticker, permitir_vencido=True)
+        else:
+            cache.contar("misses", "historial")
+            faltantes.append(ticker)
+    if not faltantes:
+        return historiales
+
+    # Mismas claves que @cacheado("historial"): comparte vuelos con obtener_historial
+    descargados = COALESCEDOR.hacer_lote(
+        [("historial", ticker) for ticker in faltantes],
+        lambda claves: {("historial", t): hist for t, hist in _descargar([t for _, t in claves]).items()},
+    )
+    for ticker in faltantes:
+        historiales[ticker] = descargados[("historial", ticker)]
+        if historiales[ticker] is None:
+            historiales[ticker] = cache.leer("historial", ticker, permitir_vencido=True)
+            if historiales[ticker] is not None:
+                cache.contar("vencidos", "historial")
+    return historiales
+
+
+def _descargar(tickers):
+    """
+    yf.download de los tickers; guarda en el cache los que vinieron con datos
+    y en el cache negativo los que no. Si no vino ninguno se asume una falla
+    de Yahoo (fallo del circuito, sin cache negativo). Retorna {ticker: DataFrame o None}.
+    """
+    import yfinance as yf
+
+    circuito_api = circuito(HOST_YAHOO_API)
+    try:
+        circuito_api.permitir()
+    except CircuitoAbierto:
+        return dict.fromkeys(tickers)
+    try:
+        with medir("download", tickers=len(tickers)):
+            datos = yf.download(
+                tickers, period="1y", group_by="ticker",
+                auto_adjust=False, threads=True, progress=False,
+            )
+    except Exception as e:
+        log.warning("Error en download Yahoo para %s: %s", ", ".join(tickers), e)
+        contar("auto_notes_fuente_errores_total", fuente="download")
+        datos = None
+
+    cache = obtener_cache()
+    disponibles = set(datos.columns.get_level_values(0)) if datos is not None and not datos.empty else set()
+    historiales = {}
+    for ticker in tickers:
+        hist = datos[ticker].dropna(how="all") if ticker in disponibles else None
+        if hist is not None and not hist.empty:
+            cache.guardar("historial", ticker, hist)
+            historiales[ticker] = hist
+        else:
+            historiales[ticker] = None
+
+    if not any(hist is not None for hist in historiales.values()):
+        circuito_api.fallo("download sin datos")
+        return historiales
+    circuito_api.exito()
+    for ticker, hist in historiales.items():
+        if hist is None:
+            cache.guardar_negativo("historial", ticker)
+    return historiales
+
+
+def obtener_datos_notas(tickers, timeout=None, verificar=None, pool=None, brokers=()):
+    """
+    Versión masiva de obtener_datos_nota. Los historiales salen de un único
+    download multi-ticker; los targets se buscan en paralelo en el pool
+    (el compartido del proceso, o el que se pase para fijar la cantidad de workers).
+
+    Los tickers pueden ser canastas worst-of ("AAPL/NVDA"): cada subyacente
+    distinto se busca una sola vez aunque aparezca en varias notas, y cada
+    canasta se arma desde esos datos (auto_notes.canastas). El costo escala
+    con los subyacentes únicos, no con notas × subyacentes.
+    Sin timeout, el deadline es timeout_lote de los subyacentes únicos.
+    Retorna {ticker: dict con CAMPOS_MERCADO (y las columnas de canasta)}.
+    """
+    verificar = VERIFICAR_MIN_52 if verificar is None else verificar
+    pool = pool or _POOL
+    tickers = list(dict.fromkeys(tickers))
+    patas = list(dict.fromkeys(pata for ticker in tickers for pata in subyacentes(ticker)))
+    timeout = timeout_lote(len(patas), verificar) if timeout is None else timeout
+    futuros = {"historiales": pool.submit(descargar_historiales, patas)}
+    for pata in patas:
+        for nombre, fn in _fuentes(verificar).items():
+            futuros[(pata, nombre)] = pool.submit(fn, pata)
+    with medir("lote", tickers=len(patas)):
+        r = _esperar(futuros, timeout, "carga masiva")
+
+    historiales = r["historiales"] or {}
+    datos = {
+        pata: _combinar_fuentes(
+            pata,
+            historiales.get(pata),
+            r[(pata, "target_yahoo")],
+            r[(pata, "analistas")],
+            r.get((pata, "min_52")),
+            brokers,
+        )
+        for pata in patas
+    }
+    canastas = [ticker for ticker in tickers if es_canasta(ticker)]
+    if not canastas:
+        return {ticker: datos[subyacentes(ticker)[0]] for ticker in tickers}
+
+    # Una sola matriz de correlación para los subyacentes de todas las canastas
+    matriz = correlaciones({pata: historiales.get(pata) for canasta in canastas for pata in subyacentes(canasta)})
+    columnas_brokers = [columna_broker(alias) for alias in brokers if alias != "MS"]
+    return {
+        ticker: (combinar_canasta(subyacentes(ticker), datos, matriz, columnas_brokers) if ticker in canastas
+                 else datos[subyacentes(ticker)[0]])
+        for ticker in tickers
+    }
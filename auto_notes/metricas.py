@@ -0,0 +1,219 @@
+"""
+Métricas del proceso: tiempos por etapa (fetchers, parsers, búsqueda de
+notas), hits/misses del cache y requests, reintentos y errores por host.
+
+Se exponen como texto en formato Prometheus (texto_prometheus, o un endpoint
+/metrics con servir_metricas) y como log: cada etapa medida se registra en
+el logger "auto_notes.metricas" a nivel DEBUG.
+"""
+import bisect
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger(__name__)
+
+# Límites superiores (segundos) de los buckets del histograma de etapas
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+ETAPA = "auto_notes_etapa_segundos"
+
+AYUDAS = {
+    ETAPA: "Duración de cada etapa (fetchers, parsers, búsqueda de notas).",
+    "auto_notes_cache_total": "Lecturas del cache de mercado por tipo y resultado.",
+    "auto_notes_http_requests_total": "Requests HTTP del scraping por host y estado.",
+    "auto_notes_http_reintentos_total": "Reintentos HTTP por host y motivo.",
+    "auto_notes_fuente_errores_total": "Errores de las fuentes de datos de mercado.",
+    "auto_notes_timeouts_total": "Fuentes que no terminaron antes del deadline.",
+    "auto_notes_target_yahoo_fallback_total": "Targets de Yahoo que cayeron a Ticker.info.",
+    "auto_notes_coalescidas_total": "Llamadas a las fuentes ahorradas por compartir una búsqueda en vuelo.",
+    "auto_notes_circuito_aperturas_total": "Aperturas del circuit breaker por host.",
+    "auto_notes_circuito_salteadas_total": "Llamadas salteadas por tener abierto el circuito del host.",
+}
+
+
+def _clave(nombre, etiquetas):
+    return nombre, tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+class Registro:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._contadores = {}
+        self._histogramas = {}
+
+    def contar(self, nombre, valor=1, **etiquetas):
+        clave = _clave(nombre, etiquetas)
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + valor
+
+    def observar(self, nombre, segundos, **etiquetas):
+        clave = _clave(nombre, etiquetas)
+        with self._lock:
+            h = self._histogramas.get(clave)
+            if h is None:
+                h = self._histogramas[clave] = {"buckets": [0] * len(self.buckets), "suma": 0.0, "cuenta": 0, "max": 0.0}
+            posicion = bisect.bisect_left(self.buckets, segundos)
+            if posicion < len(self.buckets):
+                h["buckets"][posicion] += 1
+            h["suma"] += segundos
+            h["cuenta"] += 1
+            h["max"] = max(h["max"], segundos)
+
+    def contadores(self):
+        """
+        Lista de {"nombre", etiquetas..., "valor"}.
+        """
+        with self._lock:
+            return [dict(etiquetas, nombre=nombre, valor=valor)
+                    for (nombre, etiquetas), valor in sorted(self._contadores.items())]
+
+    def etapas(self):
+        """
+        Resumen del histograma de etapas: llamadas, promedio, p95 aproximado y máximo en ms.
+        """
+        with self._lock:
+            histogramas = {clave: dict(h, buckets=list(h["buckets"])) for clave, h in self._histogramas.items()}
+        filas = []
+        for (nombre, etiquetas), h in sorted(histogramas.items()):
+            if nombre != ETAPA:
+                continue
+            filas.append(dict(
+                etiquetas,
+                llamadas=h["cuenta"],
+                ms_promedio=round(h["suma"] / h["cuenta"] * 1000, 1),
+                ms_p95=round(self._cuantil(h, 0.95) * 1000, 1),
+                ms_max=round(h["max"] * 1000, 1),
+            ))
+        return filas
+
+    def _cuantil(self, h, q):
+        # Límite superior del bucket que contiene el cuantil (como histogram_quantile, sin interpolar)
+        objetivo, acumulado = q * h["cuenta"], 0
+        for limite, cuenta in zip(self.buckets, h["buckets"]):
+            acumulado += cuenta
+            if acumulado >= objetivo:
+                return min(limite, h["max"])
+        return h["max"]
+
+    def texto_prometheus(self):
+        with self._lock:
+            contadores = sorted(self._contadores.items())
+            histogramas = sorted((clave, dict(h, buckets=list(h["buckets"]))) for clave, h in self._histogramas.items())
+
+        lineas, vistos = [], set()
+
+        def encabezado(nombre, tipo):
+            if nombre not in vistos:
+                vistos.add(nombre)
+                if nombre in AYUDAS:
+                    lineas.append(f"# HELP {nombre} {AYUDAS[nombre]}")
+                lineas.append(f"# TYPE {nombre} {tipo}")
+
+        for (nombre, etiquetas), valor in contadores:
+            encabezado(nombre, "counter")
+            lineas.append(f"{nombre}{_etiquetas(etiquetas)} {valor}")
+        for (nombre, etiquetas), h in histogramas:
+            encabezado(nombre, "histogram")
+            acumulado = 0
+            for limite, cuenta in zip(self.buckets, h["buckets"]):
+                acumulado += cuenta
+                lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas + (('le', repr(limite)),))} {acumulado}")
+            lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas + (('le', '+Inf'),))} {h['cuenta']}")
+            lineas.append(f"{nombre}_sum{_etiquetas(etiquetas)} {h['suma']:.6f}")
+            lineas.append(f"{nombre}_count{_etiquetas(etiquetas)} {h['cuenta']}")
+        return "\n".join(lineas) + "\n"
+
+    def reiniciar(self):
+        with self._lock:
+            self._contadores.clear()
+            self._histogramas.clear()
+
+
+def _etiquetas(etiquetas):
+    if not etiquetas:
+        return ""
+    pares = ",".join(f'{k}="{v}"'.replace("\n", " ") for k, v in etiquetas)
+    return "{" + pares + "}"
+
+
+# Registro del proceso
+REGISTRO = Registro()
+contar = REGISTRO.contar
+texto_prometheus = REGISTRO.texto_prometheus
+
+
+@contextmanager
+def medir(etapa, **contexto):
+    """
+    Mide la duración del bloque como etapa del histograma. Las etiquetas del
+    contexto (ej. ticker) solo van al log, para no multiplicar las series.
+    """
+    t0 = time.perf_counter()
+    estado = "ok"
+    try:
+        yield
+    except Exception:
+        estado = "error"
+        raise
+    finally:
+        _registrar(etapa, estado, time.perf_counter() - t0, contexto)
+
+
+def medido(etapa, con_ticker=False):
+    """
+    Decorador de medir para fetchers y parsers; un resultado None cuenta como
+    estado "sin_datos". Con con_ticker=True el primer argumento va al log como ticker.
+    """
+    def decorador(fn):
+        @functools.wraps(fn)
+        def envoltura(*args, **kwargs):
+            t0 = time.perf_counter()
+            estado = "error"
+            try:
+                resultado = fn(*args, **kwargs)
+                estado = "ok" if resultado is not None else "sin_datos"
+                return resultado
+            finally:
+                contexto = {"ticker": args[0]} if con_ticker and args else {}
+                _registrar(etapa, estado, time.perf_counter() - t0, contexto)
+        return envoltura
+    return decorador
+
+
+def _registrar(etapa, estado, segundos, contexto):
+    REGISTRO.observar(ETAPA, segundos, etapa=etapa, estado=estado)
+    if log.isEnabledFor(logging.DEBUG):
+        extra = "".join(f" {k}={v}" for k, v in contexto.items())
+        log.debug("etapa=%s estado=%s ms=%.1f%s", etapa, estado, segundos * 1000, extra)
+
+
+# --- Endpoint /metrics ---
+def servir_metricas(puerto, host="127.0.0.1"):
+    """
+    Sirve texto_prometheus() en http://host:puerto/metrics desde un hilo daemon.
+    Retorna el servidor (server.shutdown() para detenerlo).
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            cuerpo = texto_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((host, puerto), Handler)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name="auto-notes-metricas", daemon=True).start()
+    return servidor
@@ -0,0 +1,96 @@
+"""
+Lectura de notas cargadas en lote (texto pegado o CSV de term sheets).
+"""
+import io
+from pathlib import Path
+
+import pandas as pd
+
+from auto_notes.canastas import normalizar_ticker
+
+COLUMNAS_ENTRADA = ["Ticker", "Tasa", "Colchón", "Memory"]
+
+# Variantes de header que se ven en los archivos de emisores
+_ALIAS_COLUMNAS = {
+    "ticker": "Ticker",
+    "tasa": "Tasa",
+    "colchón": "Colchón",
+    "colchon": "Colchón",
+    "memory": "Memory",
+}
+
+# Valores aceptados como "Memory = sí" en archivos de emisores
+_VERDADEROS = {"1", "true", "si", "sí", "s", "yes", "y", "x", "memory"}
+
+
+def _a_bool(valor):
+    if isinstance(valor, str):
+        return valor.strip().lower() in _VERDADEROS
+    try:
+        return bool(valor) and not pd.isna(valor)
+    except (TypeError, ValueError):
+        return bool(valor)
+
+
+def _a_float(valor):
+    if isinstance(valor, str):
+        valor = valor.strip().replace("%", "").replace(",", ".")
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if pd.isna(numero) else numero
+
+
+def leer_notas(texto):
+    """
+    Convierte filas "Ticker, Tasa, Colchón, Memory" en notas básicas.
+    Acepta coma, punto y coma o tabulación como separador y un header
+    opcional. Las filas sin ticker se descartan.
+    """
+    texto = texto.strip()
+    if not texto:
+        return []
+
+    primera = texto.splitlines()[0]
+    separador = "\t" if "\t" in primera else ";" if ";" in primera else ","
+    tiene_header = primera.split(separador)[0].strip().lower() == "ticker"
+    df = pd.read_csv(
+        io.StringIO(texto),
+        sep=separador,
+        header=0 if tiene_header else None,
+        dtype=str,
+        skipinitialspace=True,
+    )
+    if not tiene_header:
+        df.columns = COLUMNAS_ENTRADA[:len(df.columns)] + list(df.columns[len(COLUMNAS_ENTRADA):])
+    return _notas_desde_df(df)
+
+
+def leer_archivo_notas(ruta, hoja=0, fila_header=0):
+    """
+    Lee notas desde un CSV/TXT o un Excel (.xlsx/.xls). En Excel, fila_header
+    es la fila (base 0) con los títulos de columna; se buscan las columnas
+    Ticker, Tasa, Colchón y Memory sin distinguir mayúsculas.
+    """
+    ruta = Path(ruta)
+    if ruta.suffix.lower() in (".xlsx", ".xlsm", ".xls"):
+        df = pd.read_excel(ruta, sheet_name=hoja, header=fila_header, dtype=object)
+        return _notas_desde_df(df)
+    return leer_notas(ruta.read_text(encoding="utf-8-sig"))
+
+
+def _notas_desde_df(df):
+    df = df.rename(columns=lambda col: _ALIAS_COLUMNAS.get(str(col).strip().lower(), str(col).strip()))
+    notas = []
+    for fila in df.to_dict("records"):
+        ticker = normalizar_ticker(fila.get("Ticker"))  # "aapl / nvda" -> "AAPL/NVDA" (worst-of)
+        if not ticker or ticker == "NAN":
+            continue
+        notas.append({
+            "Ticker": ticker,
+            "Tasa": _a_float(fila.get("Tasa")),
+            "Colchón": _a_float(fila.get("Colchón")),
+            "Memory": _a_bool(fila.get("Memory")),
+        })
+    return notas
@@ -0,0 +1,221 @@
+"""
+Extracción puntual de valores del HTML de Yahoo Finance y TipRanks.
+
+Las páginas pesan varios cientos de KB; en lugar de armar el DOM completo se
+recorta el HTML desde la etiqueta buscada y se parsea solo el fragmento que
+interesa (SoupStrainer), con lxml si está instalado, que es bastante más
+rápido que html.parser. bs4 se importa recién en el primer parseo.
+"""
+import functools
+import importlib.util
+import re
+
+from auto_notes.metricas import medido
+
+PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+
+def _tiene_clase(nombre):
+    return lambda clases: bool(clases) and nombre in clases.split()
+
+
+_ATRIBUTO_52 = 'data-field="fiftyTwoWeekRange"'
+_CLASE_TIPRANKS = re.compile(r'class="[^"]*\brt-tbody\b')
+
+
+@functools.lru_cache(maxsize=None)
+def _strainers():
+    from bs4 import SoupStrainer
+
+    strainer_52 = SoupStrainer("fin-streamer", attrs={"data-field": "fiftyTwoWeekRange"})
+    strainer_tipranks = SoupStrainer("div", class_=_tiene_clase("rt-tbody"))
+    return strainer_52, strainer_tipranks
+
+
+def _desde_etiqueta(html, posicion):
+    """
+    Recorta el HTML desde el "<" de la etiqueta que contiene la posición dada,
+    para no tokenizar todo lo anterior.
+    """
+    inicio = html.rfind("<", 0, posicion)
+    return html[inicio:] if inicio >= 0 else html
+
+
+def _min_desde_rango(range_text):
+    """
+    "177.00 - 488.54" -> 177.00
+    """
+    if " - " in range_text:
+        parts = range_text.split(" - ")
+        if len(parts) == 2:
+            try:
+                min_52_week = float(parts[0].strip())
+                return round(min_52_week, 2)
+            except ValueError:
+                pass
+    return None
+
+
+@medido("parse_min_52")
+def extraer_min_52(html):
+    """
+    Returns the 52-week low from a Yahoo Finance quote page, or None.
+    """
+    from bs4 import BeautifulSoup
+
+    strainer_52, _ = _strainers()
+
+    # Look for the 52 Week Range element
+    # Find the fin-streamer with data-field="fiftyTwoWeekRange"
+    posicion = html.find(_ATRIBUTO_52)
+    if posicion >= 0:
+        # Solo el elemento fin-streamer (apertura hasta su cierre)
+        fragmento = _desde_etiqueta(html, posicion)
+        fin = fragmento.find("</fin-streamer>")
+        fragmento = fragmento[:fin + len("</fin-streamer>")] if fin >= 0 else fragmento
+        range_element = BeautifulSoup(fragmento, PARSER, parse_only=strainer_52).find("fin-streamer")
+        if range_element is None:
+            soup = BeautifulSoup(html, PARSER, parse_only=strainer_52)
+            range_element = soup.find("fin-streamer", {"data-field": "fiftyTwoWeekRange"})
+        if range_element:
+            min_52_week = _min_desde_rango(range_element.get_text(strip=True))
+            if min_52_week is not None:
+                return min_52_week
+
+    # Fallback: look for any element with title "52 Week Range". Es el camino
+    # poco frecuente (markup distinto), así que acá sí se arma el DOM completo.
+    if "52 Week Range" not in html:
+        return None
+    soup = BeautifulSoup(html, PARSER)
+    range_label = soup.find("span", {"title": "52 Week Range"})
+    if range_label:
+        # Find the value span that follows
+        parent = range_label.find_parent()
+        if parent:
+            value_span = parent.find("span", class_="value")
+            if value_span:
+                fin_streamer = value_span.find("fin-streamer")
+                if fin_streamer:
+                    return _min_desde_rango(fin_streamer.get_text(strip=True))
+    return None
+
+
+def _precio(texto):
+    return round(float(texto.strip().replace("$", "").replace(",", "")), 2)
+
+
+def _precio_opcional(texto):
+    # Extremo bajo de un rango: informativo, no invalida el target si no se puede leer
+    try:
+        return _precio(texto)
+    except ValueError:
+        return None
+
+
+def _target_celda(price_target_cell):
+    """
+    (target, rango) de la celda Price Target. Para rangos ($80 → $85) el
+    target es el valor más alto y rango es (bajo, alto); (None, None) si la
+    celda no tiene un precio.
+    """
+    # Look for the price target value within the cell
+    # Handle both single values and ranges (e.g., $80 → $85)
+    price_spans = price_target_cell.find_all("span", class_="Mdcvgxd7")
+    try:
+        if price_spans:
+            if len(price_spans) == 1:
+                # Single price target
+                return _precio(price_spans[0].get_text(strip=True)), None
+            # Range: take the higher value (second span) for conservative estimate
+            alto = _precio(price_spans[1].get_text(strip=True))
+            return alto, (_precio_opcional(price_spans[0].get_text(strip=True)), alto)
+
+        # Fallback: get all text from the cell and parse ranges
+        price_target_text = price_target_cell.get_text(strip=True)
+        if not price_target_text or price_target_text == "—":
+            return None, None
+        # Check if it's a range with arrow or dash
+        for separator in ("→", "–", "-"):
+            if separator in price_target_text:
+                parts = price_target_text.split(separator)
+                if len(parts) != 2:
+                    return None, None
+                alto = _precio(parts[1])
+                return alto, (_precio_opcional(parts[0]), alto)
+        # Single value
+        return _precio(price_target_text), None
+    except ValueError:
+        return None, None
+
+
+@medido("parse_analistas")
+def extraer_analistas(html):
+    """
+    Todas las filas de la tabla de analistas de una página de forecast de
+    TipRanks, en una sola pasada: lista de dicts con Analista, Firma, Target,
+    Rango (bajo, alto) o None, Rating y Fecha (texto tal cual la página).
+    """
+    from bs4 import BeautifulSoup
+
+    _, strainer_tipranks = _strainers()
+    encontrado = _CLASE_TIPRANKS.search(html)
+    if encontrado is None:
+        return []
+
+    # Find the table body with analyst data (React Table structure)
+    soup = BeautifulSoup(_desde_etiqueta(html, encontrado.start()), PARSER, parse_only=strainer_tipranks)
+    table_body = soup.find("div", class_="rt-tbody")
+    if table_body is None:
+        soup = BeautifulSoup(html, PARSER, parse_only=strainer_tipranks)
+        table_body = soup.find("div", class_="rt-tbody")
+    if table_body is None:
+        return []
+
+    analistas = []
+    # Find all table rows (rt-tr-group contains each analyst row)
+    for row_group in table_body.find_all("div", class_="rt-tr-group"):
+        # Find the actual row within the group
+        row = row_group.find("div", class_="rt-tr")
+        if not row:
+            continue
+        # Columnas: analista, firma, price target, rating, fecha
+        cells = row.find_all("div", class_="rt-td")
+        if len(cells) < 3:  # Make sure we have enough columns
+            continue
+        target, rango = _target_celda(cells[2])
+        texto = lambda i: cells[i].get_text(strip=True) if len(cells) > i else None
+        analistas.append({
+            "Analista": texto(0),
+            # Con separador: si la celda trae más de un elemento, la firma no queda pegada a otro texto
+            "Firma": cells[1].get_text(" ", strip=True),
+            "Target": target,
+            "Rango": rango,
+            "Rating": texto(3),
+            "Fecha": texto(4),
+        })
+    return analistas
+
+
+@functools.lru_cache(maxsize=None)
+def _patron_firma(firma):
+    # La firma como palabras completas: "Citi" no coincide con "Citizens JMP"
+    return re.compile(rf"(?<!\w){re.escape(firma)}(?!\w)")
+
+
+def target_broker(analistas, firma):
+    """
+    Target de la primera fila de la firma (por ejemplo "Morgan Stanley") que tenga precio, o None.
+    """
+    patron = _patron_firma(firma)
+    for analista in analistas or []:
+        if analista["Target"] is not None and patron.search(analista["Firma"] or ""):
+            return analista["Target"]
+    return None
+
+
+def extraer_target_morgan(html):
+    """
+    Returns Morgan Stanley's price target from a TipRanks forecast page, or None.
+    For ranges ($80 → $85) the higher value is used.
+    """
+    return target_broker(extraer_analistas(html), "Morgan Stanley")
@@ -0,0 +1,163 @@
+"""
+Refresco en segundo plano de los datos de mercado de las notas cargadas.
+
+Un hilo por sesión vuelve a buscar los datos de todos los tickers seguidos
+cada cierto intervalo (más seguido con el mercado abierto) y deja el
+resultado en memoria. La UI nunca espera la red: en cada rerun aplica a las
+notas los datos del último refresco terminado, si hay uno nuevo.
+
+Las búsquedas pasan por el cache de mercado, así que un intervalo menor al
+TTL de cada dato no genera requests adicionales.
+"""
+import datetime
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from zoneinfo import ZoneInfo
+
+from auto_notes.mercado import CAMPOS_MERCADO, obtener_datos_notas
+
+log = logging.getLogger(__name__)
+
+# Intervalos de refresco en segundos
+INTERVALO_MERCADO = 15 * 60
+INTERVALO_FUERA = 60 * 60
+
+# Horario regular de NYSE/Nasdaq (sin feriados)
+ZONA_MERCADO = ZoneInfo("America/New_York")
+APERTURA = datetime.time(9, 30)
+CIERRE = datetime.time(16, 0)
+
+# Si la sesión deja de consultar al refrescador por este tiempo, el hilo termina
+INACTIVIDAD_MAX = 30 * 60
+
+# Pool propio de los refrescos de todas las sesiones, separado del de mercado: un
+# refresco de cientos de tickers (limitado por el rate limit de TipRanks) no deja
+# sin workers a las búsquedas interactivas, que tienen deadline de segundos.
+WORKERS_REFRESCO = 4
+_POOL_REFRESCO = ThreadPoolExecutor(max_workers=WORKERS_REFRESCO, thread_name_prefix="auto-notes-refresco")
+
+
+def mercado_abierto(ahora=None):
+    ahora = (ahora or datetime.datetime.now(datetime.timezone.utc)).astimezone(ZONA_MERCADO)
+    return ahora.weekday() < 5 and APERTURA <= ahora.time() < CIERRE
+
+
+class Refrescador:
+    def __init__(self, intervalo_mercado=INTERVALO_MERCADO, intervalo_fuera=INTERVALO_FUERA,
+                 obtener=obtener_datos_notas, pool=None):
+        self.intervalo_mercado = intervalo_mercado
+        self.intervalo_fuera = intervalo_fuera
+        self.verificar = False
+        self.brokers = ()
+        self._obtener = obtener
+        self._pool = pool or _POOL_REFRESCO
+        self._tickers = []
+        self._datos = {}
+        self.version = 0
+        self.ultimo_refresco = None
+        self.en_curso = False
+        self._ultima_consulta = time.monotonic()
+        self._lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def intervalo(self):
+        return self.intervalo_mercado if mercado_abierto() else self.intervalo_fuera
+
+    def seguir(self, tickers, verificar=False, brokers=()):
+        """
+        Fija los tickers (y los brokers) a refrescar. No hace I/O; se llama en cada rerun.
+        """
+        with self._lock:
+            self._tickers = list(dict.fromkeys(tickers))
+            self.verificar = verificar
+            self.brokers = tuple(brokers)
+            self._ultima_consulta = time.monotonic()
+
+    def iniciar(self):
+        """
+        Arranca el hilo si no está corriendo; el primer refresco es inmediato.
+        """
+        if not self.activo():
+            self._despertar.set()
+        self._detener.clear()
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(target=self._loop, name="auto-notes-refresco", daemon=True)
+            self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        self._despertar.set()
+
+    def activo(self):
+        return self._hilo is not None and self._hilo.is_alive() and not self._detener.is_set()
+
+    def refrescar_ahora(self):
+        """
+        Adelanta el próximo refresco sin esperarlo.
+        """
+        self._despertar.set()
+
+    def _loop(self):
+        ultimo = time.monotonic()
+        while not self._detener.is_set():
+            if time.monotonic() - self._ultima_consulta > INACTIVIDAD_MAX:
+                break  # La sesión ya no existe
+            # Se espera de a tramos cortos para tomar cambios de intervalo y la apertura/cierre del mercado
+            restante = ultimo + self.intervalo() - time.monotonic()
+            if restante > 0 and not self._despertar.wait(min(restante, 60)):
+                continue
+            self._despertar.clear()
+            if self._detener.is_set():
+                break
+            self._refrescar()
+            ultimo = time.monotonic()
+
+    def _refrescar(self):
+        with self._lock:
+            tickers, verificar, brokers = list(self._tickers), self.verificar, self.brokers
+        if not tickers:
+            return
+        self.en_curso = True
+        try:
+            datos = self._obtener(tickers, verificar=verificar, pool=self._pool, brokers=brokers)
+        except Exception as e:
+            log.warning("Error refrescando %d tickers: %s", len(tickers), e)
+            return
+        finally:
+            self.en_curso = False
+
+        # Un ticker sin ningún dato (fuente caída) conserva los valores anteriores
+        nuevos = {
+            ticker: valores for ticker, valores in datos.items()
+            if any(valores.get(campo) is not None for campo in CAMPOS_MERCADO)
+        }
+        with self._lock:
+            self._datos.update(nuevos)
+            self.version += 1
+            self.ultimo_refresco = datetime.datetime.now()
+
+    def aplicar(self, notas, version_aplicada=0):
+        """
+        Actualiza en el lugar los campos de mercado de las notas con el último
+        refresco, si es posterior a version_aplicada. Los campos que el refresco
+        no pudo obtener mantienen su valor, y las columnas de brokers solo se
+        actualizan si la nota ya las tiene. Retorna la versión aplicada.
+        """
+        with self._lock:
+            self._ultima_consulta = time.monotonic()
+            if self.version <= version_aplicada:
+                return version_aplicada
+            datos, version = dict(self._datos), self.version
+
+        for nota in notas:
+            valores = datos.get(nota.get("Ticker"))
+            if valores:
+                nota.update({
+                    campo: valor for campo, valor in valores.items()
+                    if valor is not None and (campo in CAMPOS_MERCADO or campo in nota)
+                })
+        return version
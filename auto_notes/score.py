@@ -0,0 +1,285 @@
+"""
+Motor de scoring de notas: versión escalar (una nota) y vectorizada (tabla completa).
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Orden de los términos t1..t7 (y de los vectores de pesos)
+TERMINOS = ["Tasa", "Colchón", "Memory", "Target Yahoo", "Target MS", "1 Año", "Mín 1 Año"]
+
+# Pesos por defecto del motor
+PESOS_DEFAULT = {
+    "Tasa": 0.15,
+    "Colchón": 0.34,
+    "Memory": 0.24,
+    "Target Yahoo": 0.09,
+    "Target MS": 0.09,
+    "1 Año": 0.09,
+    "Mín 1 Año": 0.09,
+}
+
+# Columnas de la nota que usa el score
+COLUMNAS_SCORE = ["Tasa", "Colchón", "Memory", "Precio actual", "Target Yahoo", "Target MS", "Hace 1 año", "Mín 1 año"]
+
+# Término opcional de la simulación Monte Carlo (auto_notes.simulacion): retorno
+# anual esperado de la nota en %, en la misma escala que Tasa (t = retorno / 20 * peso)
+TERMINO_SIMULACION = "Retorno MC"
+
+
+def terminos_extra(pesos):
+    """
+    Términos opcionales: las claves de los pesos que no están en TERMINOS. Cada
+    uno usa la columna de la nota del mismo nombre; los targets de otros brokers
+    ("Target GS") se calculan igual que Target MS y TERMINO_SIMULACION como Tasa.
+    Van después de t7, en el orden de los pesos.
+    """
+    if not isinstance(pesos, dict):
+        return []
+    return [termino for termino in pesos if termino not in TERMINOS]
+
+
+# -- Cálculo de Score (según lógica del PRD) --
+def calcular_score(nota, pesos):
+    # Extraer valores, convertir None a 0
+    tasa = nota.get("Tasa") or 0
+    colchon = nota.get("Colchón") or 0
+    memory = 1 if nota.get("Memory") else 0
+    precio_actual = nota.get("Precio actual") or 0
+    target_yahoo = nota.get("Target Yahoo") or 0
+    target_morgan = nota.get("Target MS") or 0
+    hace_1_anio = nota.get("Hace 1 año") or 0
+    min_1_anio = nota.get("Mín 1 año") or 0
+
+    # Pesos
+    p_tasa = pesos["Tasa"]
+    p_colchon = pesos["Colchón"]
+    p_memory = pesos["Memory"]
+    p_yahoo = pesos["Target Yahoo"]
+    p_ms = pesos["Target MS"]
+    p_1y = pesos["1 Año"]
+    p_min1y = pesos["Mín 1 Año"]
+
+    # Trigger
+    try:
+        trigger = precio_actual * (100 - colchon) / 100 if precio_actual and colchon is not None else 0
+    except Exception:
+        trigger = 0
+
+    # Evitar divisiones por cero
+    def safe_div(n, d):
+        try:
+            return n / d if d else 0
+        except:
+            return 0
+
+    # Términos polinómicos
+    t1 = tasa * p_tasa / 20
+    t2 = colchon * p_colchon / 100
+    t3 = memory * p_memory
+    t4 = ((safe_div(target_yahoo, precio_actual) - 1) * p_yahoo if precio_actual else 0)
+    t5 = ((safe_div(target_morgan, precio_actual) - 1) * p_ms if precio_actual else 0)
+    t6 = (safe_div(hace_1_anio, trigger) * p_1y if trigger else 0)
+    t7 = (safe_div(min_1_anio, trigger) * p_min1y if trigger else 0)
+
+    score = t1 + t2 + t3 + t4 + t5 + t6 + t7
+
+    # Términos opcionales: simulación Monte Carlo y targets de otros brokers ("Target <alias>"), igual que t5
+    for termino in terminos_extra(pesos):
+        valor = nota.get(termino) or 0
+        if termino == TERMINO_SIMULACION:
+            score += valor / 20 * pesos[termino]
+        else:
+            score += ((safe_div(valor, precio_actual) - 1) * pesos[termino] if precio_actual else 0)
+    return round(score, 2)
+
+
+def vector_pesos(pesos):
+    """
+    Dict de pesos -> array en el orden de TERMINOS más los términos opcionales
+    (si ya es un array, lo valida).
+    """
+    if isinstance(pesos, dict):
+        return np.array([pesos[termino] for termino in TERMINOS + terminos_extra(pesos)], dtype=float)
+    pesos = np.asarray(pesos, dtype=float)
+    if pesos.shape[-1] < len(TERMINOS):
+        raise ValueError(f"Se esperaban al menos {len(TERMINOS)} pesos, se recibieron {pesos.shape[-1]}")
+    return pesos
+
+
+def _a_float(valores):
+    try:
+        valores = np.array(valores, dtype=float)
+    except (TypeError, ValueError):
+        valores = pd.to_numeric(pd.Series(valores), errors="coerce").to_numpy(dtype=float)
+    return np.nan_to_num(valores, nan=0.0)
+
+
+def columnas_score(notas, extras=()):
+    """
+    Convierte las notas (lista de dicts o DataFrame) en arrays float por
+    columna, con None/NaN -> 0 igual que calcular_score. Memory queda en 0/1.
+    extras son columnas adicionales (términos opcionales).
+    """
+    if isinstance(notas, pd.DataFrame):
+        extraer = lambda col: notas[col].tolist() if col in notas.columns else [None] * len(notas)
+    else:
+        notas = list(notas)
+        extraer = lambda col: [nota.get(col) for nota in notas]
+
+    columnas = {}
+    for col in COLUMNAS_SCORE + list(extras):
+        if col == "Memory":
+            columnas[col] = np.array([1.0 if v and not pd.isna(v) else 0.0 for v in extraer(col)])
+        else:
+            columnas[col] = _a_float(extraer(col))
+    return columnas
+
+
+def _div(n, d):
+    # Igual que safe_div: 0 donde el divisor es 0
+    return np.divide(n, d, out=np.zeros_like(n), where=d != 0)
+
+
+def calcular_bases(columnas, extras=()):
+    """
+    Parte de cada término t1..t7 (y de los términos opcionales en extras) que
+    no depende de los pesos, para todas las notas a la vez: matriz
+    (n_notas, 7 + len(extras)). Los términos se obtienen como
+    bases * pesos / divisores, con las mismas operaciones que calcular_score.
+    """
+    tasa = columnas["Tasa"]
+    colchon = columnas["Colchón"]
+    precio_actual = columnas["Precio actual"]
+
+    # Trigger (0 si no hay precio)
+    trigger = np.where(precio_actual != 0, precio_actual * (100 - colchon) / 100, 0.0)
+    hay_precio = precio_actual != 0
+    hay_trigger = trigger != 0
+
+    b4 = np.where(hay_precio, _div(columnas["Target Yahoo"], precio_actual) - 1, 0.0)
+    b5 = np.where(hay_precio, _div(columnas["Target MS"], precio_actual) - 1, 0.0)
+    b6 = np.where(hay_trigger, _div(columnas["Hace 1 año"], trigger), 0.0)
+    b7 = np.where(hay_trigger, _div(columnas["Mín 1 año"], trigger), 0.0)
+    opcionales = []
+    for extra in extras:
+        valores = columnas.get(extra, np.zeros_like(precio_actual))
+        if extra == TERMINO_SIMULACION:
+            opcionales.append(valores / 20)
+        else:
+            opcionales.append(np.where(hay_precio, _div(valores, precio_actual) - 1, 0.0))
+    return np.column_stack([tasa, colchon, columnas["Memory"], b4, b5, b6, b7] + opcionales)
+
+
+# t1 = tasa * p / 20, t2 = colchón * p / 100, el resto base * p
+DIVISORES = np.array([20, 100, 1, 1, 1, 1, 1], dtype=float)
+
+
+def divisores(n_terminos):
+    return np.concatenate([DIVISORES, np.ones(n_terminos - len(DIVISORES))])
+
+
+def redondear(scores):
+    """
+    Redondeo a 2 decimales idéntico al round() de calcular_score. Se resuelve
+    con NumPy y solo los valores cercanos a medio centavo (donde x * 100 puede
+    quedar del otro lado del .5) pasan por round() de Python.
+    """
+    scores = np.asarray(scores, dtype=float)
+    centavos = scores * 100
+    redondeados = np.rint(centavos) / 100
+    dudosos = np.flatnonzero(np.abs(centavos - np.floor(centavos) - 0.5) < 1e-6)
+    for i in dudosos.tolist():
+        redondeados[i] = round(float(scores[i]), 2)
+    return redondeados
+
+
+def combinar_bases(bases, pesos):
+    """
+    Score redondeado a partir de las bases ya calculadas: solo multiplica por
+    los pesos y suma en el mismo orden que calcular_score (t1 + t2 + ... + t7).
+    """
+    terminos = bases * vector_pesos(pesos) / divisores(bases.shape[1])
+    score = terminos[:, 0]
+    for i in range(1, terminos.shape[1]):
+        score = score + terminos[:, i]
+    return redondear(score)
+
+
+def calcular_scores(notas, pesos):
+    """
+    Versión vectorizada de calcular_score para toda la tabla de notas
+    (lista de dicts, DataFrame o dict de columnas). Retorna un array de scores.
+    """
+    extras = terminos_extra(pesos)
+    es_columnas = isinstance(notas, dict) and isinstance(notas.get("Precio actual"), np.ndarray)
+    columnas = notas if es_columnas else columnas_score(notas, extras)
+    return combinar_bases(calcular_bases(columnas, extras), pesos)
+
+
+# --- Rescore incremental al cambiar los pesos ---
+class MotorScore:
+    """
+    Cachea las bases de cada nota (por contenido de sus campos de score) y
+    memoiza los scores por vector de pesos. Un cambio de pesos solo recombina
+    las bases; volver a un vector ya usado no recalcula nada. Es thread-safe,
+    así que puede compartirse entre sesiones.
+    """
+
+    MAX_MEMO = 64
+    MAX_BASES = 50000
+
+    def __init__(self):
+        self._bases = {}
+        self._matriz = (None, None)
+        self._memo = OrderedDict()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def clave_nota(nota, extras=()):
+        return (extras, tuple(nota.get(col) for col in COLUMNAS_SCORE + list(extras)))
+
+    def matriz_bases(self, notas, extras=()):
+        """
+        Matriz de bases de la tabla (con los términos opcionales en extras);
+        solo calcula las notas nuevas o editadas. Retorna (firma de la tabla, matriz).
+        La firma es la tupla de claves de las notas (no su hash): dos tablas
+        distintas nunca comparten matriz ni scores memoizados.
+        """
+        extras = tuple(extras)
+        firma = tuple(self.clave_nota(nota, extras) for nota in notas)
+        with self._lock:
+            return self._matriz_bases(firma, notas, extras)
+
+    def _matriz_bases(self, firma, notas, extras=()):
+        if self._matriz[0] == firma:
+            return self._matriz
+
+        faltantes = {clave: nota for clave, nota in zip(firma, notas) if clave not in self._bases}
+        if faltantes:
+            if len(self._bases) + len(faltantes) > self.MAX_BASES:
+                self._bases.clear()
+                faltantes = dict(zip(firma, notas))
+            nuevas = calcular_bases(columnas_score(list(faltantes.values()), extras), extras)
+            self._bases.update(zip(faltantes.keys(), nuevas))
+
+        matriz = np.array([self._bases[clave] for clave in firma]).reshape(len(firma), len(TERMINOS) + len(extras))
+        self._matriz = (firma, matriz)
+        return self._matriz
+
+    def scores(self, notas, pesos):
+        firma, matriz = self.matriz_bases(notas, terminos_extra(pesos))
+        clave = (firma, tuple(vector_pesos(pesos).tolist()))
+        with self._lock:
+            if clave in self._memo:
+                self._memo.move_to_end(clave)
+                return self._memo[clave]
+
+        scores = combinar_bases(matriz, pesos)
+        with self._lock:
+            self._memo[clave] = scores
+            if len(self._memo) > self.MAX_MEMO:
+                self._memo.popitem(last=False)
+        return scores
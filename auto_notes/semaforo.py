@@ -0,0 +1,56 @@
+"""
+Semáforo de scores: bandas verde/amarillo/rojo calculadas una sola vez para
+toda la columna. Lo usan tanto la tabla de la UI como el export a Excel.
+"""
+import numpy as np
+import pandas as pd
+
+VERDE, AMARILLO, ROJO = "verde", "amarillo", "rojo"
+
+# Colores tipo semáforo (mismos en la UI y en Excel)
+COLORES = {VERDE: "99FF99", AMARILLO: "FFFF99", ROJO: "FF9999"}
+
+# Percentil relativo a partir del cual se asigna cada banda
+UMBRAL_VERDE = 0.66
+UMBRAL_AMARILLO = 0.33
+
+
+def percentiles(scores, metodo="rango"):
+    """
+    Percentil relativo (0 a 1) de cada score. metodo="rango" usa la posición
+    entre el mínimo y el máximo; metodo="cuantil" usa el ranking de la nota.
+    Si todos los scores son iguales se asigna 1 (el mejor color). NaN -> NaN.
+    """
+    scores = np.asarray(scores, dtype=float)
+    validos = scores[~np.isnan(scores)]
+    if len(validos) == 0:
+        return np.full(scores.shape, np.nan)
+
+    if metodo == "cuantil":
+        if len(validos) == 1:
+            return np.where(np.isnan(scores), np.nan, 1.0)
+        rangos = pd.Series(scores).rank(method="average").to_numpy()
+        return (rangos - 1) / (len(validos) - 1)
+
+    min_score, max_score = validos.min(), validos.max()
+    if max_score - min_score > 0:
+        return (scores - min_score) / (max_score - min_score)
+    return np.where(np.isnan(scores), np.nan, 1.0)  # Todos los scores son iguales
+
+
+def bandas(scores, metodo="rango"):
+    """
+    Banda de cada score (VERDE, AMARILLO, ROJO o "" si no hay score), en una sola pasada.
+    """
+    percentil = percentiles(scores, metodo)
+    return np.select(
+        [np.isnan(percentil), percentil >= UMBRAL_VERDE, percentil >= UMBRAL_AMARILLO],
+        ["", VERDE, AMARILLO],
+        default=ROJO,
+    )
+
+
+def estilo_css(banda):
+    if not banda:
+        return ""
+    return f"background-color: #{COLORES[banda]}; color: black;"
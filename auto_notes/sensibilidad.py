@@ -0,0 +1,173 @@
+"""
+Sensibilidad del ranking a los pesos del motor.
+
+El score es lineal en los pesos (bases * pesos / divisores, ver score.calcular_bases),
+así que evaluar miles de vectores de pesos es un solo producto de matrices
+(notas × términos) @ (términos × vectores). Sobre esa matriz de scores se mide
+qué tan estable es el ranking, la probabilidad de cada nota de quedar en la
+banda verde del semáforo y qué pesos mueven más el ranking.
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from auto_notes.score import (
+    TERMINOS, calcular_bases, columnas_score, combinar_bases, divisores, redondear, terminos_extra, vector_pesos,
+)
+from auto_notes.semaforo import UMBRAL_VERDE
+
+MUESTRAS_DEFAULT = 2000
+AMPLITUD_DEFAULT = 0.25
+PERTURBACION, GRILLA = "perturbacion", "grilla"
+# La grilla crece como 3 ** términos: con brokers y Retorno MC se pasa a muestrear
+MAX_VECTORES_GRILLA = 3 ** len(TERMINOS)
+
+
+# --- Vectores de pesos ---
+def perturbar_pesos(pesos, n=MUESTRAS_DEFAULT, amplitud=AMPLITUD_DEFAULT, semilla=0):
+    """
+    n vectores de pesos con cada peso multiplicado por un factor uniforme en
+    [1 - amplitud, 1 + amplitud], independiente por término. Matriz (n, términos).
+    """
+    base = vector_pesos(pesos)
+    azar = np.random.default_rng(semilla)
+    return base * azar.uniform(1 - amplitud, 1 + amplitud, size=(n, len(base)))
+
+
+def tamanio_grilla(pesos):
+    return 3 ** int(np.count_nonzero(vector_pesos(pesos)))
+
+
+def grilla_pesos(pesos, amplitud=AMPLITUD_DEFAULT):
+    """
+    Todas las combinaciones de factores (1 - amplitud, 1, 1 + amplitud) sobre
+    los pesos distintos de 0 (3 ** términos vectores; con los siete términos, 2187).
+    """
+    base = vector_pesos(pesos)
+    variables = np.flatnonzero(base)
+    factores = np.ones((3 ** len(variables), len(base)))
+    factores[:, variables] = list(itertools.product((1 - amplitud, 1.0, 1 + amplitud), repeat=len(variables)))
+    return base * factores
+
+
+# --- Scores, rangos y bandas por columna ---
+def scores_pesos(bases, matriz_pesos):
+    """
+    Scores de todas las notas para cada vector de pesos, redondeados como
+    calcular_score: matriz (n_notas, n_vectores).
+    """
+    scores = (bases / divisores(bases.shape[1])) @ np.asarray(matriz_pesos, dtype=float).T
+    return redondear(scores.ravel()).reshape(scores.shape)
+
+
+def rangos(scores):
+    """
+    Posición de cada nota en cada columna de scores (1 = mejor score); los
+    empates comparten la mejor posición, como rank(method="min").
+    """
+    n = scores.shape[0]
+    orden = np.argsort(-scores, axis=0, kind="stable")
+    ordenados = np.take_along_axis(scores, orden, axis=0)
+    nuevo = np.ones(ordenados.shape, dtype=bool)
+    nuevo[1:] = ordenados[1:] != ordenados[:-1]
+    posicion = np.maximum.accumulate(np.where(nuevo, np.arange(n)[:, None], 0), axis=0) + 1
+    resultado = np.empty_like(orden)
+    np.put_along_axis(resultado, orden, posicion, axis=0)
+    return resultado
+
+
+def en_banda_verde(scores):
+    """
+    Máscara de la banda verde por columna, igual que semaforo.bandas(metodo="rango").
+    """
+    minimo, maximo = scores.min(axis=0), scores.max(axis=0)
+    rango = maximo - minimo
+    percentil = np.divide(scores - minimo, rango, out=np.ones_like(scores), where=rango > 0)
+    return percentil >= UMBRAL_VERDE
+
+
+def _spearman(rangos_base, rangos_vectores):
+    # Correlación de cada columna de rangos contra el ranking base
+    x = rangos_base - rangos_base.mean()
+    y = rangos_vectores - rangos_vectores.mean(axis=0)
+    denominador = np.sqrt((x ** 2).sum() * (y ** 2).sum(axis=0))
+    return np.divide(x @ y, denominador, out=np.ones(y.shape[1]), where=denominador > 0)
+
+
+# --- Análisis ---
+def importancia_pesos(bases, pesos, amplitud=AMPLITUD_DEFAULT):
+    """
+    Variando un peso por vez en ±amplitud: desplazamiento medio del rango de
+    las notas y fracción de notas que entran o salen de la banda verde.
+    Retorna (desplazamiento, cambios de banda), un valor por término.
+    """
+    base = vector_pesos(pesos)
+    k = len(base)
+    factores = np.ones((2 * k, k))
+    factores[np.arange(k), np.arange(k)] = 1 - amplitud
+    factores[k + np.arange(k), np.arange(k)] = 1 + amplitud
+    scores = scores_pesos(bases, base * factores)
+    scores_base = combinar_bases(bases, base)[:, None]
+
+    desplazamiento = np.abs(rangos(scores) - rangos(scores_base)).mean(axis=0)
+    cambios = (en_banda_verde(scores) != en_banda_verde(scores_base)).mean(axis=0)
+    return (desplazamiento[:k] + desplazamiento[k:]) / 2, np.maximum(cambios[:k], cambios[k:])
+
+
+def analizar_sensibilidad(notas, pesos, modo=PERTURBACION, n=MUESTRAS_DEFAULT, amplitud=AMPLITUD_DEFAULT,
+                          semilla=0, bases=None):
+    """
+    Evalúa el score de las notas (lista de dicts o DataFrame) con n vectores de
+    pesos perturbados (modo PERTURBACION) o con la grilla de grilla_pesos
+    (modo GRILLA; si tiene más de MAX_VECTORES_GRILLA vectores se usa
+    PERTURBACION). bases permite reusar la matriz de MotorScore.matriz_bases.
+
+    Retorna un dict con:
+    - "notas": DataFrame por nota con el score y rango actuales, el rango
+      mediano y el intervalo p5-p95 entre vectores y la probabilidad de quedar en verde;
+    - "pesos": DataFrame por término con el desplazamiento medio de rango y la
+      fracción de notas que cambian de banda al mover ese peso solo;
+    - "estabilidad": correlación de Spearman media entre el ranking actual y el de cada vector;
+    - "vectores": cantidad de vectores de pesos evaluados;
+    - "modo": el modo usado.
+    """
+    tickers = notas["Ticker"].tolist() if isinstance(notas, pd.DataFrame) else [nota.get("Ticker") for nota in notas]
+    if not tickers:
+        raise ValueError("El análisis de sensibilidad necesita al menos una nota")
+    extras = terminos_extra(pesos)
+    if bases is None:
+        bases = calcular_bases(columnas_score(notas, extras), extras)
+    if modo == GRILLA and tamanio_grilla(pesos) > MAX_VECTORES_GRILLA:
+        modo = PERTURBACION
+    matriz_pesos = grilla_pesos(pesos, amplitud) if modo == GRILLA else perturbar_pesos(pesos, n, amplitud, semilla)
+
+    scores_base = combinar_bases(bases, pesos)
+    scores = scores_pesos(bases, matriz_pesos)
+    rangos_base = rangos(scores_base[:, None])[:, 0]
+    rangos_vectores = rangos(scores)
+    p5, mediana, p95 = np.percentile(rangos_vectores, [5, 50, 95], axis=1)
+    desplazamiento, cambios = importancia_pesos(bases, pesos, amplitud)
+
+    df_notas = pd.DataFrame({
+        "Ticker": tickers,
+        "Score": scores_base,
+        "Rango": rangos_base,
+        "Rango mediano": mediana,
+        "Rango p5": p5,
+        "Rango p95": p95,
+        "P(verde)": en_banda_verde(scores).mean(axis=1),
+    }).sort_values(["Rango", "Ticker"], kind="stable", ignore_index=True)
+    df_pesos = pd.DataFrame({
+        "Término": TERMINOS + extras,
+        "Peso": vector_pesos(pesos),
+        "Δ rango medio": desplazamiento,
+        "Cambios de banda": cambios,
+    }).sort_values("Δ rango medio", ascending=False, kind="stable", ignore_index=True)
+    return {
+        "notas": df_notas,
+        "pesos": df_pesos,
+        "estabilidad": float(_spearman(rangos_base, rangos_vectores).mean()),
+        "vectores": len(matriz_pesos),
+        "modo": modo,
+    }
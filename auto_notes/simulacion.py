@@ -0,0 +1,271 @@
+"""
+Simulación Monte Carlo de las notas: barrera, cupones y pérdida esperada.
+
+Cada subyacente sigue un movimiento browniano geométrico con la Volatilidad
+del historial de 1 año que calcula mercado.metricas_historial. Solo se
+simulan las fechas de observación de cupón; la probabilidad de tocar la
+barrera entre fechas se agrega con el puente browniano, así que no hace falta
+simular precios diarios. Todas las notas usan los mismos números aleatorios
+(semilla fija): los resultados son reproducibles entre reruns y comparables entre notas.
+
+Las canastas worst-of (auto_notes.canastas) simulan cada subyacente con su
+volatilidad y choques correlacionados según la matriz de correlación de sus
+rendimientos diarios; cupones, barrera y pérdida los decide el peor
+subyacente en cada fecha.
+
+Supuestos de producto (las notas no traen plazo ni calendario):
+- plazo PLAZO_ANIOS y OBSERVACIONES_POR_ANIO fechas de cupón por año;
+- la barrera es el trigger del score: precio actual * (100 - Colchón) / 100
+  (en una canasta, la de cada subyacente sobre su propio precio actual);
+- el cupón de cada fecha (Tasa anual / observaciones) se paga si el precio
+  está sobre la barrera; con Memory se pagan también los cupones impagos anteriores;
+- la barrera de capital se observa al vencimiento: si el precio final está
+  debajo, se pierde la caída del subyacente.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from auto_notes.cache import obtener_cache
+from auto_notes.canastas import correlaciones, es_canasta, subyacentes
+from auto_notes.mercado import metricas_historial
+
+CAMINOS = 20000
+PLAZO_ANIOS = 1.0
+OBSERVACIONES_POR_ANIO = 4
+DERIVA = 0.0  # drift anual del subyacente (0: sin sesgo alcista)
+NOTAS_POR_BLOQUE = 64  # acota la memoria: bloque × caminos × subyacentes floats por array
+
+COLUMNAS_SIMULACION = ["Prob. barrera", "Cupones esperados", "Pérdida esperada", "Retorno MC"]
+
+
+def volatilidad(hist):
+    """
+    Volatilidad de metricas_historial, o None si no hay historial.
+    """
+    if hist is None or "Close" not in hist or hist["Close"].dropna().empty:
+        return None
+    return metricas_historial(hist)["Volatilidad"]
+
+
+def _factores(correlaciones):
+    """
+    Factores de Cholesky (notas, patas, patas) de las matrices de correlación.
+    Las correlaciones muestrales pueden no ser definidas positivas (datos
+    faltantes, subyacentes casi idénticos): se recortan sus autovalores.
+    """
+    valores, vectores = np.linalg.eigh(np.asarray(correlaciones, dtype=float))
+    matrices = (vectores * np.clip(valores, 1e-9, None)[:, None, :]) @ np.swapaxes(vectores, 1, 2)
+    escala = np.sqrt(np.diagonal(matrices, axis1=1, axis2=2))
+    return np.linalg.cholesky(matrices / escala[:, :, None] / escala[:, None, :])
+
+
+def simular(colchones, tasas, memory, volatilidades, correlaciones=None, caminos=CAMINOS, plazo=PLAZO_ANIOS,
+            observaciones=OBSERVACIONES_POR_ANIO, deriva=DERIVA, semilla=0):
+    """
+    Simula las notas (arrays de igual largo; Colchón y Tasa en %) y retorna
+    arrays con la probabilidad de tocar la barrera, los cupones esperados, la
+    pérdida esperada (fracción del capital) y el retorno anual esperado en %.
+    Para canastas worst-of, volatilidades es (notas, subyacentes) y
+    correlaciones (notas, subyacentes, subyacentes); sin correlaciones los
+    subyacentes son independientes.
+    """
+    colchones, tasas, volatilidades = (np.asarray(x, dtype=float) for x in (colchones, tasas, volatilidades))
+    memory = np.asarray(memory, dtype=bool)
+    if volatilidades.ndim == 1:
+        volatilidades = volatilidades[:, None]
+    patas = volatilidades.shape[1]
+    factores = None if correlaciones is None else _factores(correlaciones)
+    n_obs = max(1, int(round(plazo * observaciones)))
+    dt = plazo / n_obs
+    z = np.random.default_rng(semilla).standard_normal((caminos, n_obs, patas))
+
+    prob_barrera, cupones, perdida = (np.empty(len(colchones)) for _ in range(3))
+    por_bloque = max(1, NOTAS_POR_BLOQUE // patas)
+    for inicio in range(0, len(colchones), por_bloque):
+        bloque = slice(inicio, inicio + por_bloque)
+        sigma = volatilidades[bloque, None, :]
+        varianza = np.maximum(sigma ** 2 * dt, 1e-12)
+        barrera = np.log(np.clip(1 - colchones[bloque] / 100, 1e-9, None))[:, None]  # log(barrera / precio actual)
+        # Distancia (en log) de cada subyacente a su barrera, fecha por fecha: (notas, caminos, subyacentes)
+        distancia = np.broadcast_to(-barrera[:, :, None], (len(sigma), caminos, patas))
+        sin_toque = np.ones((len(sigma), caminos))
+        pagados = np.zeros_like(sin_toque)
+        ultima = np.zeros_like(sin_toque)
+        for k in range(n_obs):
+            previa = distancia
+            choques = z[None, :, k, :] if factores is None else np.einsum("cj,nij->nci", z[:, k, :], factores[bloque])
+            distancia = previa + (deriva - sigma ** 2 / 2) * dt + sigma * np.sqrt(dt) * choques
+            # Puente browniano: probabilidad de cruzar entre dos fechas con ambos extremos sobre la barrera
+            # (en canastas, el producto por subyacente supone cruces independientes dados los extremos:
+            # con subyacentes correlacionados sobreestima la probabilidad de barrera, no la pérdida)
+            sobre = (distancia > 0) & (previa > 0)
+            sin_toque *= np.where(sobre, -np.expm1(-2 * np.where(sobre, previa * distancia, 0) / varianza), 0).prod(axis=2)
+            # Cupones: uno por fecha con el peor subyacente sobre la barrera; con Memory, todos hasta la última
+            peor = distancia.min(axis=2)
+            pagan = peor >= 0
+            pagados += pagan
+            ultima[pagan] = k + 1
+        prob_barrera[bloque] = 1 - sin_toque.mean(axis=1)
+        cupones[bloque] = np.where(memory[bloque, None], ultima, pagados).mean(axis=1)
+        # Con el peor subyacente debajo de la barrera al vencimiento se pierde su caída: 1 - precio final / precio actual
+        perdida[bloque] = np.where(peor < 0, -np.expm1(peor + barrera), 0).mean(axis=1)
+
+    # Cada cupón paga Tasa / observaciones; el total del plazo (menos la pérdida) se anualiza
+    retorno = (cupones * tasas / observaciones - perdida * 100) / plazo
+    return prob_barrera, cupones, perdida, retorno
+
+
+# --- Simulación de la tabla de notas, memoizada por nota ---
+def _patas(ticker):
+    return subyacentes(ticker) if es_canasta(ticker) else [ticker]
+
+
+class SimuladorNotas:
+    """
+    Simula las notas cargadas y memoiza el resultado de cada una por
+    (ticker, precio, Colchón, Tasa, Memory, volatilidad): un rerun sin cambios
+    no simula nada y una actualización de precios o de historial solo resimula
+    las notas afectadas. Las volatilidades (y las correlaciones de las
+    canastas) salen del historial cacheado (no hace requests) y se recalculan
+    solo cuando ese historial se vuelve a guardar. Es thread-safe, así que
+    puede compartirse entre sesiones.
+    """
+
+    MAX_RESULTADOS = 50000
+
+    def __init__(self, caminos=CAMINOS, plazo=PLAZO_ANIOS, observaciones=OBSERVACIONES_POR_ANIO, semilla=0):
+        self.parametros = dict(caminos=caminos, plazo=plazo, observaciones=observaciones, semilla=semilla)
+        self._resultados = OrderedDict()
+        self._volatilidades = {}  # ticker -> (guardado del historial en el cache, volatilidad)
+        self._correlaciones = {}  # subyacentes -> (guardados de sus historiales, matriz)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def clave_nota(nota, volatilidad=None):
+        """
+        volatilidad: la del subyacente, o (volatilidades, correlaciones) de una canasta.
+        """
+        return tuple(nota.get(col) for col in ("Ticker", "Precio actual", "Colchón", "Tasa", "Memory")) + (volatilidad,)
+
+    def volatilidades(self, tickers, historiales=None):
+        """
+        {ticker: volatilidad o None}; historiales ({ticker: DataFrame}) evita leer el cache de mercado.
+        """
+        if historiales is not None:
+            return {ticker: volatilidad(historiales.get(ticker)) for ticker in tickers}
+        cache = obtener_cache()
+        resultado = {}
+        for ticker in tickers:
+            guardado = cache.guardado("historial", ticker)
+            with self._lock:
+                memo = self._volatilidades.get(ticker)
+            if memo is None or memo[0] != guardado:
+                memo = (guardado, volatilidad(cache.leer("historial", ticker, permitir_vencido=True)))
+                with self._lock:
+                    if len(self._volatilidades) >= self.MAX_RESULTADOS:
+                        self._volatilidades.clear()
+                    self._volatilidades[ticker] = memo
+            resultado[ticker] = memo[1]
+        return resultado
+
+    def correlaciones(self, patas, historiales=None):
+        """
+        Matriz de correlación de los rendimientos de los subyacentes de una
+        canasta como tupla de filas (redondeada, para usarla de clave), o None
+        si a alguno le falta historial.
+        """
+        patas = tuple(patas)
+        if historiales is not None:
+            return self._matriz_correlacion(patas, {pata: historiales.get(pata) for pata in patas})
+        cache = obtener_cache()
+        guardados = tuple(cache.guardado("historial", pata) for pata in patas)
+        with self._lock:
+            memo = self._correlaciones.get(patas)
+        if memo is None or memo[0] != guardados:
+            matriz = self._matriz_correlacion(
+                patas, {pata: cache.leer("historial", pata, permitir_vencido=True) for pata in patas}
+            )
+            memo = (guardados, matriz)
+            with self._lock:
+                if len(self._correlaciones) >= self.MAX_RESULTADOS:
+                    self._correlaciones.clear()
+                self._correlaciones[patas] = memo
+        return memo[1]
+
+    @staticmethod
+    def _matriz_correlacion(patas, historiales):
+        matriz = correlaciones(historiales)
+        if any(pata not in matriz.index for pata in patas):
+            return None
+        valores = matriz.loc[list(patas), list(patas)].to_numpy(dtype=float)
+        if np.isnan(valores).any():
+            return None
+        return tuple(tuple(round(float(v), 4) for v in fila) for fila in valores)
+
+    def _mercado(self, ticker, volatilidades, historiales=None):
+        """
+        Lo que la simulación usa del mercado para el ticker de una nota: la
+        volatilidad, o (volatilidades, correlaciones) para una canasta; None si falta algo.
+        """
+        patas = _patas(ticker)
+        if len(patas) == 1:
+            return volatilidades.get(patas[0])
+        vols = tuple(volatilidades.get(pata) for pata in patas)
+        if not all(vols):
+            return None
+        matriz = self.correlaciones(patas, historiales)
+        return None if matriz is None else (vols, matriz)
+
+    def simular(self, notas, historiales=None):
+        """
+        Lista de {columna de COLUMNAS_SIMULACION: valor} en el orden de las notas;
+        valores None si la nota no tiene precio o a su subyacente (o a alguno
+        de los de su canasta) le falta historial. historiales ({ticker:
+        DataFrame}) evita leer el cache de mercado.
+        """
+        tickers = {nota.get("Ticker") for nota in notas}
+        volatilidades = self.volatilidades({pata for ticker in tickers for pata in _patas(ticker)}, historiales)
+        mercado = {ticker: self._mercado(ticker, volatilidades, historiales) for ticker in tickers}
+        claves = [self.clave_nota(nota, mercado[nota.get("Ticker")]) for nota in notas]
+        with self._lock:
+            faltantes = {clave: nota for clave, nota in zip(claves, notas) if clave not in self._resultados}
+
+        if faltantes:
+            nuevos = self._simular(list(faltantes.values()), mercado)
+            with self._lock:
+                self._resultados.update(zip(faltantes, nuevos))
+                while len(self._resultados) > self.MAX_RESULTADOS:
+                    self._resultados.popitem(last=False)
+
+        with self._lock:
+            return [dict(self._resultados[clave]) for clave in claves]
+
+    def _simular(self, notas, mercado):
+        # Un grupo por cantidad de subyacentes: las notas de un ticker y cada tamaño de canasta
+        grupos = {}
+        for i, nota in enumerate(notas):
+            datos = mercado.get(nota.get("Ticker"))
+            if nota.get("Precio actual") and datos:
+                grupos.setdefault(len(datos[0]) if isinstance(datos, tuple) else 1, []).append(i)
+        resultados = [dict.fromkeys(COLUMNAS_SIMULACION) for _ in notas]
+
+        decimales = (4, 2, 4, 2)
+        for patas, indices in grupos.items():
+            elegidas = [notas[i] for i in indices]
+            datos = [mercado[nota["Ticker"]] for nota in elegidas]
+            columnas = simular(
+                [nota.get("Colchón") or 0 for nota in elegidas],
+                [nota.get("Tasa") or 0 for nota in elegidas],
+                [bool(nota.get("Memory")) for nota in elegidas],
+                datos if patas == 1 else [vols for vols, _ in datos],
+                None if patas == 1 else [matriz for _, matriz in datos],
+                **self.parametros,
+            )
+            for j, i in enumerate(indices):
+                resultados[i] = {
+                    columna: round(float(valores[j]), d)
+                    for columna, valores, d in zip(COLUMNAS_SIMULACION, columnas, decimales)
+                }
+        return resultados
@@ -0,0 +1,129 @@
+"""
+Servidor HTTP local que reproduce un almacén de fixtures (auto_notes.grabacion)
+con latencia y errores inyectados, para medir el pipeline de scraping sin red
+y de forma determinística.
+
+    python -m auto_notes.stub fixtures/html --puerto 8765 --latencia 0.2 --errores 0.1
+
+y en otra terminal AUTO_NOTES_HTTP_STUB=http://127.0.0.1:8765. Los requests
+llegan como /<host original>/<ruta>; una URL no grabada responde 404.
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from auto_notes.grabacion import AlmacenFixtures
+
+
+class _Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # con el default (5) los connects concurrentes se reintentan a 1 s
+
+
+class ServidorStub:
+    def __init__(self, directorio, puerto=0, latencia=0.0, jitter=0.0, tasa_error=0.0,
+                 estado_error=503, semilla=None):
+        self.almacen = AlmacenFixtures(directorio)
+        self.latencia = latencia
+        self.jitter = jitter
+        self.tasa_error = tasa_error
+        self.estado_error = estado_error
+        self.estadisticas = {"servidos": 0, "errores": 0, "no_encontrados": 0}
+        self._azar = random.Random(semilla)
+        self._lock = threading.Lock()
+        self._servidor = _Servidor(("127.0.0.1", puerto), self._handler())
+        self._hilo = None
+
+    @property
+    def url(self):
+        host, puerto = self._servidor.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def _sortear(self):
+        with self._lock:
+            espera = self.latencia + self._azar.uniform(0, self.jitter)
+            error = self._azar.random() < self.tasa_error
+        return espera, error
+
+    def _contar(self, contador):
+        with self._lock:
+            self.estadisticas[contador] += 1
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                espera, error = stub._sortear()
+                time.sleep(espera)
+                if error:
+                    stub._contar("errores")
+                    self._responder(stub.estado_error, "text/plain", b"error inyectado", {"Retry-After": "0"})
+                    return
+                grabado = stub.almacen.buscar("https:/" + self.path)
+                if grabado is None:
+                    stub._contar("no_encontrados")
+                    self._responder(404, "text/plain", b"no grabado")
+                    return
+                stub._contar("servidos")
+                self._responder(*grabado)
+
+            def _responder(self, estado, content_type, cuerpo, headers=None):
+                self.send_response(estado)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(cuerpo)))
+                for nombre, valor in (headers or {}).items():
+                    self.send_header(nombre, valor)
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, name="auto-notes-stub", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m auto_notes.stub", description="Servidor stub de fixtures HTTP.")
+    parser.add_argument("directorio", help="almacén de fixtures (con indice.json)")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos por request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latencia extra aleatoria máxima (segundos)")
+    parser.add_argument("--errores", type=float, default=0.0, help="fracción de requests que responden con error")
+    parser.add_argument("--estado-error", type=int, default=503)
+    parser.add_argument("--semilla", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    stub = ServidorStub(
+        args.directorio, args.puerto, args.latencia, args.jitter, args.errores, args.estado_error, args.semilla
+    )
+    print(f"Sirviendo {len(stub.almacen.urls())} URLs en {stub.url} (Ctrl+C para salir)")
+    try:
+        stub._servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub._servidor.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
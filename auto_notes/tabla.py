@@ -0,0 +1,24 @@
+"""
+Filtrado, orden y paginación de la tabla de notas del lado del servidor,
+para renderizar solo la página visible.
+"""
+import math
+
+TAMANIOS_PAGINA = [25, 50, 100, 250]
+
+
+def paginar(df, filtro="", orden=None, ascendente=False, pagina=1, tamanio=TAMANIOS_PAGINA[0]):
+    """
+    Retorna (df_pagina, total_filtrado, total_paginas). El índice de df_pagina
+    es la posición de cada nota en la lista original, para poder editarla.
+    """
+    if filtro:
+        df = df[df["Ticker"].astype(str).str.contains(filtro.strip(), case=False, regex=False)]
+    if orden and orden in df.columns:
+        df = df.sort_values(orden, ascending=ascendente, na_position="last", kind="stable")
+
+    total = len(df)
+    total_paginas = max(1, math.ceil(total / tamanio))
+    pagina = min(max(1, pagina), total_paginas)
+    inicio = (pagina - 1) * tamanio
+    return df.iloc[inicio:inicio + tamanio], total, total_paginas
@@ -0,0 +1,7 @@
+"""
+Benchmarks de los caminos críticos. Ejecutar desde la raíz del repo, por ejemplo:
+
+    python -m benchmarks.bench_parse
+
+python -m benchmarks.suite corre todos los casos y emite JSON comparable entre versiones.
+"""
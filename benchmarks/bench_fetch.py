@@ -0,0 +1,130 @@
+"""
+Throughput y latencia del pipeline de scraping (cliente HTTP con rate limit y
+reintentos + parsers) contra el servidor stub, sin red: las páginas salen de
+fixtures/html y la latencia y los errores se inyectan en el stub.
+
+    python -m benchmarks.bench_fetch [--requests 200] [--workers 16] [--latencia 0.05]
+                                     [--errores 0.1] [--sin-limites] [--json]
+
+Por defecto se respetan los límites por host de cliente_http, así que el
+throughput queda acotado por el rate limit; --sin-limites mide el pipeline solo.
+El cache de mercado no interviene (se llaman los fetchers sin @cacheado); los
+circuitos de los hosts empiezan cerrados en cada corrida.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from auto_notes import circuitos, cliente_http
+from auto_notes.grabacion import AlmacenFixtures
+from auto_notes.mercado import BROKERS, obtener_analistas, obtener_min_52_semanas
+from auto_notes.parsers import target_broker
+from auto_notes.stub import ServidorStub
+
+FIXTURES = Path(__file__).resolve().parent.parent / "fixtures" / "html"
+SIN_LIMITE = {"tasa": 1e9, "rafaga": 10**9, "concurrencia": 256}
+
+
+def sin_limites_host():
+    return {host: SIN_LIMITE for host in cliente_http.LIMITES_HOST}
+
+
+def _target_morgan(ticker):
+    return target_broker(obtener_analistas.__wrapped__(ticker), BROKERS["MS"])
+
+
+def trabajos():
+    """
+    (fetcher, ticker, valor esperado) por cada URL grabada en fixtures/html.
+    """
+    esperados = json.loads((FIXTURES / "esperados.json").read_text())
+    lista = []
+    for url, entrada in sorted(AlmacenFixtures(FIXTURES).entradas().items()):
+        archivo = entrada["archivo"]
+        partes = url.split("/")
+        if partes[0] == "finance.yahoo.com":
+            lista.append((obtener_min_52_semanas.__wrapped__, partes[2], esperados[archivo]))
+        else:
+            lista.append((_target_morgan, partes[2].upper(), esperados[archivo]))
+    return lista
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+def correr(n_requests=200, workers=16, latencia=0.05, jitter=0.0, errores=0.0, semilla=0, sin_limites=False):
+    lista = trabajos()
+    carga = [lista[i % len(lista)] for i in range(n_requests)]
+
+    def medir(trabajo):
+        fn, ticker, esperado = trabajo
+        t0 = time.perf_counter()
+        try:
+            valor = fn(ticker)
+        except Exception:
+            valor = None  # error tras los reintentos, o circuito abierto
+        return time.perf_counter() - t0, valor == esperado
+
+    with ServidorStub(FIXTURES, latencia=latencia, jitter=jitter, tasa_error=errores, semilla=semilla) as stub:
+        cliente_http.usar_stub(stub.url)
+        circuitos.reiniciar()
+        limites = cliente_http.fijar_limites(sin_limites_host(), SIN_LIMITE) if sin_limites else None
+        try:
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                resultados = list(pool.map(medir, carga))
+            total = time.perf_counter() - t0
+        finally:
+            cliente_http.usar_stub(None)
+            if limites:
+                cliente_http.fijar_limites(*limites)
+
+    latencias = [t for t, _ in resultados]
+    return {
+        "requests": n_requests,
+        "workers": workers,
+        "latencia_inyectada_ms": latencia * 1000,
+        "tasa_error_inyectada": errores,
+        "sin_limites": sin_limites,
+        "total_s": total,
+        "throughput_rps": n_requests / total,
+        "p50_ms": _percentil(latencias, 50) * 1000,
+        "p95_ms": _percentil(latencias, 95) * 1000,
+        "p99_ms": _percentil(latencias, 99) * 1000,
+        "media_ms": statistics.mean(latencias) * 1000,
+        "correctos": sum(ok for _, ok in resultados),
+        "stub": dict(stub.estadisticas),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--latencia", type=float, default=0.05, help="segundos por request en el stub")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--errores", type=float, default=0.0, help="fracción de respuestas 503 inyectadas")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--sin-limites", action="store_true", help="desactiva el rate limit por host")
+    parser.add_argument("--json", action="store_true", help="salida en JSON")
+    args = parser.parse_args(argv)
+
+    resultado = correr(
+        args.requests, args.workers, args.latencia, args.jitter, args.errores, args.semilla, args.sin_limites
+    )
+    if args.json:
+        print(json.dumps(resultado, indent=2))
+    else:
+        for clave, valor in resultado.items():
+            print(f"{clave:24} {round(valor, 2) if isinstance(valor, float) else valor}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Compara la extracción puntual de auto_notes.parsers contra la implementación
+original (BeautifulSoup completo con html.parser) sobre las páginas guardadas
+en fixtures/html: verifica que den el mismo valor y mide tiempo y memoria pico.
+
+    python -m benchmarks.bench_parse [--repeticiones 20] [--escala 1]
+
+--escala replica el relleno de la página para simular páginas más pesadas.
+"""
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from auto_notes.parsers import PARSER, extraer_min_52, extraer_target_morgan
+
+FIXTURES = Path(__file__).resolve().parent.parent / "fixtures" / "html"
+
+
+# --- Implementación original (referencia) ---
+def referencia_min_52(html):
+    soup = BeautifulSoup(html, "html.parser")
+    range_element = soup.find("fin-streamer", {"data-field": "fiftyTwoWeekRange"})
+    if range_element:
+        range_text = range_element.get_text(strip=True)
+        if " - " in range_text:
+            parts = range_text.split(" - ")
+            if len(parts) == 2:
+                try:
+                    return round(float(parts[0].strip()), 2)
+                except ValueError:
+                    pass
+    range_label = soup.find("span", {"title": "52 Week Range"})
+    if range_label:
+        parent = range_label.find_parent()
+        if parent:
+            value_span = parent.find("span", class_="value")
+            if value_span:
+                fin_streamer = value_span.find("fin-streamer")
+                if fin_streamer:
+                    range_text = fin_streamer.get_text(strip=True)
+                    if " - " in range_text:
+                        parts = range_text.split(" - ")
+                        if len(parts) == 2:
+                            try:
+                                return round(float(parts[0].strip()), 2)
+                            except ValueError:
+                                pass
+    return None
+
+
+def referencia_target_morgan(html):
+    soup = BeautifulSoup(html, "html.parser")
+    table_body = soup.find("div", class_="rt-tbody")
+    if table_body:
+        for row_group in table_body.find_all("div", class_="rt-tr-group"):
+            row = row_group.find("div", class_="rt-tr")
+            if not row:
+                continue
+            cells = row.find_all("div", class_="rt-td")
+            if len(cells) < 3 or "Morgan Stanley" not in cells[1].get_text(strip=True):
+                continue
+            price_target_cell = cells[2]
+            price_spans = price_target_cell.find_all("span", class_="Mdcvgxd7")
+            try:
+                if price_spans:
+                    texto = price_spans[0 if len(price_spans) == 1 else 1].get_text(strip=True)
+                    return round(float(texto.replace("$", "").replace(",", "")), 2)
+                price_target_text = price_target_cell.get_text(strip=True)
+                if price_target_text and price_target_text != "—":
+                    if "→" in price_target_text:
+                        parts = price_target_text.split("→")
+                        if len(parts) == 2:
+                            return round(float(parts[1].strip().replace("$", "").replace(",", "")), 2)
+                    elif "–" in price_target_text or "-" in price_target_text:
+                        separator = "–" if "–" in price_target_text else "-"
+                        parts = price_target_text.split(separator)
+                        if len(parts) == 2:
+                            return round(float(parts[1].strip().replace("$", "").replace(",", "")), 2)
+                    else:
+                        return round(float(price_target_text.replace("$", "").replace(",", "")), 2)
+            except ValueError:
+                pass
+    return None
+
+
+def _inflar(html, escala):
+    if escala <= 1:
+        return html
+    inicio = html.index('<div id="app">') + len('<div id="app">')
+    # Relleno tomado del primer cuarto de la página (antes de los datos buscados)
+    fin = html.rfind("</div>", inicio, inicio + len(html) // 4) + len("</div>")
+    relleno = html[inicio:fin]
+    return html[:inicio] + relleno * (escala - 1) + html[inicio:]
+
+
+def _medir(fn, html, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn(html)
+        tiempos.append(time.perf_counter() - t0)
+    gc.collect()
+    tracemalloc.start()
+    fn(html)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(tiempos), pico
+
+
+def correr(repeticiones=20, escala=1):
+    esperados = json.loads((FIXTURES / "esperados.json").read_text())
+    resultados = []
+    for nombre, esperado in esperados.items():
+        html = _inflar((FIXTURES / nombre).read_text(encoding="utf-8"), escala)
+        if nombre.startswith("yahoo"):
+            nuevo, referencia = extraer_min_52, referencia_min_52
+        else:
+            nuevo, referencia = extraer_target_morgan, referencia_target_morgan
+        valor_nuevo, valor_ref = nuevo(html), referencia(html)
+        t_ref, mem_ref = _medir(referencia, html, repeticiones)
+        t_nuevo, mem_nuevo = _medir(nuevo, html, repeticiones)
+        resultados.append({
+            "fixture": nombre,
+            "kb": round(len(html) / 1024),
+            "esperado": esperado,
+            "referencia": valor_ref,
+            "nuevo": valor_nuevo,
+            "ok": valor_nuevo == valor_ref == esperado,
+            "ms_referencia": round(t_ref * 1000, 2),
+            "ms_nuevo": round(t_nuevo * 1000, 2),
+            "kb_pico_referencia": round(mem_ref / 1024),
+            "kb_pico_nuevo": round(mem_nuevo / 1024),
+        })
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--escala", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="salida en JSON")
+    args = parser.parse_args(argv)
+
+    resultados = correr(args.repeticiones, args.escala)
+    if args.json:
+        print(json.dumps({"parser": PARSER, "resultados": resultados}, indent=2))
+    else:
+        print(f"parser: {PARSER}")
+        print(f"{'fixture':38} {'KB':>5} {'ok':>3} {'ms ref':>8} {'ms nuevo':>9} {'KB pico ref':>12} {'KB pico nuevo':>14}")
+        for r in resultados:
+            print(
+                f"{r['fixture']:38} {r['kb']:>5} {'sí' if r['ok'] else 'NO':>3} {r['ms_referencia']:>8} "
+                f"{r['ms_nuevo']:>9} {r['kb_pico_referencia']:>12} {r['kb_pico_nuevo']:>14}"
+            )
+    return 0 if all(r["ok"] for r in resultados) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Verifica que el score vectorizado (calcular_scores y el rescore de MotorScore)
+dé exactamente lo mismo que calcular_score nota por nota, sobre notas al azar
+con los casos borde del motor: campos en None o en 0, sin precio, Colchón de
+100, targets de otros brokers, Retorno MC y valores sobre el medio centavo.
+
+    python -m benchmarks.bench_score [--notas 200000] [--semilla 0] [--json]
+
+El código de salida es 1 si alguna nota difiere.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+from auto_notes.score import PESOS_DEFAULT, TERMINO_SIMULACION, MotorScore, calcular_score, calcular_scores
+
+COLUMNAS_PRECIO = ["Target Yahoo", "Target MS", "Hace 1 año", "Mín 1 año", "Target GS"]
+
+
+def _valor(azar, generar):
+    # Un cuarto de los campos cae en los casos borde: None o 0
+    sorteo = azar.random()
+    if sorteo < 0.15:
+        return None
+    if sorteo < 0.25:
+        return 0
+    return generar()
+
+
+def notas_fuzz(n, semilla=0):
+    azar = random.Random(semilla)
+    notas = []
+    for _ in range(n):
+        precio = _valor(azar, lambda: round(azar.uniform(1, 1000), azar.choice([0, 2, 4])))
+        nota = {
+            "Ticker": "FUZZ",
+            "Tasa": _valor(azar, lambda: round(azar.uniform(0, 30), azar.choice([1, 2, 3]))),
+            "Colchón": _valor(azar, lambda: azar.choice([100, round(azar.uniform(0, 99), 2)])),
+            "Memory": azar.choice([True, False, None]),
+            "Precio actual": precio,
+            TERMINO_SIMULACION: _valor(azar, lambda: round(azar.uniform(-40, 30), 2)),
+        }
+        for columna in COLUMNAS_PRECIO:
+            nota[columna] = _valor(azar, lambda: round((precio or 100) * azar.uniform(0.3, 2.0), 2))
+        notas.append(nota)
+    return notas
+
+
+def vectores_pesos(semilla=0):
+    """
+    Pesos por defecto, pesos al azar y pesos con los términos opcionales.
+    """
+    azar = random.Random(semilla)
+    al_azar = {termino: round(azar.uniform(0, 1), 2) for termino in PESOS_DEFAULT}
+    return {
+        "default": dict(PESOS_DEFAULT),
+        "azar": al_azar,
+        "extras": dict(al_azar, **{"Target GS": 0.07, TERMINO_SIMULACION: 0.11}),
+    }
+
+
+def correr(n_notas=200000, semilla=0):
+    notas = notas_fuzz(n_notas, semilla)
+    motor = MotorScore()
+    resultados = []
+    for nombre, pesos in vectores_pesos(semilla).items():
+        t0 = time.perf_counter()
+        escalares = np.array([calcular_score(nota, pesos) for nota in notas])
+        t_escalar = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        vectorizados = calcular_scores(notas, pesos)
+        t_vectorizado = time.perf_counter() - t0
+        motor_scores = motor.scores(notas, pesos)
+        distintos = np.flatnonzero((escalares != vectorizados) | (escalares != motor_scores))
+        resultados.append({
+            "pesos": nombre,
+            "notas": n_notas,
+            "distintos": len(distintos),
+            "ejemplos": [
+                {"nota": notas[i], "escalar": escalares[i], "vectorizado": vectorizados[i], "motor": motor_scores[i]}
+                for i in distintos[:3].tolist()
+            ],
+            "ok": len(distintos) == 0,
+            "ms_escalar": round(t_escalar * 1000, 1),
+            "ms_vectorizado": round(t_vectorizado * 1000, 1),
+        })
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notas", type=int, default=200000)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="salida en JSON")
+    args = parser.parse_args(argv)
+
+    resultados = correr(args.notas, args.semilla)
+    if args.json:
+        print(json.dumps(resultados, indent=2, ensure_ascii=False, default=str))
+    else:
+        print(f"{'pesos':10} {'notas':>8} {'ok':>3} {'distintos':>10} {'ms escalar':>11} {'ms vectorizado':>15}")
+        for r in resultados:
+            print(
+                f"{r['pesos']:10} {r['notas']:>8} {'sí' if r['ok'] else 'NO':>3} {r['distintos']:>10} "
+                f"{r['ms_escalar']:>11} {r['ms_vectorizado']:>15}"
+            )
+            for ejemplo in r["ejemplos"]:
+                print(f"  {ejemplo}")
+    return 0 if all(r["ok"] for r in resultados) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
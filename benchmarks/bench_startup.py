@@ -0,0 +1,141 @@
+"""
+Mide el arranque en frío y la latencia de rerun de la app de Streamlit
+(con streamlit.testing, sin navegador):
+
+- import en frío de los módulos de la app en un proceso nuevo, y qué
+  dependencias pesadas quedan cargadas sin haber buscado datos ni exportado;
+- primer run del script (arranque de sesión) en un proceso nuevo;
+- reruns con N notas cargadas: sin cambios, cambio de página y cambio de pesos.
+
+    python -m benchmarks.bench_startup [--notas 1000] [--repeticiones 5] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+APP = RAIZ / "app.py"
+PESADOS = ["yfinance", "bs4", "openpyxl", "requests"]
+
+_SCRIPT_IMPORT = f"""
+import sys, time, json
+t0 = time.perf_counter()
+import streamlit, pandas
+import auto_notes.cache, auto_notes.excel, auto_notes.mercado, auto_notes.notas
+import auto_notes.score, auto_notes.semaforo, auto_notes.tabla
+t = time.perf_counter() - t0
+print(json.dumps({{"s": t, "cargados": [m for m in {PESADOS!r} if m in sys.modules]}}))
+"""
+
+_SCRIPT_PRIMER_RUN = f"""
+import time, json
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({str(APP)!r}, default_timeout=120).run()
+print(json.dumps({{"s": time.perf_counter() - t0, "error": bool(at.exception)}}))
+"""
+
+
+def _subproceso(script):
+    entorno = dict(os.environ, PYTHONPATH=str(RAIZ))
+    salida = subprocess.run(
+        [sys.executable, "-c", script], cwd=RAIZ, env=entorno, capture_output=True, text=True, check=True
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def notas_sinteticas(n, semilla=0):
+    from auto_notes.score import PESOS_DEFAULT, calcular_score
+
+    azar = random.Random(semilla)
+    notas = []
+    for i in range(n):
+        precio = round(azar.uniform(10, 500), 2)
+        nota = {
+            "Ticker": f"T{i:05d}",
+            "Tasa": round(azar.uniform(5, 20), 2),
+            "Colchón": round(azar.uniform(10, 50), 2),
+            "Memory": azar.random() < 0.5,
+            "Precio actual": precio,
+            "Target Yahoo": round(precio * azar.uniform(0.8, 1.4), 2),
+            "Hace 1 año": round(precio * azar.uniform(0.6, 1.3), 2),
+            "Mín 1 año": round(precio * azar.uniform(0.5, 0.95), 2),
+            "Target MS": azar.choice([None, round(precio * 1.1, 2)]),
+        }
+        nota["Score"] = calcular_score(nota, PESOS_DEFAULT)
+        notas.append(nota)
+    return notas
+
+
+def _cronometrar(fn, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t0)
+    return statistics.median(tiempos)
+
+
+def medir_reruns(n_notas, repeticiones):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(APP), default_timeout=300)
+    at.session_state["notas"] = notas_sinteticas(n_notas)
+    at.run()
+
+    paginas = iter(range(2, 2 + repeticiones))
+    pesos = iter(range(1, 1 + repeticiones))
+    return {
+        "rerun_s": _cronometrar(at.run, repeticiones),
+        "cambio_pagina_s": _cronometrar(
+            lambda: at.number_input(key="pagina_tabla").set_value(next(paginas)).run(), repeticiones
+        ),
+        "cambio_pesos_s": _cronometrar(
+            lambda: at.number_input(key="peso_Tasa").set_value(next(pesos) / 100).run(), repeticiones
+        ),
+    }
+
+
+def correr(n_notas=1000, repeticiones=5):
+    # Cache y cartera en un directorio temporal: las notas sintéticas no se guardan en la cartera real
+    datos = tempfile.TemporaryDirectory()
+    os.environ["AUTO_NOTES_DATA_DIR"] = datos.name
+    imports = [_subproceso(_SCRIPT_IMPORT) for _ in range(repeticiones)]
+    primeros = [_subproceso(_SCRIPT_PRIMER_RUN) for _ in range(max(1, repeticiones // 2))]
+    resultado = {
+        "import_frio_s": statistics.median(r["s"] for r in imports),
+        "dependencias_pesadas_cargadas": imports[0]["cargados"],
+        "primer_run_s": statistics.median(r["s"] for r in primeros),
+        "notas": n_notas,
+    }
+    resultado.update(medir_reruns(n_notas, repeticiones))
+    datos.cleanup()
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--notas", type=int, default=1000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="salida en JSON")
+    args = parser.parse_args(argv)
+
+    resultado = correr(args.notas, args.repeticiones)
+    if args.json:
+        print(json.dumps(resultado, indent=2))
+    else:
+        for clave, valor in resultado.items():
+            print(f"{clave:32} {round(valor * 1000, 1) if isinstance(valor, float) else valor}"
+                  + (" ms" if isinstance(valor, float) else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
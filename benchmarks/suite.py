@@ -0,0 +1,287 @@
+"""
+Suite de benchmarks de los caminos críticos de la app, con notas sintéticas
+de 10 a 10.000 notas y las páginas de fixtures/html:
+
+- score: calcular_score nota por nota, calcular_scores vectorizado (con "ok"
+  si da lo mismo que calcular_score; benchmarks.bench_score lo verifica a fondo), rescore
+  de MotorScore con pesos nuevos y análisis de sensibilidad a los pesos
+  (2000 vectores, hasta 1000 notas);
+- simulacion: Monte Carlo de barrera y cupones (20.000 caminos, hasta 1000 notas);
+- parse: extracción por página (benchmarks.bench_parse);
+- fetch: throughput del scraping contra el servidor stub (benchmarks.bench_fetch);
+- tabla: construcción del DataFrame y render del Styler con el semáforo,
+  de la página visible y de la tabla completa;
+- excel: exportar_excel_semaforo, tiempo y memoria pico;
+- e2e: agregar una nota (búsqueda contra el stub + score + tabla) a una
+  tabla de N notas.
+
+El resultado es JSON; con --comparar se marcan las regresiones contra un
+resultado anterior y el código de salida es 1 si hay alguna.
+
+    python -m benchmarks.suite [--tamanios 10 100 1000 10000] [--salida actual.json]
+                               [--comparar base.json --umbral 0.2]
+"""
+import argparse
+import datetime
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from auto_notes import cliente_http
+from auto_notes.cache import CacheMercado, usar_cache
+from auto_notes.excel import exportar_excel_semaforo
+from auto_notes.mercado import obtener_datos_nota
+from auto_notes.score import PESOS_DEFAULT, MotorScore, calcular_score, calcular_scores
+from auto_notes.semaforo import bandas, estilo_css
+from auto_notes.sensibilidad import analizar_sensibilidad
+from auto_notes.simulacion import simular
+from auto_notes.stub import ServidorStub
+from auto_notes.tabla import TAMANIOS_PAGINA, paginar
+from benchmarks import bench_fetch, bench_parse
+from benchmarks.bench_startup import notas_sinteticas
+
+RAIZ = Path(__file__).resolve().parent.parent
+TAMANIOS = [10, 100, 1000, 10000]
+# Tamaño máximo para sensibilidad y simulación (uso interactivo; con 10.000 notas son 20M scores o caminos)
+MAX_NOTAS_INTERACTIVO = 1000
+COLUMNAS_NUMERICAS = ["Tasa", "Colchón", "Precio actual", "Target Yahoo", "Hace 1 año", "Mín 1 año", "Target MS", "Score"]
+
+
+def _cronometrar(fn, repeticiones, preparar=None):
+    tiempos = []
+    for _ in range(repeticiones):
+        if preparar:
+            preparar()
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t0)
+    return statistics.median(tiempos)
+
+
+def _pico_memoria(fn):
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pico
+
+
+def _resultado(caso, n, segundos, **extra):
+    return dict({"caso": caso, "n": n, "ms": round(segundos * 1000, 3),
+                 "por_segundo": round(n / segundos, 1) if segundos else None}, **extra)
+
+
+def render_tabla(df, df_pagina):
+    """
+    Mismo camino que app.py: bandas sobre todas las notas, Styler de la página.
+    """
+    bandas_score = pd.Series(bandas(df["Score"]), index=df.index)
+
+    def color_semaforo(columna):
+        return [estilo_css(banda) for banda in bandas_score.loc[columna.index]]
+
+    formato = {col: (lambda x: f"{x:.2f}" if pd.notna(x) else "") for col in COLUMNAS_NUMERICAS if col in df}
+    return df_pagina.style.apply(color_semaforo, subset=["Score"]).format(formato).to_html()
+
+
+# --- Casos ---
+def casos_score(notas, repeticiones):
+    n = len(notas)
+    pesos = dict(PESOS_DEFAULT)
+    motor = MotorScore()
+    motor.scores(notas, pesos)
+    variantes = iter(range(1, 10**6))
+
+    def rescore():
+        motor.scores(notas, dict(pesos, Tasa=next(variantes) / 10**6))
+
+    iguales = [calcular_score(nota, pesos) for nota in notas] == calcular_scores(notas, pesos).tolist()
+    resultados = [
+        _resultado("score.calcular_score", n, _cronometrar(lambda: [calcular_score(nota, pesos) for nota in notas], repeticiones)),
+        _resultado("score.calcular_scores", n, _cronometrar(lambda: calcular_scores(notas, pesos), repeticiones), ok=iguales),
+        _resultado("score.motor_rescore", n, _cronometrar(rescore, repeticiones)),
+    ]
+    if n <= MAX_NOTAS_INTERACTIVO:
+        resultados.append(_resultado(
+            "score.sensibilidad", n, _cronometrar(lambda: analizar_sensibilidad(notas, pesos), max(1, repeticiones // 2))
+        ))
+    return resultados
+
+
+def casos_simulacion(notas, repeticiones):
+    if len(notas) > MAX_NOTAS_INTERACTIVO:
+        return []
+    volatilidades = np.random.default_rng(0).uniform(0.15, 0.6, len(notas))
+
+    def simular_notas():
+        simular([n["Colchón"] for n in notas], [n["Tasa"] for n in notas], [n["Memory"] for n in notas], volatilidades)
+
+    return [_resultado("simulacion.notas", len(notas), _cronometrar(simular_notas, max(1, repeticiones // 2)))]
+
+
+def casos_tabla(notas, repeticiones):
+    n = len(notas)
+    df = pd.DataFrame(notas)
+    df_pagina, _, _ = paginar(df, orden="Score", tamanio=TAMANIOS_PAGINA[0])
+    return [
+        _resultado("tabla.dataframe", n, _cronometrar(lambda: pd.DataFrame(notas), repeticiones)),
+        _resultado("tabla.render_pagina", n, _cronometrar(lambda: render_tabla(df, df_pagina), repeticiones)),
+        _resultado("tabla.render_completa", n, _cronometrar(lambda: render_tabla(df, df), max(1, repeticiones // 2))),
+    ]
+
+
+def casos_excel(notas, repeticiones):
+    df = pd.DataFrame(notas)
+    segundos = _cronometrar(lambda: exportar_excel_semaforo(df), max(1, repeticiones // 2))
+    pico = _pico_memoria(lambda: exportar_excel_semaforo(df))
+    return [_resultado("excel.exportar", len(notas), segundos, kb_pico=round(pico / 1024))]
+
+
+def casos_parse(repeticiones):
+    return [
+        dict(_resultado(f"parse.{r['fixture']}", 1, r["ms_nuevo"] / 1000), kb_pico=r["kb_pico_nuevo"], ok=r["ok"])
+        for r in bench_parse.correr(repeticiones)
+    ]
+
+
+def casos_fetch():
+    r = bench_fetch.correr(n_requests=100, sin_limites=True)
+    return [dict(
+        _resultado("fetch.scrapers_stub", r["requests"], r["total_s"]),
+        p50_ms=round(r["p50_ms"], 3), p95_ms=round(r["p95_ms"], 3), correctos=r["correctos"],
+    )]
+
+
+def _historial_sintetico(min_52=169.21, dias=252, semilla=0):
+    """
+    Un año de precios con el mínimo (Low) igual al de la página grabada de AAPL,
+    para que la verificación del mínimo no registre discrepancias.
+    """
+    azar = np.random.default_rng(semilla)
+    close = np.exp(np.cumsum(azar.normal(0, 0.015, dias)))
+    close *= min_52 / (close.min() * 0.99)
+    indice = pd.bdate_range(end=datetime.date.today(), periods=dias)
+    return pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+                         "Adj Close": close, "Volume": 1_000_000}, index=indice)
+
+
+def casos_e2e(tamanios, repeticiones):
+    """
+    Agregar AAPL a una tabla de N notas: obtener_datos_nota (scrapers contra el
+    stub; historial y target Yahoo precargados en un cache temporal, porque
+    yfinance usa su propio cliente HTTP) + score + DataFrame + render de la página.
+    """
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio, \
+            ServidorStub(bench_fetch.FIXTURES, latencia=0.05, semilla=0) as stub:
+        cache = CacheMercado(Path(directorio) / "cache.sqlite")
+        anterior = usar_cache(cache)
+        cliente_http.usar_stub(stub.url)
+        limites = cliente_http.fijar_limites(bench_fetch.sin_limites_host(), bench_fetch.SIN_LIMITE)
+
+        def precargar():
+            cache.limpiar()
+            cache.guardar("historial", "AAPL", _historial_sintetico())
+            cache.guardar("target_yahoo", "AAPL", 250.0)
+
+        try:
+            for n in tamanios:
+                base = notas_sinteticas(n)
+
+                def agregar():
+                    nota = {"Ticker": "AAPL", "Tasa": 12.0, "Colchón": 30.0, "Memory": True}
+                    nota.update(obtener_datos_nota("AAPL", verificar=True))
+                    nota["Score"] = calcular_score(nota, PESOS_DEFAULT)
+                    df = pd.DataFrame(base + [nota])
+                    df_pagina, _, _ = paginar(df, orden="Score", tamanio=TAMANIOS_PAGINA[0])
+                    render_tabla(df, df_pagina)
+
+                resultados.append(_resultado("e2e.agregar_nota", n, _cronometrar(agregar, repeticiones, precargar)))
+        finally:
+            cliente_http.usar_stub(None)
+            cliente_http.fijar_limites(*limites)
+            usar_cache(anterior)
+    # Por nota agregada, no por nota de la tabla
+    for r in resultados:
+        r["por_segundo"] = round(1000 / r["ms"], 1)
+    return resultados
+
+
+# --- Ejecución y comparación ---
+def _version():
+    try:
+        salida = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True)
+        return salida.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def correr(tamanios=TAMANIOS, repeticiones=5):
+    resultados = casos_parse(repeticiones) + casos_fetch()
+    for n in tamanios:
+        notas = notas_sinteticas(n)
+        resultados += casos_score(notas, repeticiones)
+        resultados += casos_simulacion(notas, repeticiones)
+        resultados += casos_tabla(notas, repeticiones)
+        resultados += casos_excel(notas, repeticiones)
+    resultados += casos_e2e(tamanios, repeticiones)
+    return {
+        "version": _version(),
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "resultados": resultados,
+    }
+
+
+def comparar(actual, base, umbral=0.2):
+    """
+    Casos (caso, n) cuyo tiempo empeoró más que umbral (fracción) respecto de base.
+    """
+    anteriores = {(r["caso"], r["n"]): r for r in base["resultados"]}
+    regresiones = []
+    for r in actual["resultados"]:
+        previo = anteriores.get((r["caso"], r["n"]))
+        if previo and previo["ms"] and r["ms"] > previo["ms"] * (1 + umbral):
+            regresiones.append({"caso": r["caso"], "n": r["n"], "ms_base": previo["ms"], "ms": r["ms"],
+                                "cambio": round(r["ms"] / previo["ms"] - 1, 3)})
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanios", type=int, nargs="+", default=TAMANIOS)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--salida", help="archivo JSON de resultados (por defecto, stdout)")
+    parser.add_argument("--comparar", help="resultado JSON anterior contra el cual comparar")
+    parser.add_argument("--umbral", type=float, default=0.2, help="empeoramiento tolerado (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    actual = correr(args.tamanios, args.repeticiones)
+    if args.comparar:
+        actual["regresiones"] = comparar(actual, json.loads(Path(args.comparar).read_text()), args.umbral)
+
+    texto = json.dumps(actual, indent=2, ensure_ascii=False)
+    if args.salida:
+        Path(args.salida).write_text(texto + "\n", encoding="utf-8")
+    else:
+        print(texto)
+    for r in actual.get("regresiones", []):
+        print(f"REGRESIÓN {r['caso']} n={r['n']}: {r['ms_base']} ms -> {r['ms']} ms (+{r['cambio']:.0%})", file=sys.stderr)
+    return 1 if actual.get("regresiones") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import os
+import tempfile
+from pathlib import Path
+
+# Antes de importar auto_notes: cache y cartera fuera de data/
+os.environ.setdefault("AUTO_NOTES_DATA_DIR", tempfile.mkdtemp(prefix="auto_notes_tests_"))
+
+import pytest
+
+from auto_notes import circuitos, cliente_http
+from auto_notes.cache import CacheMercado, usar_cache
+from auto_notes.stub import ServidorStub
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path):
+    """
+    Cache vacío por test y circuitos cerrados.
+    """
+    nuevo = CacheMercado(tmp_path / "cache.sqlite")
+    anterior = usar_cache(nuevo)
+    circuitos.reiniciar()
+    yield nuevo
+    usar_cache(anterior)
+    circuitos.reiniciar()
+
+
+FIXTURES = Path(__file__).resolve().parent.parent / "fixtures" / "html"
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """
+    Fábrica de servidores stub (auto_notes.stub) sobre fixtures/html: el
+    cliente HTTP queda redirigido al último creado, sin límites de tasa ni backoff.
+    """
+    servidores = []
+    anteriores = cliente_http.fijar_limites({}, {"tasa": 1000.0, "rafaga": 1000, "concurrencia": 16})
+    monkeypatch.setattr(cliente_http, "BACKOFF_BASE", 0.0)
+
+    def crear(**opciones):
+        servidor = ServidorStub(FIXTURES, **opciones).iniciar()
+        servidores.append(servidor)
+        cliente_http.usar_stub(servidor.url)
+        return servidor
+
+    yield crear
+    cliente_http.usar_stub(None)
+    cliente_http.fijar_limites(*anteriores)
+    for servidor in servidores:
+        servidor.detener()
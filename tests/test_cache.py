@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+from auto_notes.cache import CacheMercado, cacheado
+from auto_notes.circuitos import CircuitoAbierto
+
+
+def test_guardar_y_leer_persiste_entre_instancias(tmp_path):
+    CacheMercado(tmp_path / "c.sqlite").guardar("analistas", "AAPL", [{"Firma": "UBS", "Target": 1.0}])
+    assert CacheMercado(tmp_path / "c.sqlite").leer("analistas", "AAPL") == [{"Firma": "UBS", "Target": 1.0}]
+
+
+def test_ttl_vencido_solo_con_permitir_vencido(cache):
+    cache.guardar("historial", "AAPL", 1.0)
+    cache.ttls["historial"] = -1
+    assert cache.leer("historial", "AAPL") is None
+    assert cache.leer("historial", "AAPL", permitir_vencido=True) == 1.0
+
+
+def test_desalojo_lru(tmp_path):
+    cache = CacheMercado(tmp_path / "c.sqlite", max_entradas=2)
+    cache.guardar("min_52", "A", 1.0)
+    time.sleep(0.01)
+    cache.guardar("min_52", "B", 2.0)
+    time.sleep(0.01)
+    cache.leer("min_52", "A")  # A pasa a ser la más reciente
+    time.sleep(0.01)
+    cache.guardar("min_52", "C", 3.0)
+    assert cache.leer("min_52", "B") is None
+    assert cache.leer("min_52", "A") == 1.0 and cache.leer("min_52", "C") == 3.0
+
+
+def test_negativo_vence_y_se_borra_al_guardar(tmp_path):
+    cache = CacheMercado(tmp_path / "c.sqlite", ttl_negativo=0.05)
+    cache.guardar_negativo("analistas", "ZZZ")
+    assert cache.es_negativo("analistas", "ZZZ")
+    time.sleep(0.1)
+    assert not cache.es_negativo("analistas", "ZZZ")
+    cache.guardar_negativo("analistas", "ZZZ")
+    cache.guardar("analistas", "ZZZ", [1])
+    assert not cache.es_negativo("analistas", "ZZZ")
+
+
+@pytest.fixture
+def fuente():
+    """
+    Fetcher @cacheado("target_yahoo") cuyo resultado (o excepción) se fija en respuesta.
+    """
+    estado = {"respuesta": None, "llamadas": 0}
+
+    @cacheado("target_yahoo")
+    def buscar(ticker):
+        estado["llamadas"] += 1
+        if isinstance(estado["respuesta"], BaseException):
+            raise estado["respuesta"]
+        return estado["respuesta"]
+
+    return buscar, estado
+
+
+def test_cacheado_hit_no_llama_a_la_fuente(fuente, cache):
+    buscar, estado = fuente
+    estado["respuesta"] = 10.0
+    assert buscar("AAPL") == buscar("AAPL") == 10.0
+    assert estado["llamadas"] == 1
+    assert cache.hits == 1 and cache.misses == 1
+
+
+def test_cacheado_sin_datos_queda_en_el_negativo(fuente, cache):
+    buscar, estado = fuente
+    assert buscar("ZZZ") is None
+    assert buscar("ZZZ") is None
+    assert estado["llamadas"] == 1
+    assert cache.es_negativo("target_yahoo", "ZZZ")
+
+
+@pytest.mark.parametrize("error", [ConnectionError("caído"), CircuitoAbierto("host")])
+def test_cacheado_con_error_sirve_el_vencido_sin_negativo(fuente, cache, error):
+    buscar, estado = fuente
+    cache.guardar("target_yahoo", "AAPL", 9.0)
+    cache.ttls["target_yahoo"] = -1
+    estado["respuesta"] = error
+    assert buscar("AAPL") == 9.0
+    assert cache.vencidos == 1
+    assert not cache.es_negativo("target_yahoo", "AAPL")
+
+
+def test_cacheado_con_error_y_sin_vencido(fuente, cache):
+    buscar, estado = fuente
+    estado["respuesta"] = ConnectionError("caído")
+    assert buscar("AAPL") is None
+    assert not cache.es_negativo("target_yahoo", "AAPL")
+    estado["respuesta"] = 5.0
+    assert buscar("AAPL") == 5.0
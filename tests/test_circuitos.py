@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+from auto_notes import circuitos
+from auto_notes.circuitos import ABIERTO, CERRADO, SEMIABIERTO, Circuito, CircuitoAbierto, PaginaIlegible, protegido
+
+
+def _abrir(c):
+    for _ in range(c.umbral):
+        c.fallo("x")
+
+
+def test_se_abre_tras_el_umbral_de_fallos_consecutivos():
+    c = Circuito("host", umbral=3, enfriamiento=60)
+    c.fallo("x")
+    c.fallo("x")
+    c.exito()
+    c.fallo("x")
+    c.fallo("x")
+    assert c.estado == CERRADO
+    c.fallo("x")
+    assert c.estado == ABIERTO
+    with pytest.raises(CircuitoAbierto):
+        c.permitir()
+
+
+def test_semiabierto_deja_pasar_una_sola_prueba():
+    c = Circuito("host", umbral=2, enfriamiento=0.05)
+    _abrir(c)
+    time.sleep(0.06)
+    c.permitir()
+    assert c.estado == SEMIABIERTO
+    with pytest.raises(CircuitoAbierto):
+        c.permitir()
+
+
+def test_prueba_exitosa_cierra_y_fallida_reabre():
+    c = Circuito("host", umbral=2, enfriamiento=0.05)
+    _abrir(c)
+    time.sleep(0.06)
+    c.permitir()
+    c.fallo("x")
+    assert c.estado == ABIERTO
+    with pytest.raises(CircuitoAbierto):
+        c.permitir()
+    time.sleep(0.06)
+    c.permitir()
+    c.exito()
+    assert c.estado == CERRADO and c.fallos == 0
+    c.permitir()
+
+
+def test_prueba_sin_datos_habilita_otra_prueba():
+    c = Circuito("host", umbral=2, enfriamiento=0.05)
+    _abrir(c)
+    time.sleep(0.06)
+    c.permitir()
+    c.sin_datos()
+    assert c.estado == SEMIABIERTO
+    c.permitir()
+
+
+def test_protegido_cuenta_excepciones_y_paginas_ilegibles():
+    respuestas = iter([ConnectionError("caído"), PaginaIlegible("sin tabla"), None, None, 1.0])
+
+    @protegido("host.test")
+    def buscar(ticker):
+        respuesta = next(respuestas)
+        if isinstance(respuesta, Exception):
+            raise respuesta
+        return respuesta
+
+    c = circuitos.circuito("host.test")
+    with pytest.raises(ConnectionError):
+        buscar("A")
+    assert c.fallos == 1
+    assert buscar("B") is None and c.fallos == 2
+    # Tickers sin datos: no son éxito ni fallo
+    assert buscar("C") is None and buscar("D") is None and c.fallos == 2
+    assert buscar("E") == 1.0 and c.fallos == 0
+
+
+def test_protegido_con_el_circuito_abierto_no_llama():
+    llamadas = []
+
+    @protegido("host.test")
+    def buscar(ticker):
+        llamadas.append(ticker)
+        raise ConnectionError("caído")
+
+    for _ in range(circuitos.UMBRAL_FALLOS):
+        with pytest.raises(ConnectionError):
+            buscar("A")
+    assert circuitos.estados()["host.test"] == ABIERTO
+    with pytest.raises(CircuitoAbierto):
+        buscar("A")
+    assert len(llamadas) == circuitos.UMBRAL_FALLOS
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+import requests
+
+from auto_notes import cliente_http
+from auto_notes.cliente_http import TokenBucket
+
+
+def test_get_sirve_la_fixture(stub):
+    servidor = stub()
+    response = cliente_http.get("https://www.tipranks.com/stocks/aapl/forecast")
+    assert response.status_code == 200 and "rt-tbody" in response.text
+    assert servidor.estadisticas["servidos"] == 1
+
+
+def test_404_no_se_reintenta(stub):
+    servidor = stub()
+    response = cliente_http.get("https://www.tipranks.com/stocks/zzzz/forecast")
+    assert response.status_code == 404
+    assert servidor.estadisticas["no_encontrados"] == 1
+
+
+def test_5xx_se_reintenta_y_despues_se_lanza(stub):
+    servidor = stub(tasa_error=1.0, estado_error=503)
+    with pytest.raises(requests.HTTPError):
+        cliente_http.get("https://www.tipranks.com/stocks/aapl/forecast")
+    assert servidor.estadisticas["errores"] == cliente_http.REINTENTOS + 1
+
+
+def test_errores_intermitentes_se_recuperan(stub):
+    servidor = stub(tasa_error=0.3, semilla=1)
+    for _ in range(10):
+        assert cliente_http.get("https://finance.yahoo.com/quote/AAPL").status_code == 200
+    assert servidor.estadisticas["errores"] > 0
+
+
+def test_conexion_rechazada_se_lanza_tras_los_reintentos(stub):
+    servidor = stub()
+    servidor.detener()
+    with pytest.raises(requests.ConnectionError):
+        cliente_http.get("https://finance.yahoo.com/quote/AAPL", timeout=1)
+
+
+def test_token_bucket_limita_la_tasa():
+    bucket = TokenBucket(tasa=50, capacidad=1)
+    inicio = time.monotonic()
+    for _ in range(6):
+        bucket.tomar()
+    assert time.monotonic() - inicio >= 5 / 50 * 0.9
+
+
+def test_backoff_respeta_retry_after_con_tope():
+    assert cliente_http._backoff(0, "2") == 2.0
+    assert cliente_http._backoff(0, "999") == cliente_http.BACKOFF_MAX
+    assert 0 <= cliente_http._backoff(3, "mañana") <= cliente_http.BACKOFF_MAX
@@ -0,0 +1,182 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from auto_notes import mercado
+from auto_notes.cache import cacheado
+from auto_notes.coalescencia import COALESCEDOR, Coalescedor
+
+
+def _esperar_union(coalescedor, ahorradas, timeout=5):
+    limite = time.monotonic() + timeout
+    while coalescedor.ahorradas <= ahorradas:
+        assert time.monotonic() < limite, "el lote no se unió al vuelo"
+        time.sleep(0.01)
+
+
+def test_llamadas_concurrentes_comparten_un_vuelo():
+    coalescedor = Coalescedor()
+    llamadas = []
+
+    def lenta():
+        llamadas.append(1)
+        time.sleep(0.2)
+        return 42
+
+    resultados = []
+    hilos = [threading.Thread(target=lambda: resultados.append(coalescedor.hacer("k", lenta))) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert resultados == [42] * 8
+    assert len(llamadas) == 1
+    assert coalescedor.estadisticas() == {"llamadas": 1, "ahorradas": 7, "en_vuelo": 0}
+
+
+def test_hacer_propaga_la_excepcion_a_los_que_esperan():
+    coalescedor = Coalescedor()
+    liberar = threading.Event()
+
+    def falla():
+        liberar.wait()
+        raise ValueError("caído")
+
+    errores = []
+
+    def llamar():
+        try:
+            coalescedor.hacer("k", falla)
+        except ValueError as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=llamar) for _ in range(3)]
+    for hilo in hilos:
+        hilo.start()
+    _esperar_union(coalescedor, 1)
+    liberar.set()
+    for hilo in hilos:
+        hilo.join()
+    assert len(errores) == 3
+
+
+def test_lotes_cruzados_no_se_bloquean():
+    coalescedor = Coalescedor()
+    pedidas = []
+
+    def lote(claves):
+        pedidas.extend(claves)
+        time.sleep(0.1)
+        return {clave: clave * 10 for clave in claves}
+
+    resultados = {}
+    hilos = [
+        threading.Thread(target=lambda ks=ks: resultados.update({tuple(ks): coalescedor.hacer_lote(ks, lote)}))
+        for ks in ([1, 2, 3], [3, 4, 1], [2, 5])
+    ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join(timeout=5)
+    assert resultados[(3, 4, 1)] == {3: 30, 4: 40, 1: 10}
+    assert sorted(pedidas) == [1, 2, 3, 4, 5]
+
+
+def test_lote_unido_a_un_vuelo_fallido_queda_en_none():
+    coalescedor = Coalescedor()
+    liberar = threading.Event()
+
+    def falla():
+        liberar.wait()
+        raise ConnectionError("caído")
+
+    hilo = threading.Thread(target=lambda: pytest.raises(ConnectionError, coalescedor.hacer, "A", falla))
+    hilo.start()
+    while "A" not in coalescedor._en_vuelo:
+        time.sleep(0.01)
+    resultado = {}
+    lote = threading.Thread(target=lambda: resultado.update(coalescedor.hacer_lote(["A", "B"], lambda ks: {k: 1 for k in ks})))
+    lote.start()
+    _esperar_union(coalescedor, 0)
+    liberar.set()
+    hilo.join()
+    lote.join(timeout=5)
+    assert resultado == {"A": None, "B": 1}
+
+
+@pytest.fixture
+def historial_en_vuelo_fallido(monkeypatch):
+    """
+    obtener_historial("AAA") en vuelo (mismas claves que @cacheado("historial"))
+    que falla con ConnectionError cuando se lo libera.
+    """
+    liberar = threading.Event()
+
+    @cacheado("historial")
+    def historial_caido(ticker):
+        liberar.wait()
+        raise ConnectionError("caído")
+
+    descargas = []
+    monkeypatch.setattr(mercado, "_descargar", lambda tickers: descargas.append(tickers) or dict.fromkeys(tickers))
+    ahorradas = COALESCEDOR.ahorradas
+    hilo = threading.Thread(target=historial_caido, args=("AAA",))
+    hilo.start()
+    while ("historial", "AAA") not in COALESCEDOR._en_vuelo:
+        time.sleep(0.01)
+
+    def soltar():
+        _esperar_union(COALESCEDOR, ahorradas)
+        liberar.set()
+        hilo.join()
+
+    yield soltar, descargas
+    liberar.set()
+
+
+def _en_hilo(fn, *args):
+    resultado = {}
+
+    def correr():
+        try:
+            resultado["valor"] = fn(*args)
+        except BaseException as e:
+            resultado["error"] = e
+
+    hilo = threading.Thread(target=correr)
+    hilo.start()
+    return hilo, resultado
+
+
+def test_descargar_historiales_unido_a_un_vuelo_fallido(historial_en_vuelo_fallido):
+    soltar, descargas = historial_en_vuelo_fallido
+    hilo, resultado = _en_hilo(mercado.descargar_historiales, ["AAA"])
+    soltar()
+    hilo.join(timeout=5)
+    assert "error" not in resultado
+    assert resultado["valor"] == {"AAA": None}
+    assert descargas == []
+
+
+def test_descargar_historiales_usa_el_vencido_si_el_vuelo_falla(cache, historial_en_vuelo_fallido):
+    soltar, _ = historial_en_vuelo_fallido
+    viejo = pd.DataFrame({"Close": [1.0, 2.0]})
+    cache.guardar("historial", "AAA", viejo)
+    cache.ttls["historial"] = -1
+    hilo, resultado = _en_hilo(mercado.descargar_historiales, ["AAA"])
+    soltar()
+    hilo.join(timeout=5)
+    pd.testing.assert_frame_equal(resultado["valor"]["AAA"], viejo)
+
+
+def test_obtener_datos_notas_sobrevive_a_una_fuente_que_falla(monkeypatch):
+    def caida(tickers):
+        raise ConnectionError("caído")
+
+    monkeypatch.setattr(mercado, "descargar_historiales", caida)
+    monkeypatch.setattr(mercado, "obtener_target_yahoo", lambda ticker: 150.0)
+    monkeypatch.setattr(mercado, "obtener_analistas", lambda ticker: None)
+    datos = mercado.obtener_datos_notas(["AAA"], timeout=5)
+    assert datos["AAA"]["Precio actual"] is None
@@ -0,0 +1,120 @@
+import types
+
+import pytest
+import yfinance
+
+from auto_notes import circuitos, mercado
+from auto_notes.metricas import REGISTRO
+
+
+def _contador(nombre, **etiquetas):
+    return sum(c["valor"] for c in REGISTRO.contadores()
+               if c["nombre"] == nombre and all(c.get(k) == v for k, v in etiquetas.items()))
+
+
+def _respuesta(estado):
+    return types.SimpleNamespace(status_code=estado)
+
+
+class _Error404(Exception):
+    response = _respuesta(404)
+
+
+@pytest.fixture
+def ticker_yahoo(monkeypatch):
+    """
+    Reemplaza yfinance.Ticker: targets es lo que devuelve (o lanza)
+    analyst_price_targets, info lo de Ticker.info; infos cuenta los fallbacks.
+    """
+    estado = types.SimpleNamespace(targets={}, info={}, infos=0)
+
+    def _lanzar_o_devolver(valor):
+        if isinstance(valor, BaseException):
+            raise valor
+        return valor
+
+    class Ticker:
+        def __init__(self, ticker):
+            self.ticker = ticker
+
+        @property
+        def analyst_price_targets(self):
+            return _lanzar_o_devolver(estado.targets)
+
+        @property
+        def info(self):
+            estado.infos += 1
+            return _lanzar_o_devolver(estado.info)
+
+    monkeypatch.setattr(yfinance, "Ticker", Ticker)
+    return estado
+
+
+def test_target_yahoo_camino_rapido(ticker_yahoo):
+    ticker_yahoo.targets = {"mean": 123.456}
+    assert mercado.obtener_target_yahoo("AAA") == 123.46
+    assert ticker_yahoo.infos == 0
+
+
+@pytest.mark.parametrize("sin_modulo", [KeyError("financialData"), TypeError("None"), {}, _Error404()])
+def test_target_yahoo_sin_financial_data_usa_info(ticker_yahoo, sin_modulo):
+    ticker_yahoo.targets = sin_modulo
+    ticker_yahoo.info = {"targetMeanPrice": 99.0}
+    antes = _contador("auto_notes_target_yahoo_fallback_total")
+    assert mercado.obtener_target_yahoo("AAA") == 99.0
+    assert ticker_yahoo.infos == 1
+    assert _contador("auto_notes_target_yahoo_fallback_total") == antes + 1
+
+
+def test_target_yahoo_falla_de_red_no_paga_el_fallback(ticker_yahoo):
+    ticker_yahoo.targets = ConnectionError("caído")
+    antes = _contador("auto_notes_target_yahoo_fallback_total")
+    assert mercado.obtener_target_yahoo("AAA") is None
+    assert ticker_yahoo.infos == 0
+    assert _contador("auto_notes_target_yahoo_fallback_total") == antes
+    assert circuitos.circuito(mercado.HOST_YAHOO_API).fallos == 1
+
+
+def test_target_yahoo_ticker_desconocido_no_cuenta_para_el_circuito(ticker_yahoo, cache):
+    ticker_yahoo.targets = _Error404()
+    ticker_yahoo.info = _Error404()
+    assert mercado.obtener_target_yahoo("ZZZ") is None
+    assert circuitos.circuito(mercado.HOST_YAHOO_API).fallos == 0
+    assert cache.es_negativo("target_yahoo", "ZZZ")
+
+
+def test_analistas_desde_el_stub(stub, cache):
+    stub()
+    analistas = mercado.obtener_analistas("AAPL")
+    assert mercado.targets_brokers(analistas, ["MS"])["Target MS"] == 273.0
+    assert cache.leer("analistas", "AAPL") == analistas
+
+
+def test_ticker_desconocido_no_abre_el_circuito(stub, cache):
+    servidor = stub()
+    for i in range(circuitos.UMBRAL_FALLOS + 2):
+        assert mercado.obtener_analistas(f"ZZ{i}") is None
+    assert circuitos.estados()[mercado.HOST_TIPRANKS] == circuitos.CERRADO
+    assert cache.es_negativo("analistas", "ZZ0")
+    assert mercado.obtener_analistas("ZZ0") is None
+    assert servidor.estadisticas["no_encontrados"] == circuitos.UMBRAL_FALLOS + 2
+
+
+def test_pagina_sin_datos_cuenta_como_fallo_y_va_al_negativo(stub, cache):
+    stub()
+    assert mercado.obtener_min_52_semanas("XXXX") is None
+    assert circuitos.circuito(mercado.HOST_YAHOO).fallos == 1
+    assert cache.es_negativo("min_52", "XXXX")
+    assert mercado.obtener_min_52_semanas("AAPL") == 169.21
+    assert circuitos.circuito(mercado.HOST_YAHOO).fallos == 0
+
+
+def test_host_caido_sirve_el_vencido_y_abre_el_circuito(stub, cache):
+    stub(tasa_error=1.0)
+    cache.guardar("analistas", "AAPL", ["viejo"])
+    cache.ttls["analistas"] = -1
+    assert mercado.obtener_analistas("AAPL") == ["viejo"]
+    assert not cache.es_negativo("analistas", "AAPL")
+    for i in range(circuitos.UMBRAL_FALLOS - 1):
+        assert mercado.obtener_analistas(f"T{i}") is None
+    assert circuitos.estados()[mercado.HOST_TIPRANKS] == circuitos.ABIERTO
@@ -0,0 +1,38 @@
+import numpy as np
+
+from auto_notes import score
+from auto_notes.score import PESOS_DEFAULT, MotorScore, calcular_score, calcular_scores
+
+
+def _notas(n, desplazamiento=0.0):
+    return [
+        {"Ticker": f"T{i}", "Tasa": 10 + i + desplazamiento, "Colchón": 30, "Memory": i % 2 == 0,
+         "Precio actual": 100.0, "Target Yahoo": 120.0 + i, "Hace 1 año": 90.0, "Mín 1 año": 80.0,
+         "Target MS": None if i % 3 else 130.0}
+        for i in range(n)
+    ]
+
+
+def test_motor_igual_al_score_nota_por_nota():
+    notas = _notas(20)
+    esperados = [calcular_score(nota, PESOS_DEFAULT) for nota in notas]
+    assert MotorScore().scores(notas, PESOS_DEFAULT).tolist() == esperados
+    assert calcular_scores(notas, PESOS_DEFAULT).tolist() == esperados
+
+
+def test_motor_alterna_tablas_y_ediciones():
+    motor = MotorScore()
+    tablas = [_notas(5), _notas(5, 1.0), _notas(7), _notas(5)]
+    tablas[3][2]["Tasa"] = 99
+    for notas in tablas + tablas:
+        np.testing.assert_array_equal(motor.scores(notas, PESOS_DEFAULT), calcular_scores(notas, PESOS_DEFAULT))
+
+
+def test_tablas_con_el_mismo_hash_no_comparten_matriz(monkeypatch):
+    # Con la firma como hash, dos tablas que colisionan compartían la matriz de bases
+    monkeypatch.setattr(score, "hash", lambda valor: 0, raising=False)
+    motor = MotorScore()
+    a, b = _notas(3), _notas(4, 2.0)
+    np.testing.assert_array_equal(motor.scores(a, PESOS_DEFAULT), calcular_scores(a, PESOS_DEFAULT))
+    np.testing.assert_array_equal(motor.scores(b, PESOS_DEFAULT), calcular_scores(b, PESOS_DEFAULT))
+    assert motor.matriz_bases(b)[1].shape[0] == 4
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from auto_notes.simulacion import COLUMNAS_SIMULACION, SimuladorNotas, simular
+
+
+def _historial(sigma, semilla, base=None, rho=0.0):
+    rendimientos = np.random.default_rng(semilla).standard_normal(252)
+    if base is not None:
+        rendimientos = rho * base + np.sqrt(1 - rho ** 2) * rendimientos
+    precios = 100 * np.exp(np.cumsum(rendimientos * sigma / np.sqrt(252)))
+    return pd.DataFrame({"Close": precios, "Low": precios}), rendimientos
+
+
+def _nota(ticker):
+    return {"Ticker": ticker, "Precio actual": 100.0, "Colchón": 30, "Tasa": 10, "Memory": False}
+
+
+def _historiales():
+    aaa, base = _historial(0.3, 1)
+    bbb, _ = _historial(0.3, 2, base, 0.9)
+    ccc, _ = _historial(0.3, 3, base, 0.0)
+    return {"AAA": aaa, "BBB": bbb, "CCC": ccc}
+
+
+def test_nota_simple_igual_a_simular():
+    simulador = SimuladorNotas(caminos=2000)
+    historiales = _historiales()
+    [resultado] = simulador.simular([_nota("AAA")], historiales)
+    vol = simulador.volatilidades(["AAA"], historiales)["AAA"]
+    esperado = simular([30], [10], [False], [vol], caminos=2000)
+    assert resultado["Retorno MC"] == round(float(esperado[3][0]), 2)
+
+
+def test_canastas_simuladas_con_el_peor_subyacente():
+    notas = [_nota(ticker) for ticker in ["AAA", "AAA/BBB", "AAA/CCC", "AAA/BBB/CCC"]]
+    resultados = SimuladorNotas(caminos=5000).simular(notas, _historiales())
+    retornos = [r["Retorno MC"] for r in resultados]
+    assert all(r is not None for r in retornos)
+    # Más subyacentes y menos correlación: peor worst-of
+    assert retornos[0] > retornos[1] > retornos[2] > retornos[3]
+
+
+def test_canasta_sin_historial_de_un_subyacente():
+    historiales = _historiales()
+    del historiales["CCC"]
+    [resultado] = SimuladorNotas(caminos=1000).simular([_nota("AAA/CCC")], historiales)
+    assert resultado == dict.fromkeys(COLUMNAS_SIMULACION)
+
+
+def test_subyacentes_identicos_pierden_como_uno():
+    uno = simular([30], [10], [False], [0.3], caminos=20000)
+    dos = simular([30], [10], [False], [[0.3, 0.3]], [[[1.0, 1.0], [1.0, 1.0]]], caminos=20000)
+    assert abs(uno[2][0] - dos[2][0]) < 0.005
+    assert abs(uno[1][0] - dos[1][0]) < 0.05
+
+
+def test_canasta_desde_el_cache(cache):
+    for ticker, hist in _historiales().items():
+        cache.guardar("historial", ticker, hist)
+    simulador = SimuladorNotas(caminos=1000)
+    primero = simulador.simular([_nota("AAA/BBB")])
+    assert primero[0]["Retorno MC"] is not None
+    assert simulador.simular([_nota("AAA/BBB")]) == primero